@@ -1,9 +1,14 @@
+import asyncio
 import logging
+import time
 from .const import DOMAIN
-from .schema import CONFIG_SCHEMA
+from .schema import CONFIG_SCHEMA, SERVICE_WRITE_VALUE_SCHEMA
 from .coordinator import HeliosCoordinator
+from .metrics_view import HeliosMetricsView
+from .api import async_register_history_api, select_unit
 from datetime import timedelta
 from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.discovery import async_load_platform
 from homeassistant.helpers.event import async_track_time_interval
@@ -15,41 +20,94 @@ async def async_setup(hass: HomeAssistant, config: dict):
 
     # Validate and load configuration
     config = CONFIG_SCHEMA(config)
-    ip_address = config[DOMAIN].get("ip_address", "192.168.178.36")
-    port = config[DOMAIN].get("port", 502)
 
-    # Initialize and setup coordinator
-    coordinator = HeliosCoordinator(hass, ip_address, port)
-    hass.data[DOMAIN] = {"coordinator": coordinator, "entities": []}
-    await coordinator.setup_coordinator()
+    # Per-entity polling intervals (see scheduler.py)
+    poll_overrides = {
+        entity["name"]: entity["poll_interval"]
+        for platform in ("sensors", "binary_sensors", "switches")
+        for entity in config[DOMAIN].get(platform, [])
+        if "poll_interval" in entity
+    }
+    # Allowed range of the writable values, checked before every write of any unit
+    limits = {
+        sensor["name"]: (sensor.get("min_value"), sensor.get("max_value"))
+        for sensor in config[DOMAIN].get("sensors", [])
+        if "min_value" in sensor or "max_value" in sensor
+    }
 
-    # Load entity platforms
-    hass.async_create_task(
-        async_load_platform(hass, "sensor", DOMAIN, {"sensors": config[DOMAIN].get("sensors", [])}, config)
-    )
-    hass.async_create_task(
-        async_load_platform(hass, "binary_sensor", DOMAIN, {"binary_sensors": config[DOMAIN].get("binary_sensors", [])}, config)
-    )
-    hass.async_create_task(
-        async_load_platform(hass, "switch", DOMAIN, {"switches": config[DOMAIN].get("switches", [])}, config)
-    )
+    # One coordinator per unit / RS485 gateway: the top level ip_address / port (entities
+    # 'ventilation_...') and the 'gateways' list (entities 'ventilation_<name>_...').
+    # Every coordinator has its own connection, lock and refresh timer, so the units are
+    # polled concurrently and independently of each other.
+    gateways = [{"name": None, **config[DOMAIN]}] if "ip_address" in config[DOMAIN] else []
+    gateways.extend(config[DOMAIN].get("gateways", []))
+    coordinators = {
+        gateway["name"]: HeliosCoordinator(
+            hass, gateway["ip_address"], gateway["port"], poll_overrides,
+            gateway.get("poll_intervals", config[DOMAIN].get("poll_intervals")),
+            gateway.get("house", config[DOMAIN].get("house")),
+            gateway["name"],
+            config[DOMAIN].get("push"),
+            limits,
+        )
+        for gateway in gateways
+    }
+    hass.data[DOMAIN] = {
+        "coordinators": coordinators,
+        "coordinator": next(iter(coordinators.values())), # first unit, as before
+        "entities": [],
+    }
+    # restore the last known state of all units; connecting and the first reads run in the
+    # background (concurrently for all units), the startup timing is logged when they are done
+    setup_start = time.monotonic()
+    await asyncio.gather(*(coordinator.setup_coordinator() for coordinator in coordinators.values()))
 
-    # Set up periodic data refresh
-    async def update_data(_):
-        try:
-            await coordinator._coordinator.async_request_refresh()
-        except Exception as e:
-            _LOGGER.error(f"Error during data refresh: {e}", exc_info=True)
+    # Load entity platforms (once per unit)
+    metrics = config[DOMAIN].get("metrics", {})
+    for unit in coordinators:
+        hass.async_create_task(
+            async_load_platform(
+                hass, "sensor", DOMAIN,
+                {"sensors": config[DOMAIN].get("sensors", []), "diagnostics": metrics.get("sensors", False), "unit": unit},
+                config
+            )
+        )
+        hass.async_create_task(
+            async_load_platform(
+                hass, "binary_sensor", DOMAIN, {"binary_sensors": config[DOMAIN].get("binary_sensors", []), "unit": unit},
+                config
+            )
+        )
+        hass.async_create_task(
+            async_load_platform(hass, "switch", DOMAIN, {"switches": config[DOMAIN].get("switches", []), "unit": unit}, config)
+        )
 
-    # Register and manage the write service
+    # Optional OpenMetrics endpoint (/api/helios_vallox_ventilation/metrics)
+    if metrics.get("endpoint", False):
+        hass.http.register_view(HeliosMetricsView(coordinators))
+
+    # Register and manage the write service (optional 'unit': gateway name)
     async def handle_write_service(call):
         try:
-            await hass.async_add_executor_job(coordinator.write_value, call.data["variable"], call.data["value"])
+            coordinator = select_unit(coordinators, call.data.get("unit"))
+            await coordinator.write_value(call.data["variable"], call.data["value"])
         except Exception as e:
             _LOGGER.error(f"Error handling write service: {e}", exc_info=True)
-    hass.services.async_register(DOMAIN, "write_value", handle_write_service, schema=CONFIG_SCHEMA)
+    hass.services.async_register(DOMAIN, "write_value", handle_write_service, schema=SERVICE_WRITE_VALUE_SCHEMA)
+
+    # In-memory history of the readings: service get_history and websocket command
+    async_register_history_api(hass, coordinators)
+
+    # Close the persistent RS485 connections when HA stops
+    async def handle_stop(_):
+        await asyncio.gather(*(coordinator.async_close() for coordinator in coordinators.values()))
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, handle_stop)
 
     # Initialization done
+    _LOGGER.info(
+        f"Setup of {len(coordinators)} unit(s) done in {(time.monotonic() - setup_start) * 1000:.0f} ms, "
+        "first reads running in the background."
+    )
     return True
 
 # Setup from config
@@ -58,5 +116,7 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
 
 # Unload integration
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
-    hass.data.pop(DOMAIN, None)
+    data = hass.data.pop(DOMAIN, None)
+    if data:
+        await asyncio.gather(*(coordinator.async_close() for coordinator in data["coordinators"].values()))
     return True
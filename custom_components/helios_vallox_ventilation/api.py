@@ -0,0 +1,90 @@
+import logging
+import time
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from .const import DOMAIN, HISTORY_TIERS
+
+# _LOGGER = logging.getLogger(__name__)
+_LOGGER = logging.getLogger("helios_vallox.api")
+
+RESOLUTIONS = ["auto", "raw", *HISTORY_TIERS]
+
+# Service helios_vallox_ventilation.get_history (response only)
+SERVICE_GET_HISTORY_SCHEMA = vol.Schema({
+    vol.Required("variables"): vol.All(cv.ensure_list, [cv.string]),
+    vol.Optional("start"): cv.datetime,
+    vol.Optional("end"): cv.datetime,
+    vol.Optional("hours"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional("resolution", default="auto"): vol.In(RESOLUTIONS),
+    vol.Optional("unit"): cv.string,
+})
+
+# Coordinator of a unit (gateway name); None: the default unit, or the only one
+def select_unit(coordinators, unit=None):
+    if unit is None and None not in coordinators and len(coordinators) == 1:
+        return next(iter(coordinators.values()))
+    coordinator = coordinators.get(unit)
+    if coordinator is None:
+        known = ", ".join(name for name in coordinators if name) or "-"
+        raise HomeAssistantError(f"Unknown unit '{unit}'. Known: {known}")
+    return coordinator
+
+# Query the in-memory history (see history.py); 'hours' counts back from 'end' / now
+def query_history(coordinator, variables, start=None, end=None, hours=None, resolution="auto"):
+    if hours is not None and start is None:
+        start = (end if end is not None else time.time()) - hours * 3600
+    result = {}
+    for variable in variables:
+        samples = coordinator.history.query(variable, start, end, resolution)
+        if samples is None:
+            raise HomeAssistantError(f"No history for '{variable}'. Known: {', '.join(coordinator.history.variables)}")
+        result[variable] = samples
+    return result
+
+# Register the history service and the websocket command
+def async_register_history_api(hass: HomeAssistant, coordinators):
+
+    async def handle_get_history(call: ServiceCall):
+        start, end = call.data.get("start"), call.data.get("end")
+        return {
+            "variables": query_history(
+                select_unit(coordinators, call.data.get("unit")),
+                call.data["variables"],
+                start.timestamp() if start else None,
+                end.timestamp() if end else None,
+                call.data.get("hours"),
+                call.data["resolution"],
+            )
+        }
+
+    hass.services.async_register(
+        DOMAIN, "get_history", handle_get_history,
+        schema=SERVICE_GET_HISTORY_SCHEMA, supports_response=SupportsResponse.ONLY
+    )
+
+    # websocket: {"type": "helios_vallox_ventilation/history", "variables": [...], "hours": 24}
+    @websocket_api.websocket_command({
+        vol.Required("type"): f"{DOMAIN}/history",
+        vol.Required("variables"): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional("start"): vol.Coerce(float),   # epoch seconds
+        vol.Optional("end"): vol.Coerce(float),     # epoch seconds
+        vol.Optional("hours"): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional("resolution", default="auto"): vol.In(RESOLUTIONS),
+        vol.Optional("unit"): cv.string,
+    })
+    @callback
+    def websocket_history(hass, connection, msg):
+        try:
+            result = query_history(
+                select_unit(coordinators, msg.get("unit")), msg["variables"], msg.get("start"), msg.get("end"), msg.get("hours"), msg["resolution"]
+            )
+        except HomeAssistantError as e:
+            connection.send_error(msg["id"], "not_found", str(e))
+            return
+        connection.send_result(msg["id"], result)
+
+    websocket_api.async_register_command(hass, websocket_history)
+    _LOGGER.debug(f"History API registered for {len(coordinators)} unit(s)")
@@ -0,0 +1,138 @@
+import random
+import time
+
+try:
+    from .const import ( # HA
+        BUS_ADDRESSES,
+        BURST_GAP,
+        TRANSACTION_TIME,
+        BACKOFF_BASE,
+        BACKOFF_MAX
+    )
+except ImportError:
+    from const import ( # Shell / CLI for testing
+        BUS_ADDRESSES,
+        BURST_GAP,
+        TRANSACTION_TIME,
+        BACKOFF_BASE,
+        BACKOFF_MAX
+    )
+
+# Bus access arbitration for a bus shared with the remote control (FB1), the
+# mainboard broadcasts and other clients (SmartHomeNG, further HA instances).
+# The regular traffic comes in bursts: FB1 polls every ~5 s, MB1 broadcasts to
+# FB* every ~15 s. Bursts are grouped per talker, their period and duration are
+# learned (EWMA) and the next burst is predicted, so requests are sent in the
+# gaps instead of colliding. Retries use jittered back-off in milliseconds.
+
+EWMA_ALPHA = 0.3        # weight of the newest period / duration measurement
+MIN_PERIODS = 2         # periods to observe before a burst is predicted
+
+class BurstTracker:
+
+    __slots__ = ("start", "last", "period", "duration", "periods")
+
+    def __init__(self, now):
+        self.start = now            # begin of the current burst
+        self.last = now             # last telegram of the current burst
+        self.period = None          # EWMA of the time between burst starts
+        self.duration = 0.0         # EWMA of the burst length
+        self.periods = 0            # number of measured periods
+
+    def observe(self, now):
+        if now - self.last <= BURST_GAP: # still the same burst
+            self.last = now
+            return
+        length = self.last - self.start
+        self.duration = length if not self.periods else self.duration + EWMA_ALPHA * (length - self.duration)
+        period = now - self.start
+        self.period = period if self.period is None else self.period + EWMA_ALPHA * (period - self.period)
+        self.periods += 1
+        self.start = self.last = now
+
+    # predicted (start, end) of the next burst, None while the cadence is unknown
+    def predict(self, now):
+        if self.periods < MIN_PERIODS or not self.period:
+            return None
+        start = self.start + self.period
+        end = start + self.duration + BURST_GAP / 2
+        while end < now: # missed bursts (e.g. remote switched off) - roll forward
+            start += self.period
+            end += self.period
+        return start, end
+
+
+class BusArbiter:
+
+    def __init__(self, own_address=BUS_ADDRESSES["_HA"], rng=None):
+        self._own = own_address
+        self._random = rng or random.Random()
+        self._talkers = {}          # talker -> BurstTracker
+        self.collisions = 0         # failed transactions with garbage on the bus
+        self.timeouts = 0           # failed transactions without any reply
+        self.slot_wait = 0.0        # seconds spent waiting for predicted bursts to pass
+        self.slot_waits = 0         # number of such waits
+        self.retries = {}           # varid -> retries
+
+    # learn from every telegram on the bus (replies belong to the cycle of the requester)
+    def observe(self, telegram, now=None):
+        sender, receiver = telegram[1], telegram[2]
+        if self._own in (sender, receiver):
+            return
+        talker = receiver if sender == BUS_ADDRESSES["MB1"] else sender
+        tracker = self._talkers.get(talker)
+        now = time.monotonic() if now is None else now
+        if tracker is None:
+            self._talkers[talker] = BurstTracker(now)
+        else:
+            tracker.observe(now)
+
+    # seconds to wait until a transaction started now does not run into a predicted burst
+    def waitTime(self, now=None, duration=TRANSACTION_TIME):
+        now = time.monotonic() if now is None else now
+        wait = 0.0
+        for tracker in self._talkers.values():
+            window = tracker.predict(now)
+            if window and window[0] < now + wait + duration and now + wait < window[1]:
+                wait = window[1] - now
+        return wait
+
+    # book a wait for a free slot
+    def recordWait(self, seconds):
+        self.slot_wait += seconds
+        self.slot_waits += 1
+
+    # book a failed transaction
+    def recordFailure(self, varid, collision):
+        self.retries[varid] = self.retries.get(varid, 0) + 1
+        if collision:
+            self.collisions += 1
+        else:
+            self.timeouts += 1
+
+    # jittered exponential back-off for retry n (1, 2, ...): milliseconds, not seconds
+    def backoff(self, attempt):
+        return self._random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+    # longest learned burst in seconds, None while the cadence is unknown
+    def burstLength(self):
+        durations = [t.duration for t in self._talkers.values() if t.periods >= MIN_PERIODS]
+        return max(durations) if durations else None
+
+    # learned bus cadence: {talker: (period, burst duration)}
+    def cadence(self):
+        return {
+            talker: (round(t.period, 3), round(t.duration, 3))
+            for talker, t in self._talkers.items() if t.periods >= MIN_PERIODS
+        }
+
+    @property
+    def stats(self):
+        return {
+            "collisions": self.collisions,
+            "timeouts": self.timeouts,
+            "slot_wait_ms": round(self.slot_wait * 1000, 1),
+            "slot_waits": self.slot_waits,
+            "retries": {f"0x{varid:02X}": count for varid, count in sorted(self.retries.items())},
+            "cadence": {f"0x{talker:02X}": c for talker, c in self.cadence().items()},
+        }
@@ -9,7 +9,7 @@ _LOGGER = logging.getLogger("helios_vallox.binary_sensor")
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     if discovery_info is None:
         return
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    coordinator = hass.data[DOMAIN]["coordinators"][discovery_info.get("unit")]
     entities = []
     binary_sensor_config = discovery_info.get("binary_sensors", [])
     for sensor in binary_sensor_config:
@@ -23,7 +23,7 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                 variable=name,
                 coordinator=coordinator,
                 icon=sensor.get("icon"),
-                unique_id=f"ventilation_{name}",
+                unique_id=coordinator.unique_id(name),
                 description=sensor.get("description"),
                 device_class=sensor.get("device_class"),
             )
@@ -44,7 +44,7 @@ class HeliosBinarySensor(CoordinatorEntity, BinarySensorEntity):
         device_class=None,
     ):
         super().__init__(coordinator.coordinator)
-        self._attr_name = f"Ventilation {name}"
+        self._attr_name = coordinator.entity_name(name)
         self._variable = variable
         self._coordinator = coordinator
         self._attr_icon = icon
@@ -59,9 +59,19 @@ class HeliosBinarySensor(CoordinatorEntity, BinarySensorEntity):
     # additional state attributes
     @property
     def extra_state_attributes(self):
-        return {k: v for k, v in {"description": self._attr_description}.items() if v}
+        attributes = {
+            "description": self._attr_description,
+            **self._coordinator.state_attributes(self._variable),
+        }
+        return {k: v for k, v in attributes.items() if v}
 
-    # add entity and subscribe to updates
+    # add entity and subscribe to changes of its variable
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
-        self.async_on_remove(self.coordinator.async_add_listener(self.async_write_ha_state))
+        self.async_on_remove(
+            self._coordinator.async_add_variable_listener(self._variable, self.async_write_ha_state)
+        )
+
+    # updates are delivered per variable by the coordinator (changes only)
+    def _handle_coordinator_update(self):
+        pass
@@ -0,0 +1,79 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+
+# Bus access in order of priority: interactive writes and single reads go before a
+# running refresh. The refresh holds the lock per register transaction and gives it
+# up between two of them as soon as somebody with a higher priority waits (see
+# HeliosAsyncBase._yieldBus), then continues where it stopped. Within a priority,
+# the order of arrival counts. The lock is handed over directly to the next waiter,
+# so nobody can barge in between.
+
+PRIORITY_WRITE = 0          # writes (switches, write_value service)
+PRIORITY_READ = 1           # single reads (readSingleValue)
+PRIORITY_REFRESH = 2        # full / partial reads of the polling
+
+class PriorityLock:
+
+    def __init__(self):
+        self._waiters = []                  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._locked = False
+        self.priority = None                # priority of the current holder
+        self.handovers = 0                  # lock passed on to a waiting transaction
+
+    def locked(self):
+        return self._locked
+
+    async def acquire(self, priority=PRIORITY_REFRESH):
+        if not self._locked and not self._waiters:
+            self._locked, self.priority = True, priority
+            return True
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled(): # handed over meanwhile: pass it on
+                self.release()
+            raise
+        return True
+
+    def release(self):
+        while self._waiters:
+            priority, _, future = heapq.heappop(self._waiters)
+            if not future.done(): # skip cancelled waiters
+                self.priority = priority
+                self.handovers += 1
+                future.set_result(True)
+                return
+        self._locked, self.priority = False, None
+
+    # somebody with a higher priority than the holder is waiting
+    def contended(self):
+        return any(
+            priority < self.priority and not future.done() for priority, _, future in self._waiters
+        ) if self._locked else False
+
+    # let the waiting transactions of higher priority go first, then continue
+    async def yieldLock(self):
+        priority = self.priority
+        self.release()
+        await self.acquire(priority)
+
+    # async with lock(PRIORITY_WRITE): ...
+    @contextlib.asynccontextmanager
+    async def __call__(self, priority=PRIORITY_REFRESH):
+        await self.acquire(priority)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
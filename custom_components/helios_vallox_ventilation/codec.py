@@ -0,0 +1,87 @@
+try:
+    from .const import ( # HA
+        REGISTERS_AND_COILS,
+        NTC5K_TEMPERATURES,
+        FANSPEEDS
+    )
+except ImportError:
+    from const import ( # Shell / CLI for testing
+        REGISTERS_AND_COILS,
+        NTC5K_TEMPERATURES,
+        FANSPEEDS
+    )
+
+# Codec for raw register bytes <-> entity values, compiled once at import time:
+# 256-entry decode tables per register type, inverse lookups for writing and a
+# prebound codec (table or bitmask/shift) per variable.
+
+# decode tables: raw byte -> value
+DECODE_TABLES = {
+    "temperature": tuple(int(t) for t in NTC5K_TEMPERATURES),
+    "fanspeed": tuple(int(FANSPEEDS.get(raw, 1)) for raw in range(256)),
+    "dec": tuple(range(256)),
+    "dec3": tuple(raw // 3 for raw in range(256)), # defrost_hysteresis (1/3 °C steps)
+}
+
+# inverse lookups: value -> raw byte (first match, like NTC5K_TEMPERATURES.index())
+ENCODE_TEMPERATURES = {}
+for raw, temperature in enumerate(NTC5K_TEMPERATURES):
+    ENCODE_TEMPERATURES.setdefault(int(temperature), raw)
+ENCODE_FANSPEEDS = {speed: raw for raw, speed in FANSPEEDS.items()}
+
+TRUE_VALUES = {"true", "1", "on"}
+
+class VariableCodec:
+
+    __slots__ = ("name", "varid", "type", "mask", "shift", "table", "scale")
+
+    def __init__(self, name, vardef):
+        self.name = name
+        self.varid = vardef["varid"]
+        self.type = vardef["type"]
+        self.shift = max(vardef["bitposition"], 0)
+        self.mask = 1 << self.shift
+        self.scale = 3 if name == "defrost_hysteresis" else 1
+        kind = "dec3" if self.scale == 3 else self.type
+        self.table = DECODE_TABLES.get(kind)
+
+    # raw byte -> value
+    def decode(self, raw):
+        if self.type == "bit":
+            return bool(raw & self.mask)
+        return self.table[raw]
+
+    # value -> raw byte (coils need the current register value); None if not possible
+    def encode(self, value, current=None):
+        if self.type == "bit":
+            if current is None:
+                return None
+            if str(value).lower() in TRUE_VALUES:
+                return current | self.mask
+            return current & ~self.mask & 0xFF
+        if self.type == "temperature":
+            return ENCODE_TEMPERATURES.get(int(value))
+        if self.type == "fanspeed":
+            return ENCODE_FANSPEEDS.get(int(value))
+        if self.type == "dec":
+            raw = int(value * self.scale)
+            return raw if 0 <= raw <= 255 else None
+        return None
+
+    def __repr__(self):
+        return f"VariableCodec({self.name}, 0x{self.varid:02X}, {self.type})"
+
+# one codec per variable, and all codecs of a register (for decoding a single byte)
+CODECS = {name: VariableCodec(name, vardef) for name, vardef in REGISTERS_AND_COILS.items()}
+REGISTER_CODECS = {}
+for codec in CODECS.values():
+    REGISTER_CODECS.setdefault(codec.varid, []).append(codec)
+REGISTER_CODECS = {varid: tuple(codecs) for varid, codecs in REGISTER_CODECS.items()}
+
+# decode all variables stored in one register byte
+def decodeRegister(varid, raw):
+    return {codec.name: codec.decode(raw) for codec in REGISTER_CODECS.get(varid, ())}
+
+# decode a whole register snapshot (bytes of 256 slots) into all variables in one pass
+def decodeSnapshot(snapshot):
+    return {name: codec.decode(snapshot[codec.varid]) for name, codec in CODECS.items()}
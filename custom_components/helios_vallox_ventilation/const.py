@@ -7,6 +7,95 @@ DOMAIN = "helios_vallox_ventilation"
 DEFAULT_IP = "192.168.178.36"
 DEFAULT_PORT = 502
 
+# connection handling (persistent socket to the RS485 gateway)
+SOCKET_TIMEOUT = 1.5            # seconds; blocking socket operations
+RECONNECT_MIN_DELAY = 1         # seconds; first back-off after a failed connect
+RECONNECT_MAX_DELAY = 300       # seconds; upper limit for the back-off
+KEEPALIVE_IDLE = 10             # seconds of idle before the first TCP keepalive probe
+KEEPALIVE_INTERVAL = 5          # seconds between TCP keepalive probes
+KEEPALIVE_COUNT = 3             # unanswered probes before the connection is dropped
+
+# passive bus snooping (register values picked up from other bus traffic)
+SNOOP_MAX_AGE = 30              # seconds; snooped values younger than this are not re-read
+
+# bus arbitration (see arbiter.py)
+BURST_GAP = 0.5                 # seconds; telegrams closer than this belong to one burst
+TRANSACTION_TIME = 0.05         # seconds; request + reply of a single register
+BACKOFF_BASE = 0.01             # seconds; base of the jittered retry back-off
+BACKOFF_MAX = 0.25              # seconds; upper limit of the retry back-off
+
+# pipelined read sessions: several registers per bus slot, next request right after a reply
+PIPELINE_REPLY_TIMEOUT = 0.25   # seconds; registers not answered in time are read one by one
+PIPELINE_MAX_MISSES = 3         # consecutive misses that end a session (bus contention)
+
+# register scanner (see scanner.py): all varids in one pipelined session, rate limited
+SCAN_MIN_INTERVAL = 0.02        # seconds between two scan requests (max. 50 requests/s)
+SCAN_REPLY_TIMEOUT = 0.1        # seconds; registers not answered in time count as absent
+
+# adaptive timeouts (see latency.py): derived from the measured request -> reply latency
+LATENCY_WINDOW = 200            # latest reply latencies kept for percentiles
+LATENCY_MIN_SAMPLES = 10        # samples before the fixed defaults are replaced
+REPLY_TIMEOUT_MIN = 0.1         # seconds; lower limit of the adaptive reply timeout
+SILENCE_MAX = 0.05              # seconds; upper limit of the adaptive silence window
+SYNC_TIMEOUT_MIN = 0.25         # seconds; lower limit of the adaptive sync window
+
+# circuit breaker: registers failing in a row are skipped for a while (e.g. absent CO2 sensor)
+BREAKER_THRESHOLD = 3           # consecutive failed reads that quarantine a register
+BREAKER_COOLDOWN = 300          # seconds; first quarantine, doubled on every re-failure
+BREAKER_MAX_COOLDOWN = 3600     # seconds; upper limit of the quarantine
+
+# write queue: writes arriving within this time (seconds) are flushed in one bus session
+WRITE_COALESCE_DELAY = 0.05
+
+# push mode: register changes seen on the bus are published without polling (see push.py)
+PUSH_DEBOUNCE = 0.5             # seconds a changed value has to be stable before publishing
+PUSH_MIN_INTERVAL = 5           # seconds; min. time between two publishes of a variable
+
+# refresh deadline: registers not read by then are left for a retry of the missing ones only
+REFRESH_DEADLINE = 30           # seconds per refresh
+MISSING_RETRY_DELAY = 5         # seconds until registers missing in a refresh are read again
+
+# last known state, persisted after each refresh and restored at startup (see coordinator.py)
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 10        # seconds; saves of several refreshes / pushes are combined
+
+# in-memory history of the numeric readings (see history.py)
+HISTORY_RAW_SIZE = 1440         # raw samples per variable (4 h at 10 s, 24 h at 60 s polling)
+HISTORY_TIERS = {               # downsampling tiers: name -> (bucket seconds, buckets)
+    "5min": (300, 2016),        # 7 days
+    "1h":   (3600, 2160)        # 90 days
+}
+
+# polling classes (seconds); can be overridden by 'poll_intervals' in vent_conf.yaml
+POLL_CLASSES = {
+    "fast":   10,       # temperatures, boost
+    "normal": 60,       # everything else
+    "slow":   3600      # settings that (almost) never change
+}
+
+# default polling class per register (registers not listed here are 'normal')
+REGISTER_POLL_CLASSES = {
+    0x32: "fast",       # temperature_outdoor_air
+    0x33: "fast",       # temperature_exhaust_air
+    0x34: "fast",       # temperature_extract_air
+    0x35: "fast",       # temperature_supply_air
+    0x71: "fast",       # activate_boost, boost_status
+    0x79: "fast",       # boost_remaining
+    0xA5: "slow",       # max_fanspeed
+    0xA6: "slow",       # service_interval
+    0xA7: "slow",       # preheat_setpoint
+    0xA8: "slow",       # defrost_setpoint
+    0xA9: "slow",       # initial_fanspeed
+    0xAB: "slow",       # service_due_months
+    0xAF: "slow",       # bypass_setpoint
+    0xB0: "slow",       # input_fan_percent
+    0xB1: "slow",       # output_fan_percent
+    0xB2: "slow",       # defrost_hysteresis
+    0xB3: "slow",       # co2_setting_upper_byte
+    0xB4: "slow",       # co2_setting_lower_byte
+    0x2D: "slow"        # co2_sensor*_present
+}
+
 # mapping for the four NTC5k temperature sensors
 NTC5K_TEMPERATURES = array.array(
     "i",
@@ -31,6 +120,7 @@ BUS_ADDRESSES = {
     "FB*": 0x20,  # alle remote controls
     "FB1": 0x21,  # remote control 1
     "LON": 0x28,  # LON bus module (if any)
+    "_H1": 0x2D,  # another HA client simulating a remote ('HA1' in the sniffer logs)
     "_HA": 0x2E,  # this HA Python script; we are simulating a remote
     "_SH": 0x2F   # SmartHomeNG Python script; also simulating a remote
 }
@@ -1,9 +1,27 @@
 import asyncio
 import logging
+import time
 from datetime import timedelta
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from .vent_functions import HeliosBase
+from homeassistant.util import dt as dt_util
+from .vent_async import HeliosAsyncBase
+from .scheduler import PollScheduler
+from .write_queue import WriteQueue
+from .metrics import MetricsRegistry, DURATION_BUCKETS
+from .history import HistoryStore
+from .derived import DerivedEngine
+from .push import PushDebouncer
+from .const import (
+    DOMAIN,
+    REGISTERS_AND_COILS,
+    SNAPSHOT_STORAGE_VERSION,
+    SNAPSHOT_SAVE_DELAY,
+    REFRESH_DEADLINE,
+    MISSING_RETRY_DELAY
+)
 
 # _LOGGER = logging.getLogger(__name__)
 _LOGGER = logging.getLogger("helios_vallox.coordinator")
@@ -11,58 +29,337 @@ _LOGGER = logging.getLogger("helios_vallox.coordinator")
 class HeliosCoordinator:
 
     # Initialize data update coordinator
-    def __init__(self, hass: HomeAssistant, ip: str, port: int):
+    def __init__(self, hass: HomeAssistant, ip: str, port: int, poll_overrides=None, poll_classes=None, house=None,
+                 unit=None, push=None, limits=None):
         self._hass = hass
+        self.unit = unit                    # None: default unit, else the gateway name (see schema.py)
         self._ip = ip
         self._port = port
         self._lock = asyncio.Lock()
-        self._helios = HeliosBase(hass, ip, port)
+        self._helios = HeliosAsyncBase(hass, ip, port, limits=limits)
+        self._scheduler = PollScheduler(poll_overrides, poll_classes)
+        self._writes = WriteQueue(self._helios.writeValues, self._writes_flushed)
         self._coordinator = DataUpdateCoordinator(
             hass,
             _LOGGER,
-            name="Helios Vallox Data Coordinator",
+            name=f"Helios Vallox Data Coordinator {unit}" if unit else "Helios Vallox Data Coordinator",
             update_method=self._async_update_data,
-            update_interval=timedelta(seconds=59), # see also __init__.py
+            update_interval=timedelta(seconds=self._scheduler.tick), # see also __init__.py
         )
+        # delta updates: entities subscribe per variable and are only told about changes
+        self._listeners = {}                # variable -> set of entity callbacks
+        self._previous = {}                 # snapshot of the last dispatched data
+        self._last_success = True           # availability of the last dispatch
+        self._state_writes = 0              # entity updates delivered
+        self._suppressed_updates = 0        # entity updates skipped (value unchanged)
+        self._coordinator.async_add_listener(self._dispatch_updates)
+        # derived metrics (airflow, power, heat recovery, ...), recalculated on input changes only
+        self._derived = DerivedEngine(house)
+        # in-memory history of the numeric readings (see history.py and api.py)
+        self.history = HistoryStore()
+        # last known state on disk (.storage/helios_vallox_ventilation.snapshot[_<unit>]):
+        # restored at startup and flagged as stale until the variable has been read again;
+        # values that could not be read in a refresh keep their last good value, also stale
+        self._store = Store(
+            hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.snapshot_{unit}" if unit else f"{DOMAIN}.snapshot"
+        )
+        self._timestamps = {}               # variable -> epoch time of the value (read, pushed, written)
+        self._stale = set()                 # variables with restored / last good values
+        self._stale_changed = set()         # variables whose staleness changed, attributes to update
+        self._retry = None                  # cancel function of the pending retry of missing registers
+        self._retry_registers = set()       # registers to retry
+        self._partial_refreshes = 0         # refreshes with registers missing
+        # push mode: changes seen on the bus are published between the polls (see push.py)
+        self._push = None
+        if push and push.get("enabled"):
+            self._push = PushDebouncer(
+                self._push_flushed, lambda variable: (self._coordinator.data or {}).get(variable),
+                push["debounce"], push["min_interval"]
+            )
+            self._helios.setChangeHandler(self._push.feed)
+        # metrics: driver metrics plus refresh duration, entity updates and write batches
+        self.metrics = MetricsRegistry()
+        self.metrics.include(self._helios.metrics)
+        self.metrics.histogram("refresh_seconds", "Duration of a coordinator refresh.", DURATION_BUCKETS)
+        self.metrics.counter("entity_updates", "Entity state writes delivered.", lambda: self._state_writes)
+        self.metrics.counter("suppressed_updates", "Entity state writes skipped (unchanged).",
+                             lambda: self._suppressed_updates)
+        self.metrics.counter("derived_calculations", "Derived metrics recalculated.",
+                             lambda: self._derived.calculations)
+        self.metrics.counter("write_batches", "Write batches flushed to the bus.", lambda: self._writes.batches)
+        self.metrics.counter("partial_refreshes", "Refreshes with registers missing (deadline, failures).",
+                             lambda: self._partial_refreshes)
+        self.metrics.gauge("stale_values", "Values restored or kept from an earlier read.", lambda: len(self._stale))
+        if self._push is not None:
+            self.metrics.counter("push_updates", "Variables published from bus traffic (push mode).",
+                                 lambda: self._push.published)
+            self.metrics.counter("push_dropped", "Bus changes superseded or reverted before publishing.",
+                                 lambda: self._push.dropped)
 
     # Declare coordinator property
     @property
     def coordinator(self):
         return self._coordinator
 
-    # Setup the coordinator
+    # Entity namespace of the unit: the default unit keeps the plain 'ventilation_<name>'
+    def entity_name(self, name):
+        return f"Ventilation {self.unit} {name}" if self.unit else f"Ventilation {name}"
+
+    def unique_id(self, name):
+        return f"ventilation_{self.unit}_{name}" if self.unit else f"ventilation_{name}"
+
+    # Statistics of delta updates: delivered vs. suppressed entity updates
+    @property
+    def update_stats(self):
+        return {"written": self._state_writes, "suppressed": self._suppressed_updates}
+
+    # Subscribe an entity to changes of a single variable; returns the unsubscribe function
+    @callback
+    def async_add_variable_listener(self, variable, update_callback):
+        self._listeners.setdefault(variable, set()).add(update_callback)
+        def remove_listener():
+            self._listeners.get(variable, set()).discard(update_callback)
+        return remove_listener
+
+    # Coordinator listener: diff against the previous snapshot and notify changed variables only
+    @callback
+    def _dispatch_updates(self):
+        data = self._coordinator.data or {}
+        success = self._coordinator.last_update_success
+        if success != self._last_success: # availability changed, update everybody
+            changed = set(self._listeners)
+        else:
+            changed = {k for k in data.keys() | self._previous.keys() if data.get(k) != self._previous.get(k)}
+        changed |= self._stale_changed # value may be the same, but the staleness changed
+        self._stale_changed = set()
+        self._previous, self._last_success = dict(data), success
+        notified = 0
+        for variable in changed:
+            for update_callback in list(self._listeners.get(variable, ())):
+                update_callback()
+                notified += 1
+        self._state_writes += notified
+        self._suppressed_updates += sum(len(v) for v in self._listeners.values()) - notified
+        if changed:
+            _LOGGER.debug(f"Changed: {sorted(changed)}, updates: {self.update_stats}")
+
+    # Metrics as plain numbers for the diagnostic sensors (see metrics.py)
+    @property
+    def metrics_summary(self):
+        refresh = self.metrics.get("refresh_seconds")
+        summary = self._helios.metricsSummary()
+        summary["refresh_mean_s"] = round(refresh.mean(), 3) if refresh.count() else None
+        summary["refresh_p99_s"] = refresh.quantile(0.99)
+        return summary
+
+    # Connection statistics of the persistent RS485 connection
+    @property
+    def connection_stats(self):
+        return self._helios.connectionStats()
+
+    # Extra state attributes of a variable's entity: restored values and values kept from
+    # an earlier read are flagged as stale, with the time of the last good read
+    def state_attributes(self, variable):
+        if variable not in self._stale:
+            return {}
+        timestamp = self._timestamps.get(variable)
+        return {
+            "stale": True,
+            "last_read": dt_util.utc_from_timestamp(timestamp).isoformat() if timestamp else None,
+        }
+
+    # Setup the coordinator: restore the last known state, so the entities can be created
+    # right away; connecting and the first read run in the background
     async def setup_coordinator(self):
-        if await self._hass.async_add_executor_job(self._helios._connect):
+        start = time.monotonic()
+        restored = await self._restore()
+        self._coordinator.async_set_updated_data(restored)
+        self._hass.async_create_background_task(
+            self._first_refresh(start, time.monotonic() - start, len(restored)),
+            f"{DOMAIN} first refresh {self.unit or ''}".rstrip(),
+        )
+
+    async def _first_refresh(self, start, restore_time, restored):
+        connect_start = time.monotonic()
+        connected = await self._helios.connect() # from now on, bus traffic feeds the register cache
+        read_start = time.monotonic()
+        if connected:
             await self._coordinator.async_refresh()
         else:
-            _LOGGER.error("Failed to connect to ventilation during setup.")
+            _LOGGER.error(f"Failed to connect to ventilation at {self._ip}:{self._port} during setup.")
+        done = time.monotonic()
+        _LOGGER.info(
+            f"Startup{' of ' + self.unit if self.unit else ''}: restore {restore_time * 1000:.0f} ms "
+            f"({restored} values), connect {(read_start - connect_start) * 1000:.0f} ms, "
+            f"first read {done - read_start:.2f} s, up to date after {done - start:.2f} s "
+            f"({len(self._stale)} values still stale)"
+        )
 
-    # Read all known registers (see vent_conf.yaml and const.py)
+    # Last known state from disk (empty if there is none)
+    async def _restore(self):
+        try:
+            stored = await self._store.async_load()
+        except Exception as e:
+            _LOGGER.warning(f"Could not restore the last known state: {e}")
+            return {}
+        if not stored or not isinstance(stored.get("values"), dict):
+            return {}
+        # readings only; the derived metrics are calculated from them with the current house data
+        values = {k: v for k, v in stored["values"].items() if k in REGISTERS_AND_COILS}
+        self._timestamps = {k: v for k, v in stored.get("timestamps", {}).items() if k in values}
+        self._derived.update(values)
+        self._stale = set(values)
+        _LOGGER.debug(f"Restored {len(values)} values, saved {time.time() - stored.get('saved', 0):.0f}s ago.")
+        return values
+
+    # Data to persist (called by the store, delayed): the readings, derived metrics are
+    # recalculated on restore
+    @callback
+    def _snapshot(self):
+        data = self._coordinator.data or {}
+        return {
+            "saved": time.time(),
+            "values": {k: v for k, v in data.items() if k in REGISTERS_AND_COILS},
+            "timestamps": {k: v for k, v in self._timestamps.items() if k in REGISTERS_AND_COILS},
+        }
+
+    # Book fresh values: timestamps, not stale anymore, save the snapshot soon
+    def _fresh(self, variables):
+        now = time.time()
+        for variable in variables:
+            self._timestamps[variable] = now
+        refreshed = self._stale.intersection(variables)
+        if refreshed:
+            self._stale -= refreshed
+            self._stale_changed |= refreshed
+        self._store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+
+    # Book values that could not be read: the last good value stays, flagged as stale
+    def _missed(self, variables, data):
+        missed = {variable for variable in variables if data.get(variable) is not None} - self._stale
+        self._stale |= missed
+        self._stale_changed |= missed
+
+    # Read the registers that are due (see scheduler.py) and merge them into the last data.
+    # Registers not read (deadline, failures) keep their last good value and are retried
+    # on their own after MISSING_RETRY_DELAY; only registers read are marked in the scheduler.
     async def _async_update_data(self):
+        return await self._read(self._scheduler.due())
+
+    async def _read(self, due):
+        previous = self._coordinator.data or {}
         try:
-            data = await self._hass.async_add_executor_job(self._helios.readAllValues)
+            if not due:
+                return previous
+            start = time.monotonic()
+            values = await self._helios.readValues(due, self._scheduler.tick, REFRESH_DEADLINE) or {}
+            self.metrics.get("refresh_seconds").observe(time.monotonic() - start)
+            previous = self._coordinator.data or {} # pushed or written meanwhile
+            read = {k: v for k, v in values.items() if v is not None}
+            self._scheduler.mark({REGISTERS_AND_COILS[k]["varid"] for k in read})
+            data = dict(previous)
+            data.update(read)
+            derived = self._derived.update(data, {k for k, v in read.items() if previous.get(k) != v})
+            self._fresh(
+                list(read) + list(derived)
+                + [k for k in self._stale if k not in REGISTERS_AND_COILS] # calculated from fresh values
+            )
+            # history: values read in this refresh and the calculations based on them
+            self.history.record({k: v for k, v in data.items() if k in read or k not in REGISTERS_AND_COILS})
+            missing = self._missing(due, read, data)
+            _LOGGER.debug(
+                f"Polled {len(due)} registers, {len(missing)} missing. Connection: {self.connection_stats}"
+            )
             return data
         except Exception as e:
-            _LOGGER.error(f"Error fetching data: {e}", exc_info=True)
-            return {}
+            _LOGGER.error(f"Error fetching data, keeping the last values: {e}", exc_info=True)
+            self._missing(due, {}, previous)
+            return previous
+
+    # Registers of 'due' without a value: flag their variables as stale and retry them soon
+    # (except the ones in quarantine, see latency.py)
+    def _missing(self, due, read, data):
+        missing = set(due) - {REGISTERS_AND_COILS[k]["varid"] for k in read}
+        if not missing:
+            return missing
+        self._partial_refreshes += 1
+        self._missed([k for k, v in REGISTERS_AND_COILS.items() if v["varid"] in missing], data)
+        retry = missing - self._helios.quarantinedRegisters()
+        if retry and MISSING_RETRY_DELAY < self._scheduler.tick:
+            self._retry_registers |= retry
+            if self._retry is None:
+                self._retry = async_call_later(self._hass, MISSING_RETRY_DELAY, self._retry_missing)
+        return missing
+
+    # Retry the missing registers on their own, a full refresh would also read everything
+    # due within the slack of the scheduler; the next poll stays as scheduled
+    @callback
+    def _retry_missing(self, _now):
+        self._retry = None
+        self._hass.async_create_task(self._async_retry_missing())
 
-    # Write a single register
-    def write_value(self, variable, value):
+    async def _async_retry_missing(self):
+        registers, self._retry_registers = self._retry_registers, set()
+        due = registers & self._scheduler.due() # not read by a poll or pushed meanwhile
+        if not due:
+            return
+        previous = self._coordinator.data
+        data = await self._read(due)
+        if data is not previous:
+            self._coordinator.data = data
+            self._coordinator.async_update_listeners()
+
+    # Close the persistent connection (HA shutdown / unload)
+    async def async_close(self):
+        if self._retry is not None:
+            self._retry()
+            self._retry = None
+        if self._push is not None:
+            self._push.close()
+        if self._coordinator.data:
+            await self._store.async_save(self._snapshot())
+        await self._helios.close()
+
+    # Write a single register (queued; see write_queue.py)
+    async def write_value(self, variable, value):
         try:
-            result = self._helios.writeValue(variable, value)
-            if result:
-                new_data = self._coordinator.data.copy() if self._coordinator.data else {}
-                new_data[variable] = value
-                self._hass.loop.call_soon_threadsafe(self._coordinator.async_set_updated_data, new_data)
-            return result
+            return await self._writes.submit(variable, value)
         except Exception as e:
             _LOGGER.error(f"Error writing {value} to {variable}: {e}", exc_info=True)
             return False
 
+    # Report a flushed write batch to the entities with a single update
+    def _writes_flushed(self, values, results):
+        written = {variable: values[variable] for variable, success in results.items() if success}
+        if not written:
+            return
+        new_data = self._coordinator.data.copy() if self._coordinator.data else {}
+        new_data.update(written)
+        derived = self._derived.update(new_data, written)
+        self._fresh(list(written) + list(derived))
+        for variable in written:
+            self._scheduler.invalidate(REGISTERS_AND_COILS[variable]["varid"])
+        _LOGGER.debug(f"Write batch done: {written}, queue: {self._writes.stats}")
+        self._coordinator.async_set_updated_data(new_data)
+
+    # Push mode: merge changes seen on the bus into the data, without rescheduling the next
+    # poll (async_set_updated_data would postpone it with every push)
+    @callback
+    def _push_flushed(self, values):
+        data = dict(self._coordinator.data or {})
+        data.update(values)
+        derived = self._derived.update(data, values)
+        self.history.record({**values, **derived})
+        self._fresh(list(values) + list(derived))
+        self._scheduler.mark({REGISTERS_AND_COILS[variable]["varid"] for variable in values})
+        _LOGGER.debug(f"Pushed: {values}, push: {self._push.stats}")
+        self._coordinator.data = data
+        self._coordinator.async_update_listeners()
+
     # Switch: Turn on
     async def turn_on(self, variable):
-        self._hass.async_add_executor_job(self.write_value, variable, 1)
+        self._hass.async_create_task(self.write_value(variable, 1))
 
     # Switch: Turn off
     async def turn_off(self, variable):
-        self._hass.async_add_executor_job(self.write_value, variable, 0)
+        self._hass.async_create_task(self.write_value(variable, 0))
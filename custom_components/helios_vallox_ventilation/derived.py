@@ -0,0 +1,183 @@
+try:
+    from .const import COMPONENT_FAULTS # HA
+except ImportError:
+    from const import COMPONENT_FAULTS # Shell / CLI for testing
+
+# Derived metrics: values calculated from the readings (and the house data of
+# the 'house' block in vent_conf.yaml) instead of Jinja templates.
+# Every metric declares its inputs; after a refresh only the metrics with
+# changed inputs are recalculated, and results feed into later metrics
+# (the list below is in dependency order). The results end up in the
+# coordinator data and are published like readings, as sensors of vent_conf.yaml.
+
+AIR_HEAT_CAPACITY = 0.34        # Wh/(m³·K), volumetric heat capacity of air
+CO2_PRESENT = tuple(f"co2_sensor{n}_present" for n in range(1, 6))
+TEMPERATURES = (
+    "temperature_outdoor_air", "temperature_supply_air",
+    "temperature_extract_air", "temperature_exhaust_air"
+)
+
+class DerivedMetric:
+
+    __slots__ = ("name", "inputs", "function", "needs_house")
+
+    def __init__(self, name, inputs, function, needs_house=()):
+        self.name = name
+        self.inputs = frozenset(inputs)         # readings / derived metrics used
+        self.function = function                # function(values, house) -> value
+        self.needs_house = tuple(needs_house)   # keys of the house data required
+
+    def __repr__(self):
+        return f"DerivedMetric({self.name}, inputs={sorted(self.inputs)})"
+
+###### Metric functions ########################################################
+
+def _fault_text(v, house):
+    fault_number = v.get("fault_number")
+    return COMPONENT_FAULTS.get(fault_number, "-") if fault_number is not None else None
+
+def _temperatures(v):
+    temperatures = [v.get(k) for k in TEMPERATURES]
+    return None if None in temperatures else temperatures
+
+def _temperature_reduction(v, house):
+    t = _temperatures(v)
+    return t[2] - t[3] if t else None
+
+def _temperature_gain(v, house):
+    t = _temperatures(v)
+    return t[1] - t[0] if t else None
+
+def _temperature_balance(v, house):
+    t = _temperatures(v)
+    return (t[1] - t[0]) - (t[2] - t[3]) if t else None
+
+def _efficiency(v, house):
+    t = _temperatures(v)
+    if not t:
+        return None
+    delta = t[2] - t[0]
+    if delta == 0: # prevent div/0 if temperatures are the same
+        return 100
+    return int(max(0, min((t[1] - t[0]) / delta * 100, 100))) # limit to 0..100
+
+# relative humidity from the raw value; -1: no sensor (thanks to @ragg987)
+def _humidity(raw):
+    if raw is None or raw < 0x33:
+        return -1
+    return int((raw - 51) / 2.04)
+
+def _rh_sensor_1(v, house):
+    return _humidity(v.get("rh_sensor1_raw"))
+
+def _rh_sensor_2(v, house):
+    return _humidity(v.get("rh_sensor2_raw"))
+
+# CO2 value from two bytes; -1: no sensor present
+def _co2(v, upper, lower):
+    if not any(v.get(k) for k in CO2_PRESENT) or v.get(upper) is None or v.get(lower) is None:
+        return -1
+    return v[upper] * 256 + v[lower]
+
+def _co2_concentration(v, house):
+    return _co2(v, "co2_reading_upper_byte", "co2_reading_lower_byte")
+
+def _co2_setting(v, house):
+    return _co2(v, "co2_setting_upper_byte", "co2_setting_lower_byte")
+
+# DIN 1946-6 airflow: factor * (-0.001 * Ane² + 1.15 * Ane + 20)
+def _din_airflow(factor):
+    def din_airflow(v, house):
+        area = house["area"]
+        return int(factor * (-0.001 * area ** 2 + 1.15 * area + 20))
+    return din_airflow
+
+def _din_moisture_protection(v, house):
+    return _din_airflow(house["isolation_factor"])(v, house)
+
+# value per fan speed (from the ventilator curves), scaled by the slower fan
+def _per_mode(v, table):
+    fanspeed = v.get("fanspeed")
+    percent = [v.get("input_fan_percent"), v.get("output_fan_percent")]
+    if fanspeed is None or None in percent or not 0 <= fanspeed < len(table):
+        return None
+    return int(table[fanspeed] * min(percent) / 100)
+
+def _effective_airflow(v, house):
+    return _per_mode(v, house["airflow_per_mode"])
+
+def _electrical_power(v, house):
+    return _per_mode(v, house["power_per_mode"])
+
+def _air_exchange_rate(v, house):
+    airflow = v.get("effective_airflow")
+    if airflow is None or not house["volume"]:
+        return None
+    return round(airflow / house["volume"], 2)
+
+def _heat_recovery_power(v, house):
+    airflow, gain = v.get("effective_airflow"), v.get("temperature_gain")
+    if airflow is None or gain is None:
+        return None
+    return int(airflow * AIR_HEAT_CAPACITY * gain)
+
+###### Metric definitions (in dependency order) ################################
+
+AIRFLOW_INPUTS = ("fanspeed", "input_fan_percent", "output_fan_percent")
+
+DERIVED_METRICS = (
+    DerivedMetric("fault_text", ("fault_number",), _fault_text),
+    DerivedMetric("temperature_reduction", TEMPERATURES, _temperature_reduction),
+    DerivedMetric("temperature_gain", TEMPERATURES, _temperature_gain),
+    DerivedMetric("temperature_balance", TEMPERATURES, _temperature_balance),
+    DerivedMetric("efficiency", TEMPERATURES, _efficiency),
+    DerivedMetric("rh_sensor_1", ("rh_sensor1_raw",), _rh_sensor_1),
+    DerivedMetric("rh_sensor_2", ("rh_sensor2_raw",), _rh_sensor_2),
+    DerivedMetric("co2_concentration", CO2_PRESENT + ("co2_reading_upper_byte", "co2_reading_lower_byte"),
+                  _co2_concentration),
+    DerivedMetric("co2_setting", CO2_PRESENT + ("co2_setting_upper_byte", "co2_setting_lower_byte"),
+                  _co2_setting),
+    DerivedMetric("din_airflow_moisture_protection", (), _din_moisture_protection, ("area", "isolation_factor")),
+    DerivedMetric("din_airflow_reduced_exchange", (), _din_airflow(0.7), ("area",)),
+    DerivedMetric("din_airflow_normal_exchange", (), _din_airflow(1.0), ("area",)),
+    DerivedMetric("din_airflow_boost_exchange", (), _din_airflow(1.15), ("area",)),
+    DerivedMetric("effective_airflow", AIRFLOW_INPUTS, _effective_airflow, ("airflow_per_mode",)),
+    DerivedMetric("electrical_power", AIRFLOW_INPUTS, _electrical_power, ("power_per_mode",)),
+    DerivedMetric("air_exchange_rate", ("effective_airflow",), _air_exchange_rate, ("volume",)),
+    DerivedMetric("heat_recovery_power", ("effective_airflow", "temperature_gain"), _heat_recovery_power),
+)
+
+
+class DerivedEngine:
+
+    def __init__(self, house=None, metrics=DERIVED_METRICS):
+        self._house = dict(house or {})
+        # metrics without their house data (not configured) are left out
+        self._metrics = tuple(
+            metric for metric in metrics
+            if all(self._house.get(key) is not None for key in metric.needs_house)
+        )
+        self.calculations = 0   # metric evaluations in total
+        self.skipped = 0        # evaluations saved because no input changed
+
+    @property
+    def names(self):
+        return [metric.name for metric in self._metrics]
+
+    # recalculate the metrics depending on 'changed' (None: all) and store them in
+    # 'values'; returns the metrics whose value changed
+    def update(self, values, changed=None):
+        pending = None if changed is None else set(changed)
+        results = {}
+        for metric in self._metrics:
+            if pending is not None and not (pending & metric.inputs) and metric.name in values:
+                self.skipped += 1
+                continue
+            self.calculations += 1
+            value = metric.function(values, self._house)
+            if metric.name not in values or values[metric.name] != value:
+                values[metric.name] = value
+                results[metric.name] = value
+                if pending is not None:
+                    pending.add(metric.name) # results feed into later metrics
+        return results
@@ -0,0 +1,58 @@
+# Telegram framer for the Helios / Vallox RS485 bus, shared by the integration
+# (vent_async.py) and the tools (tools/sniffer.py).
+#
+# A telegram has 6 bytes: 0x01, sender, receiver, register, value, checksum.
+# Received data is collected in one bytearray; telegram starts are located with
+# bytearray.find() and checksums are verified in place, so there is no per-byte
+# list shifting and no copying of candidate windows. Only valid telegrams are
+# copied out (as bytes), and consumed data is dropped once per feed().
+
+TELEGRAM_START = 0x01
+TELEGRAM_LENGTH = 6
+
+class TelegramFramer:
+
+    def __init__(self, on_jitter=None):
+        self._buffer = bytearray()
+        self._on_jitter = on_jitter     # optional callback for bytes outside telegrams
+        self.bytes_received = 0         # all bytes fed into the framer
+        self.telegrams = 0              # valid telegrams found
+        self.skipped = 0                # bytes that did not belong to a valid telegram
+        self.crc_errors = 0             # telegram starts with a wrong checksum
+
+    # add received bytes, return the complete and valid telegrams (6 bytes each)
+    def feed(self, data):
+        buffer = self._buffer
+        buffer += data
+        self.bytes_received += len(data)
+        find, telegrams = buffer.find, []
+        pos, jitter_start, last = 0, 0, len(buffer) - TELEGRAM_LENGTH
+        while True:
+            start = find(TELEGRAM_START, pos)
+            if start < 0 or start > last:
+                pos = len(buffer) if start < 0 else start # keep a possible partial telegram
+                break
+            # checksum straight from the buffer (0x01 + 4 bytes), no window copies
+            if (1 + buffer[start + 1] + buffer[start + 2] + buffer[start + 3]
+                    + buffer[start + 4]) & 0xFF == buffer[start + 5]:
+                if start > jitter_start:
+                    self._jitter(buffer, jitter_start, start)
+                pos = jitter_start = start + TELEGRAM_LENGTH
+                telegrams.append(bytes(buffer[start:pos]))
+            else:
+                self.crc_errors += 1
+                pos = start + 1 # 0x01 inside data or a broken telegram, resync
+        if pos > jitter_start:
+            self._jitter(buffer, jitter_start, pos)
+        del buffer[:pos]
+        self.telegrams += len(telegrams)
+        return telegrams
+
+    # discard a partial telegram (e.g. after a reconnect)
+    def reset(self):
+        self._buffer.clear()
+
+    def _jitter(self, buffer, start, end):
+        self.skipped += end - start
+        if self._on_jitter is not None:
+            self._on_jitter(bytes(buffer[start:end]))
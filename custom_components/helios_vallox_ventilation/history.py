@@ -0,0 +1,184 @@
+import array
+import bisect
+import time
+
+try:
+    from .const import HISTORY_RAW_SIZE, HISTORY_TIERS # HA
+except ImportError:
+    from const import HISTORY_RAW_SIZE, HISTORY_TIERS # Shell / CLI for testing
+
+# In-memory history of the numeric readings, independent of the HA recorder.
+# Per variable there is a ring buffer of raw samples and downsampling tiers
+# (e.g. 5 min and 1 h buckets with min / max / mean). All buffers are
+# preallocated arrays of fixed size, so memory does not grow over time:
+# timestamps are stored as doubles, values as floats (4 bytes).
+
+class RingBuffer:
+
+    __slots__ = ("_columns", "_capacity", "_head", "size")
+
+    def __init__(self, capacity, columns):
+        self._columns = [array.array(code, bytes(array.array(code).itemsize * capacity)) for code in columns]
+        self._capacity = capacity
+        self._head = 0          # next slot to write
+        self.size = 0
+
+    def append(self, *values):
+        for column, value in zip(self._columns, values):
+            column[self._head] = value
+        self._head = (self._head + 1) % self._capacity
+        self.size = min(self.size + 1, self._capacity)
+
+    # oldest slot first
+    def _slots(self):
+        start = (self._head - self.size) % self._capacity
+        return [(start + n) % self._capacity for n in range(self.size)]
+
+    # rows with start <= first column < end, oldest first (first column: timestamps, ascending)
+    def window(self, start=None, end=None):
+        slots = self._slots()
+        times = self._columns[0]
+        keys = [times[slot] for slot in slots]
+        first = bisect.bisect_left(keys, start) if start is not None else 0
+        last = bisect.bisect_left(keys, end) if end is not None else len(keys)
+        return [tuple(column[slot] for column in self._columns) for slot in slots[first:last]]
+
+    # first column of the oldest row; -inf as long as nothing was overwritten
+    @property
+    def oldest(self):
+        if self.size < self._capacity:
+            return float("-inf")
+        return self._columns[0][self._head]
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in self._columns)
+
+
+# buckets of fixed length: (bucket start, min, max, mean)
+class Tier:
+
+    __slots__ = ("seconds", "buffer", "_start", "_min", "_max", "_sum", "_count")
+
+    def __init__(self, seconds, capacity):
+        self.seconds = seconds
+        self.buffer = RingBuffer(capacity, "dfff")
+        self._start = None      # start of the open bucket
+        self._min = self._max = self._sum = 0.0
+        self._count = 0
+
+    def add(self, timestamp, value):
+        start = timestamp - timestamp % self.seconds
+        if start != self._start:
+            self._close()
+            self._start, self._min, self._max, self._sum, self._count = start, value, value, 0.0, 0
+        self._min, self._max = min(self._min, value), max(self._max, value)
+        self._sum += value
+        self._count += 1
+
+    def _close(self):
+        if self._count:
+            self.buffer.append(self._start, self._min, self._max, self._sum / self._count)
+
+    # closed buckets plus the open one
+    def window(self, start=None, end=None):
+        rows = self.buffer.window(start, end)
+        if self._count and (start is None or self._start >= start) and (end is None or self._start < end):
+            rows.append((self._start, self._min, self._max, self._sum / self._count))
+        return rows
+
+
+class VariableHistory:
+
+    def __init__(self, raw_size=HISTORY_RAW_SIZE, tiers=HISTORY_TIERS):
+        self.raw = RingBuffer(raw_size, "df")
+        self.tiers = {name: Tier(seconds, capacity) for name, (seconds, capacity) in tiers.items()}
+
+    def add(self, timestamp, value):
+        self.raw.append(timestamp, value)
+        for tier in self.tiers.values():
+            tier.add(timestamp, value)
+
+    # oldest raw sample still available
+    @property
+    def raw_since(self):
+        rows = self.raw.window()
+        return rows[0][0] if rows else None
+
+    @property
+    def nbytes(self):
+        return self.raw.nbytes + sum(tier.buffer.nbytes for tier in self.tiers.values())
+
+
+class HistoryStore:
+
+    def __init__(self, raw_size=HISTORY_RAW_SIZE, tiers=HISTORY_TIERS):
+        self._raw_size = raw_size
+        self._tiers = tiers
+        self._variables = {}    # name -> VariableHistory
+
+    # add all numeric values of a reading (booleans and texts are skipped)
+    def record(self, values, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        for name, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            history = self._variables.get(name)
+            if history is None:
+                history = self._variables[name] = VariableHistory(self._raw_size, self._tiers)
+            history.add(timestamp, value)
+
+    @property
+    def variables(self):
+        return sorted(self._variables)
+
+    # samples of one variable between start and end (epoch seconds); resolution 'raw',
+    # a tier name or 'auto' (raw if it reaches back far enough, else the finest tier that does;
+    # if none does, the finest one holding the oldest data, e.g. raw during the first hours)
+    def query(self, name, start=None, end=None, resolution="auto"):
+        history = self._variables.get(name)
+        if history is None:
+            return None
+        if resolution == "auto":
+            resolution = self._resolution(history, start)
+        if resolution == "raw":
+            rows = history.raw.window(start, end)
+            return {
+                "variable": name,
+                "resolution": "raw",
+                "time": [row[0] for row in rows],
+                "value": [round(row[1], 2) for row in rows],
+            }
+        tier = history.tiers.get(resolution)
+        if tier is None:
+            raise ValueError(f"Unknown resolution '{resolution}'")
+        rows = tier.window(start, end)
+        return {
+            "variable": name,
+            "resolution": resolution,
+            "time": [row[0] for row in rows],
+            "min": [round(row[1], 2) for row in rows],
+            "max": [round(row[2], 2) for row in rows],
+            "mean": [round(row[3], 2) for row in rows],
+        }
+
+    def _resolution(self, history, start):
+        since = history.raw_since
+        if start is None or (since is not None and since <= start):
+            return "raw"
+        for name, tier in sorted(history.tiers.items(), key=lambda item: item[1].seconds):
+            rows = tier.buffer.window()
+            if rows and rows[0][0] <= start:
+                return name
+        # nothing reaches back to start: a buffer that has not wrapped yet holds every sample
+        candidates = [("raw", history.raw)] + [
+            (name, tier.buffer) for name, tier in sorted(history.tiers.items(), key=lambda item: item[1].seconds)
+        ]
+        return min(candidates, key=lambda item: item[1].oldest)[0] # finest first on ties
+
+    @property
+    def stats(self):
+        return {
+            "variables": len(self._variables),
+            "bytes": sum(history.nbytes for history in self._variables.values()),
+        }
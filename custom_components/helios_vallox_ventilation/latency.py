@@ -0,0 +1,154 @@
+import collections
+import math
+import time
+
+try:
+    from .const import ( # HA
+        LATENCY_WINDOW,
+        LATENCY_MIN_SAMPLES,
+        REPLY_TIMEOUT_MIN,
+        SILENCE_MAX,
+        SYNC_TIMEOUT_MIN,
+        BURST_GAP,
+        BREAKER_THRESHOLD,
+        BREAKER_COOLDOWN,
+        BREAKER_MAX_COOLDOWN
+    )
+except ImportError:
+    from const import ( # Shell / CLI for testing
+        LATENCY_WINDOW,
+        LATENCY_MIN_SAMPLES,
+        REPLY_TIMEOUT_MIN,
+        SILENCE_MAX,
+        SYNC_TIMEOUT_MIN,
+        BURST_GAP,
+        BREAKER_THRESHOLD,
+        BREAKER_COOLDOWN,
+        BREAKER_MAX_COOLDOWN
+    )
+
+# Adaptive timing for one gateway: the request -> reply latency is tracked
+# (EWMA, deviation and a window for percentiles) and the reply timeout, the
+# silence window and the sync window are derived from it. Until enough replies
+# were measured, the fixed defaults of vent_async.py are used.
+# Registers failing over and over (e.g. CO2 sensor not installed) are put into
+# quarantine by a circuit breaker, so they no longer stall every refresh.
+
+EWMA_ALPHA = 0.1                # weight of the newest latency sample
+TIMEOUT_FACTOR = 3              # reply timeout = TIMEOUT_FACTOR * p99 (at least mean + 4 deviations)
+TELEGRAM_TIME = 6 * 10 / 9600   # seconds on the wire for one telegram (9600 baud, 8N1)
+
+class LatencyTracker:
+
+    def __init__(self, reply_timeout, silence, sync_timeout):
+        self._defaults = (reply_timeout, silence, sync_timeout)
+        self._samples = collections.deque(maxlen=LATENCY_WINDOW)
+        self._sorted = None         # cached sorted copy of the samples
+        self.mean = None            # EWMA of the latency
+        self.deviation = 0.0        # EWMA of the absolute deviation
+        self.count = 0              # replies measured in total
+
+    # book the latency of one answered request (seconds from sending to the reply)
+    def record(self, seconds):
+        self._samples.append(seconds)
+        self._sorted = None
+        self.count += 1
+        if self.mean is None:
+            self.mean = seconds
+            return
+        error = seconds - self.mean
+        self.mean += EWMA_ALPHA * error
+        self.deviation += EWMA_ALPHA * (abs(error) - self.deviation)
+
+    def percentile(self, fraction):
+        if not self._samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self._samples)
+        index = min(len(self._sorted) - 1, math.ceil(fraction * len(self._sorted)) - 1)
+        return self._sorted[max(0, index)]
+
+    @property
+    def learned(self):
+        return len(self._samples) >= LATENCY_MIN_SAMPLES
+
+    # time to wait for the reply to a read request
+    def replyTimeout(self):
+        if not self.learned:
+            return self._defaults[0]
+        timeout = max(TIMEOUT_FACTOR * self.percentile(0.99), self.mean + 4 * self.deviation)
+        return min(self._defaults[0], max(REPLY_TIMEOUT_MIN, timeout))
+
+    # quiet time before sending: longer than the gap between a request of another
+    # client and the reply of the mainboard, so we never talk into a transaction
+    def silence(self):
+        if not self.learned:
+            return self._defaults[1]
+        gap = self.percentile(0.99) - 2 * TELEGRAM_TIME
+        return min(SILENCE_MAX, max(self._defaults[1], gap + TELEGRAM_TIME / 6))
+
+    # time to wait for a free slot: the longest learned burst plus the burst gap
+    def syncTimeout(self, burst_length=None):
+        if burst_length is None:
+            return self._defaults[2]
+        return min(self._defaults[2], max(SYNC_TIMEOUT_MIN, burst_length + BURST_GAP))
+
+    @property
+    def stats(self):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+        return {
+            "replies": self.count,
+            "latency_mean_ms": ms(self.mean),
+            "latency_p50_ms": ms(self.percentile(0.5)),
+            "latency_p99_ms": ms(self.percentile(0.99)),
+            "reply_timeout_ms": ms(self.replyTimeout()),
+            "silence_ms": ms(self.silence()),
+        }
+
+
+class CircuitBreaker:
+
+    def __init__(self):
+        self._failures = {}         # varid -> consecutive failed reads
+        self._open = {}             # varid -> (monotonic end of quarantine, cooldown)
+
+    # False while the register is in quarantine; after the cooldown one trial read is allowed
+    def allow(self, varid, now=None):
+        state = self._open.get(varid)
+        if state is None:
+            return True
+        now = time.monotonic() if now is None else now
+        return now >= state[0]
+
+    # in quarantine or half-open (trial read): a single attempt is enough
+    def tripped(self, varid):
+        return varid in self._open
+
+    def recordSuccess(self, varid):
+        self._failures.pop(varid, None)
+        return self._open.pop(varid, None) is not None # True: register is back
+
+    # returns True when the register has just been put into quarantine
+    def recordFailure(self, varid, now=None):
+        now = time.monotonic() if now is None else now
+        state = self._open.get(varid)
+        if state is not None: # trial read failed: quarantine again, twice as long
+            cooldown = min(BREAKER_MAX_COOLDOWN, state[1] * 2)
+            self._open[varid] = (now + cooldown, cooldown)
+            return False
+        failures = self._failures.get(varid, 0) + 1
+        self._failures[varid] = failures
+        if failures < BREAKER_THRESHOLD:
+            return False
+        self._open[varid] = (now + BREAKER_COOLDOWN, BREAKER_COOLDOWN)
+        return True
+
+    # registers in quarantine: {varid: seconds left}
+    def quarantined(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {varid: max(0.0, end - now) for varid, (end, _) in self._open.items()}
+
+    @property
+    def stats(self):
+        return {f"0x{varid:02X}": round(left) for varid, left in sorted(self.quarantined().items())}
@@ -0,0 +1,174 @@
+import bisect
+import math
+
+# Lightweight metrics for the bus driver and the coordinator: counters and
+# histograms (fixed buckets), optionally with labels. No dependencies, so the
+# same numbers are available in HA (diagnostic sensors), in the OpenMetrics
+# text endpoint and in the CLI tools (benchmark.py).
+# Counters and gauges can also read their value from a function (e.g. statistics
+# that are already counted elsewhere), so nothing is counted twice.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)    # seconds
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)    # seconds
+
+def _labelKey(labels):
+    return tuple(sorted(labels.items()))
+
+def _labelText(key, extra=None):
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return f"{value:g}" if isinstance(value, float) else str(value)
+
+
+class Counter:
+
+    type = "counter"
+
+    def __init__(self, name, help, function=None):
+        self.name = name
+        self.help = help
+        self._function = function   # optional source of the value (label-less)
+        self._values = {}           # label key -> value
+
+    def inc(self, amount=1, **labels):
+        key = _labelKey(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._values.get(_labelKey(labels), 0)
+
+    def total(self):
+        if self._function is not None:
+            return self._function()
+        return sum(self._values.values())
+
+    def samples(self):
+        if self._function is not None:
+            return [(self.name + "_total", (), self._function())]
+        if not self._values:
+            return [(self.name + "_total", (), 0)]
+        return [(self.name + "_total", key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+
+    type = "gauge"
+
+    def __init__(self, name, help, function):
+        super().__init__(name, help, function)
+
+    def samples(self):
+        return [(self.name, (), self._function())]
+
+
+class Histogram:
+
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._series = {}           # label key -> [bucket counts, sum, count]
+
+    def observe(self, value, **labels):
+        series = self._series.get(_labelKey(labels))
+        if series is None:
+            series = self._series[_labelKey(labels)] = [[0] * len(self.buckets), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels):
+        series = self._series.get(_labelKey(labels))
+        return series[2] if series else 0
+
+    def mean(self, **labels):
+        series = self._series.get(_labelKey(labels))
+        return series[1] / series[2] if series and series[2] else None
+
+    # upper bound of the bucket holding the quantile (None without observations)
+    def quantile(self, fraction, **labels):
+        series = self._series.get(_labelKey(labels))
+        if not series or not series[2]:
+            return None
+        rank, seen = fraction * series[2], 0
+        for bound, count in zip(self.buckets, series[0]):
+            seen += count
+            if seen >= rank:
+                return bound if bound != math.inf else self.buckets[-2]
+        return self.buckets[-2]
+
+    def samples(self):
+        result = []
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                result.append((self.name + "_bucket", key, cumulative, ("le", _number(bound))))
+            result.append((self.name + "_sum", key, total))
+            result.append((self.name + "_count", key, count))
+        return result
+
+
+class MetricsRegistry:
+
+    def __init__(self, prefix="helios"):
+        self._prefix = prefix
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, function=None):
+        return self._add(Counter(f"{self._prefix}_{name}", help, function))
+
+    def gauge(self, name, help, function):
+        return self._add(Gauge(f"{self._prefix}_{name}", help, function))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(f"{self._prefix}_{name}", help, buckets))
+
+    # merge the metrics of another registry (e.g. driver metrics into the coordinator's)
+    def include(self, other):
+        for metric in other._metrics.values():
+            self._metrics.setdefault(metric.name, metric)
+
+    def get(self, name):
+        return self._metrics.get(f"{self._prefix}_{name}")
+
+    # OpenMetrics text exposition format
+    def render(self):
+        return render_registries({None: self})
+
+
+# OpenMetrics text of several registries (one per unit), told apart by a 'unit' label;
+# registries under None get no label
+def render_registries(registries, label="unit"):
+    metrics = {}    # name -> [(unit, metric)], same metric of all registries together
+    for unit, registry in registries.items():
+        for metric in registry._metrics.values():
+            metrics.setdefault(metric.name, []).append((unit, metric))
+    lines = []
+    for name, entries in metrics.items():
+        lines.append(f"# TYPE {name} {entries[0][1].type}")
+        lines.append(f"# HELP {name} {entries[0][1].help}")
+        for unit, metric in entries:
+            unit_key = () if unit is None else ((label, unit),)
+            for sample in metric.samples():
+                sample_name, key, value = sample[:3]
+                if value is None:
+                    continue
+                text = _labelText(unit_key + key, sample[3] if len(sample) > 3 else None)
+                lines.append(f"{sample_name}{text} {_number(value)}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,27 @@
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from .const import DOMAIN
+from .metrics import render_registries
+
+# OpenMetrics text endpoint for the bus metrics (see metrics.py), e.g. for Prometheus:
+#   GET /api/helios_vallox_ventilation/metrics  (Authorization: Bearer <long-lived token>)
+# With several units, the metrics are labelled unit="<gateway name>" (unit="default" for the top level one).
+class HeliosMetricsView(HomeAssistantView):
+
+    url = f"/api/{DOMAIN}/metrics"
+    name = f"api:{DOMAIN}:metrics"
+    requires_auth = True
+
+    def __init__(self, coordinators):
+        self._coordinators = coordinators   # unit -> HeliosCoordinator
+
+    async def get(self, request):
+        return web.Response(
+            body=render_registries(
+                {
+                    (unit or "default") if len(self._coordinators) > 1 else None: coordinator.metrics
+                    for unit, coordinator in self._coordinators.items()
+                }
+            ).encode(),
+            headers={"Content-Type": "application/openmetrics-text; version=1.0.0; charset=utf-8"},
+        )
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import math
+
+try:
+    from .const import PUSH_DEBOUNCE, PUSH_MIN_INTERVAL # HA
+except ImportError:
+    from const import PUSH_DEBOUNCE, PUSH_MIN_INTERVAL # Shell / CLI for testing
+
+# _LOGGER = logging.getLogger(__name__)
+_LOGGER = logging.getLogger("helios_vallox.push")
+
+# Push mode: variables changing on the bus (see HeliosAsyncBase.setChangeHandler) are
+# published right away instead of at the next poll. Per variable, a change is published
+# once it has been stable for 'debounce' seconds, and at most every 'min_interval'
+# seconds; a value flipping back to the published one before that is dropped.
+# All changes due at the same time are handed to 'publish' as one batch.
+class PushDebouncer:
+
+    def __init__(self, publish, current, debounce=PUSH_DEBOUNCE, min_interval=PUSH_MIN_INTERVAL):
+        self._publish = publish             # function(values) for a batch of changes
+        self._current = current             # function(varname) -> value known to the entities
+        self._debounce = debounce
+        self._min_interval = min_interval
+        self._pending = {}                  # varname -> (value, loop time of the change)
+        self._published = {}                # varname -> loop time of the last publish
+        self._loop = None
+        self._timer = None
+        self.received = 0                   # changed variables reported by the bus driver
+        self.published = 0                  # variables published
+        self.dropped = 0                    # changes superseded or reverted before publishing
+        self.batches = 0                    # publish calls
+
+    # changes from the bus driver (called in the event loop)
+    def feed(self, values):
+        self._loop = self._loop or asyncio.get_running_loop()
+        now = self._loop.time()
+        for name, value in values.items():
+            self.received += 1
+            pending = self._pending.get(name)
+            if pending is not None and pending[0] == value:
+                continue
+            if pending is not None:
+                self.dropped += 1
+                del self._pending[name]
+            if value != self._current(name):
+                self._pending[name] = (value, now)
+        self._schedule()
+
+    # push statistics
+    @property
+    def stats(self):
+        return {
+            "received": self.received,
+            "published": self.published,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "pending": len(self._pending),
+        }
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending.clear()
+
+    # loop time at which a pending change may be published
+    def _due(self, name):
+        return max(
+            self._pending[name][1] + self._debounce,
+            self._published.get(name, -math.inf) + self._min_interval
+        )
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self._timer = self._loop.call_at(min(self._due(name) for name in self._pending), self._flush)
+
+    def _flush(self):
+        self._timer = None
+        now = self._loop.time() + 0.001 # timers may fire a little early
+        due = {name: value for name, (value, _) in self._pending.items() if self._due(name) <= now}
+        for name in due:
+            del self._pending[name]
+            self._published[name] = now
+        if due:
+            self.published += len(due)
+            self.batches += 1
+            try:
+                self._publish(due)
+            except Exception as e:
+                _LOGGER.error(f"Error publishing {due}: {e}", exc_info=True)
+        self._schedule()
@@ -0,0 +1,84 @@
+import time
+
+try:
+    from .codec import REGISTER_CODECS # HA
+    from .const import REGISTER_POLL_CLASSES
+except ImportError:
+    from codec import REGISTER_CODECS # Shell / CLI for testing
+    from const import REGISTER_POLL_CLASSES
+
+# Register scanner: repeated sweeps over all varids (HeliosAsyncBase.scanRegisters) are
+# compared to find the registers a device answers and how their values behave:
+#   absent  - never answered
+#   static  - always the same value (settings, constants, unused registers)
+#   slow    - changed in less than half of the sweep intervals
+#   fast    - changed in half of the sweep intervals or more (temperatures, counters)
+# The result is a candidate register profile: known registers with their variables,
+# unknown ones as candidates, each with a suggested poll class (see const.py).
+
+FAST_CHANGE_SHARE = 0.5     # share of sweep intervals with a change from which a register is 'fast'
+POLL_CLASS_SUGGESTIONS = {"static": "slow", "slow": "normal", "fast": "fast"}
+
+class RegisterScan:
+
+    def __init__(self):
+        self.sweeps = 0
+        self.started = None
+        self.finished = None
+        self._values = {}           # varid -> raw values of all sweeps (None: no reply)
+
+    # results of one sweep: {varid: raw value or None}
+    def add(self, values, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self.started = self.started or timestamp
+        self.finished = timestamp
+        for varid, value in values.items():
+            self._values.setdefault(varid, [None] * self.sweeps).append(value)
+        for varid, history in self._values.items(): # not part of this sweep
+            if len(history) == self.sweeps:
+                history.append(None)
+        self.sweeps += 1
+
+    # behaviour of one register over all sweeps
+    def classify(self, varid):
+        history = self._values.get(varid, [])
+        answered = [value for value in history if value is not None]
+        if not answered:
+            return {"class": "absent", "answered": 0}
+        intervals = len(answered) - 1
+        changes = sum(1 for a, b in zip(answered, answered[1:]) if a != b)
+        if not changes:
+            kind = "static"
+        elif changes >= FAST_CHANGE_SHARE * intervals:
+            kind = "fast"
+        else:
+            kind = "slow"
+        return {
+            "class": kind,
+            "answered": len(answered),
+            "changes": changes,
+            "distinct": len(set(answered)),
+            "min": min(answered),
+            "max": max(answered),
+            "last": answered[-1],
+        }
+
+    # candidate register profile (JSON serialisable), absent registers left out
+    def profile(self):
+        registers = {}
+        for varid in sorted(self._values):
+            result = self.classify(varid)
+            if result["class"] == "absent":
+                continue
+            codecs = REGISTER_CODECS.get(varid, ())
+            result["known"] = [codec.name for codec in codecs] or None
+            result["poll_class"] = REGISTER_POLL_CLASSES.get(varid, "normal") if codecs else None
+            result["suggested_poll_class"] = POLL_CLASS_SUGGESTIONS[result["class"]]
+            registers[f"0x{varid:02X}"] = result
+        return {
+            "sweeps": self.sweeps,
+            "duration_s": round(self.finished - self.started, 1) if self.sweeps else 0,
+            "answered": len(registers),
+            "unknown": sorted(k for k, v in registers.items() if not v["known"]),
+            "registers": registers,
+        }
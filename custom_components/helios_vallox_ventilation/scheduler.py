@@ -0,0 +1,111 @@
+import time
+
+try:
+    from .const import ( # HA
+        REGISTERS_AND_COILS,
+        POLL_CLASSES,
+        REGISTER_POLL_CLASSES
+    )
+except ImportError:
+    from const import ( # Shell / CLI for testing
+        REGISTERS_AND_COILS,
+        POLL_CLASSES,
+        REGISTER_POLL_CLASSES
+    )
+
+# read plan: every physical register is fetched once per refresh and all of its
+# variables are decoded from that single byte (e.g. 8 coils in 0xA3)
+class ReadPlan:
+
+    def __init__(self, registers_and_coils):
+        index = {}
+        for varname, vardef in registers_and_coils.items():
+            if vardef["read"]:
+                index.setdefault(vardef["varid"], []).append(varname)
+        self._index = {varid: tuple(varnames) for varid, varnames in index.items()}
+
+    # unique registers in read order
+    @property
+    def registers(self):
+        return tuple(self._index)
+
+    # variables decoded from one register
+    def variables(self, varid):
+        return self._index.get(varid, ())
+
+    # plan restricted to some registers (e.g. the ones due for polling)
+    def subset(self, varids):
+        plan = ReadPlan({})
+        plan._index = {varid: varnames for varid, varnames in self._index.items() if varid in varids}
+        return plan
+
+    # number of bus transactions needed for a full read (without retries)
+    @property
+    def transactions(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index.items())
+
+    def __len__(self):
+        return len(self._index)
+
+    def __repr__(self):
+        variables = sum(len(v) for v in self._index.values())
+        return f"ReadPlan({len(self._index)} registers, {variables} variables)"
+
+READ_PLAN = ReadPlan(REGISTERS_AND_COILS)
+
+# Tiered polling: every register has its own refresh interval. Defaults come from
+# REGISTER_POLL_CLASSES, entities in vent_conf.yaml may override them with
+# 'poll_interval' (a class name or seconds). A register shared by several
+# variables is polled as often as its most demanding variable requires.
+class PollScheduler:
+
+    def __init__(self, overrides=None, classes=None):
+        self._classes = dict(POLL_CLASSES)
+        self._classes.update(classes or {})
+        self._intervals = {}
+        for varname, vardef in REGISTERS_AND_COILS.items():
+            if not vardef["read"]:
+                continue
+            varid = vardef["varid"]
+            setting = (overrides or {}).get(varname, REGISTER_POLL_CLASSES.get(varid, "normal"))
+            interval = self._seconds(setting)
+            self._intervals[varid] = min(interval, self._intervals.get(varid, interval))
+        self._last_read = {} # varid -> monotonic time of the last successful read
+
+    # scheduler tick = shortest interval of all registers
+    @property
+    def tick(self):
+        return min(self._intervals.values())
+
+    # refresh interval of each register in seconds
+    @property
+    def intervals(self):
+        return dict(self._intervals)
+
+    # registers that are due for polling (never read ones are always due)
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        slack = self.tick / 2 # registers due before the next tick are read now
+        return {
+            varid for varid, interval in self._intervals.items()
+            if now - self._last_read.get(varid, float("-inf")) + slack >= interval
+        }
+
+    # remember successfully read registers
+    def mark(self, varids, now=None):
+        now = time.monotonic() if now is None else now
+        for varid in varids:
+            self._last_read[varid] = now
+
+    # force a register to be read in the next cycle (e.g. after a write)
+    def invalidate(self, varid):
+        self._last_read.pop(varid, None)
+
+    # convert a class name or a number of seconds to seconds
+    def _seconds(self, setting):
+        if isinstance(setting, str) and setting in self._classes:
+            return self._classes[setting]
+        return max(1, int(setting))
@@ -1,15 +1,82 @@
 import voluptuous as vol
 from homeassistant.const import CONF_IP_ADDRESS, CONF_PORT
 from homeassistant.helpers import config_validation as cv
-from .const import DOMAIN
+from .const import DOMAIN, POLL_CLASSES, PUSH_DEBOUNCE, PUSH_MIN_INTERVAL
+
+# polling interval: a class from POLL_CLASSES or seconds
+POLL_INTERVAL = vol.Any(vol.In(list(POLL_CLASSES)), vol.All(vol.Coerce(int), vol.Range(min=1)))
+
+# values per fan speed (0..8) from the ventilator curves: list or "0,60,90,..."
+PER_MODE = vol.All(
+    lambda value: value.split(",") if isinstance(value, str) else value,
+    [vol.Coerce(float)]
+)
+
+# polling interval per tier (see scheduler.py)
+POLL_INTERVALS = vol.Schema({vol.In(list(POLL_CLASSES)): vol.All(vol.Coerce(int), vol.Range(min=1))})
+
+# house and ventilator data for the derived metrics (see derived.py)
+HOUSE = vol.Schema(
+    {
+        vol.Optional("area"): vol.Coerce(float),
+        vol.Optional("volume"): vol.Coerce(float),
+        vol.Optional("isolation_factor", default=0.4): vol.Coerce(float),
+        vol.Optional("airflow_per_mode"): PER_MODE,
+        vol.Optional("power_per_mode"): PER_MODE,
+    }
+)
+
+# further units, each behind its own RS485 gateway; the name prefixes its entities
+# (e.g. 'attic': sensor.ventilation_attic_temperature_outdoor_air). Poll intervals
+# and house data default to the ones of the top level.
+GATEWAY = vol.Schema(
+    {
+        vol.Required("name"): cv.slug,
+        vol.Required(CONF_IP_ADDRESS): cv.string,
+        vol.Required(CONF_PORT): cv.port,
+        vol.Optional("poll_intervals"): POLL_INTERVALS,
+        vol.Optional("house"): HOUSE,
+    }
+)
+
+def _unique_gateway_names(gateways):
+    names = [gateway["name"] for gateway in gateways]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise vol.Invalid(f"Gateway names must be unique: {', '.join(duplicates)}")
+    return gateways
+
+def _any_gateway(config):
+    if CONF_IP_ADDRESS not in config and not config["gateways"]:
+        raise vol.Invalid("Either 'ip_address' / 'port' or 'gateways' must be given")
+    return config
 
 # Configuration schema
 CONFIG_SCHEMA = vol.Schema(
     {
-        DOMAIN: vol.Schema(
+        DOMAIN: vol.All(vol.Schema(
             {
-                vol.Required(CONF_IP_ADDRESS): cv.string,
-                vol.Required(CONF_PORT): cv.port,
+                # the default unit (entities 'ventilation_...'); optional if 'gateways' are given
+                vol.Inclusive(CONF_IP_ADDRESS, "gateway"): cv.string,
+                vol.Inclusive(CONF_PORT, "gateway"): cv.port,
+                vol.Optional("gateways", default=[]): vol.All(cv.ensure_list, [GATEWAY], _unique_gateway_names),
+                vol.Optional("poll_intervals", default={}): POLL_INTERVALS,
+                vol.Optional("house", default={}): HOUSE,
+                vol.Optional("push", default={}): vol.Schema(
+                    {
+                        vol.Optional("enabled", default=False): cv.boolean,
+                        vol.Optional("debounce", default=PUSH_DEBOUNCE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                        vol.Optional("min_interval", default=PUSH_MIN_INTERVAL): vol.All(
+                            vol.Coerce(float), vol.Range(min=0)
+                        ),
+                    }
+                ),
+                vol.Optional("metrics", default={}): vol.Schema(
+                    {
+                        vol.Optional("sensors", default=False): cv.boolean,
+                        vol.Optional("endpoint", default=False): cv.boolean,
+                    }
+                ),
                 vol.Optional("sensors", default=[]): vol.All(
                     cv.ensure_list,
                     [
@@ -24,6 +91,7 @@ CONFIG_SCHEMA = vol.Schema(
                                 vol.Optional("max_value"): vol.Coerce(float),
                                 vol.Optional("factory_setting"): vol.Coerce(float),
                                 vol.Optional("icon"): cv.icon,
+                                vol.Optional("poll_interval"): POLL_INTERVAL,
                             }
                         )
                     ],
@@ -37,6 +105,7 @@ CONFIG_SCHEMA = vol.Schema(
                                 vol.Optional("description"): cv.string,
                                 vol.Optional("device_class"): cv.string,
                                 vol.Optional("icon"): cv.icon,
+                                vol.Optional("poll_interval"): POLL_INTERVAL,
                             }
                         )
                     ],
@@ -50,12 +119,13 @@ CONFIG_SCHEMA = vol.Schema(
                                 vol.Optional("description"): cv.string,
                                 vol.Optional("device_class"): cv.string,
                                 vol.Optional("icon"): cv.icon,
+                                vol.Optional("poll_interval"): POLL_INTERVAL,
                             }
                         )
                     ],
                 ),
             }
-        )
+        ), _any_gateway)
     },
     extra=vol.ALLOW_EXTRA,
 )
@@ -64,4 +134,5 @@ CONFIG_SCHEMA = vol.Schema(
 SERVICE_WRITE_VALUE_SCHEMA = vol.Schema({
     vol.Required("variable"): cv.string,
     vol.Required("value"): vol.Coerce(int),
+    vol.Optional("unit"): cv.string,
 })
@@ -2,16 +2,34 @@ import logging
 from homeassistant.helpers.entity import Entity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.components.sensor import SensorEntity
+from homeassistant.const import EntityCategory
 from .const import DOMAIN
 
 # _LOGGER = logging.getLogger(__name__)
 _LOGGER = logging.getLogger("helios_vallox.sensor")
 
+# diagnostic sensors: key in HeliosCoordinator.metrics_summary, unit, icon
+DIAGNOSTIC_SENSORS = (
+    ("read_latency_p50_ms", "ms", "mdi:timer-outline"),
+    ("read_latency_p99_ms", "ms", "mdi:timer-alert-outline"),
+    ("refresh_mean_s", "s", "mdi:timer-sync-outline"),
+    ("retries", None, "mdi:repeat"),
+    ("crc_errors", None, "mdi:alert-circle-outline"),
+    ("timeouts", None, "mdi:timer-off-outline"),
+    ("reconnects", None, "mdi:lan-connect"),
+    ("bytes_received", "B", "mdi:download-network-outline"),
+    ("useful_bytes_ratio", None, "mdi:percent-outline"),
+    ("write_latency_p50_ms", "ms", "mdi:timer-edit-outline"),
+    ("write_latency_p99_ms", "ms", "mdi:timer-alert-outline"),
+    ("writes", None, "mdi:pencil-outline"),
+    ("write_failures", None, "mdi:pencil-off-outline"),
+)
+
 # platform setup
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     if discovery_info is None:
         return
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    coordinator = hass.data[DOMAIN]["coordinators"][discovery_info.get("unit")]
     entities = []
     sensor_config = discovery_info.get("sensors", [])
     for sensor in sensor_config:
@@ -25,7 +43,7 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                 variable=name,
                 coordinator=coordinator,
                 icon=sensor.get("icon"),
-                unique_id=f"ventilation_{name}",
+                unique_id=coordinator.unique_id(name),
                 description=sensor.get("description"),
                 unit_of_measurement=sensor.get("unit_of_measurement"),
                 device_class=sensor.get("device_class"),
@@ -35,6 +53,10 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                 factory_setting=sensor.get("factory_setting"),
             )
         )
+    if discovery_info.get("diagnostics"):
+        entities.extend(
+            HeliosDiagnosticSensor(coordinator, key, unit, icon) for key, unit, icon in DIAGNOSTIC_SENSORS
+        )
     async_add_entities(entities)
     hass.data.setdefault("ventilation_entities", []).extend(entities)
 
@@ -56,7 +78,7 @@ class HeliosSensor(CoordinatorEntity, SensorEntity):
         factory_setting=None,
     ):
         super().__init__(coordinator.coordinator)
-        self._attr_name = f"Ventilation {name}"
+        self._attr_name = coordinator.entity_name(name)
         self._variable = variable
         self._coordinator = coordinator
         self._attr_icon = icon
@@ -81,14 +103,39 @@ class HeliosSensor(CoordinatorEntity, SensorEntity):
             "max_value": self._attr_max_value,
             "factory_setting": self._attr_factory_setting,
             "description": self._attr_description,
+            **self._coordinator.state_attributes(self._variable),
         }
         return {k: v for k, v in attributes.items() if v is not None}
 
-    # add entity
+    # add entity and subscribe to changes of its variable
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
+        self.async_on_remove(
+            self._coordinator.async_add_variable_listener(self._variable, self.async_write_ha_state)
+        )
         self.async_write_ha_state()
 
-    # update entity
+    # updates are delivered per variable by the coordinator (changes only)
     def _handle_coordinator_update(self):
-        super()._handle_coordinator_update()
+        pass
+
+# diagnostic sensor class (bus driver metrics, updated on every refresh)
+class HeliosDiagnosticSensor(CoordinatorEntity, SensorEntity):
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_state_class = "measurement"
+
+    def __init__(self, coordinator, key, unit=None, icon=None):
+        super().__init__(coordinator.coordinator)
+        self._attr_name = coordinator.entity_name(f"bus {key}")
+        self._key = key
+        self._coordinator = coordinator
+        self._attr_icon = icon
+        self._attr_unique_id = coordinator.unique_id(f"bus_{key}")
+        self._attr_native_unit_of_measurement = unit
+        if unit is None and key != "useful_bytes_ratio": # counters
+            self._attr_state_class = "total_increasing"
+
+    @property
+    def native_value(self):
+        return self._coordinator.metrics_summary.get(self._key)
@@ -10,7 +10,7 @@ _LOGGER = logging.getLogger("helios_vallox.switch")
 async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
     if discovery_info is None:
         return
-    coordinator = hass.data[DOMAIN]["coordinator"]
+    coordinator = hass.data[DOMAIN]["coordinators"][discovery_info.get("unit")]
     entities = []
     switch_config = discovery_info.get("switches", [])
     for switch in switch_config:
@@ -24,7 +24,7 @@ async def async_setup_platform(hass, config, async_add_entities, discovery_info=
                 variable=name,
                 coordinator=coordinator,
                 icon=switch.get("icon"),
-                unique_id=f"ventilation_{name}",
+                unique_id=coordinator.unique_id(name),
                 description=switch.get("description"),
             )
         )
@@ -43,7 +43,7 @@ class HeliosSwitch(CoordinatorEntity, SwitchEntity):
         description=None,
     ):
         super().__init__(coordinator.coordinator)
-        self._attr_name = f"Ventilation {name}"
+        self._attr_name = coordinator.entity_name(name)
         self._variable = variable
         self._coordinator = coordinator
         self._attr_icon = icon
@@ -62,19 +62,24 @@ class HeliosSwitch(CoordinatorEntity, SwitchEntity):
     def extra_state_attributes(self):
         attributes = {
             "description": self._attr_description,
+            **self._coordinator.state_attributes(self._variable),
         }
         return {k: v for k, v in attributes.items() if v is not None}
 
-    # add entity
+    # add entity and subscribe to changes of its variable
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
         self.async_write_ha_state()
         self.async_on_remove(
-            self.coordinator.async_add_listener(self._handle_coordinator_update)
+            self._coordinator.async_add_variable_listener(self._variable, self._handle_variable_update)
         )
 
-    # update entity
+    # updates are delivered per variable by the coordinator (changes only)
     def _handle_coordinator_update(self):
+        pass
+
+    # update entity
+    def _handle_variable_update(self):
         new_value = self.coordinator.data.get(self._variable)
         if new_value is not None:
             self._attr_is_on = new_value == "on" or new_value is True
@@ -0,0 +1,287 @@
+# Offline traffic analysis of bus captures (hvcap, pcap or sniffer text logs, see capture.py)
+# Streams the captures with constant memory, so multi-GB / multi-day recordings are fine.
+# Reports:
+#  - bus utilisation per second (9600 baud, 10 bits per byte)
+#  - telegram rates per sender / receiver pair
+#  - reply latency per register (request -> reply of the mainboard)
+#  - unknown registers (not in const.py), jitter / collisions
+#  - cadence of the regular talkers (burst period, period jitter, burst duration)
+#  - free slot windows: phases of the talker cycles in which the bus is (almost) always quiet,
+#    relative to the regular talker with the longest cycle (own address _HA excluded)
+# Note: the former text sniffer logged several telegrams with one timestamp, latencies
+# from such logs are therefore not meaningful; binary captures of sniffer.py are.
+# How to use:
+#    python3 analyze_capture.py bus-*.hvcap [--json report.json] [--per-second util.csv]
+
+import argparse
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from const import BUS_ADDRESSES, BURST_GAP  # noqa: E402
+from codec import REGISTER_CODECS  # noqa: E402
+from capture import read_capture, is_telegram, address_text  # noqa: E402
+
+BYTE_TIME = 10 / 9600           # seconds on the wire per byte
+PHASE_BIN = 0.1                 # seconds per phase bin of the free slot analysis
+PHASE_HORIZON = 60              # seconds; longest talker cycle considered
+FREE_THRESHOLD = 0.1            # phase bins busy in less than 10% of the cycles count as free
+MIN_FREE_WINDOW = 0.3           # seconds; shorter free windows are not reported
+REGULAR_JITTER = 0.1            # talkers with a period deviation below 10% are regular
+MAINBOARDS = (BUS_ADDRESSES["MB*"], BUS_ADDRESSES["MB1"])
+
+
+# running mean / deviation / extrema (Welford)
+class RunningStats:
+
+    __slots__ = ("count", "mean", "_m2", "min", "max")
+
+    def __init__(self):
+        self.count, self.mean, self._m2 = 0, 0.0, 0.0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min, self.max = min(self.min, value), max(self.max, value)
+
+    @property
+    def deviation(self):
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self, scale=1.0, digits=3):
+        if not self.count:
+            return None
+        return {
+            "count": self.count,
+            "mean": round(self.mean * scale, digits),
+            "std": round(self.deviation * scale, digits),
+            "min": round(self.min * scale, digits),
+            "max": round(self.max * scale, digits),
+        }
+
+
+# bursts of one talker and the bus occupancy relative to the start of its bursts
+class TalkerCycle:
+
+    def __init__(self, start):
+        self.start = self.last = start
+        self.periods = RunningStats()       # time between burst starts
+        self.durations = RunningStats()     # burst lengths
+        self.busy = [0] * int(PHASE_HORIZON / PHASE_BIN)   # cycles with traffic per phase bin
+        self._marked = set()                # phase bins with traffic in the current cycle
+
+    def observe(self, timestamp):
+        if timestamp - self.last > BURST_GAP: # new burst of this talker
+            self.durations.add(self.last - self.start)
+            self.periods.add(timestamp - self.start)
+            for index in self._marked:
+                self.busy[index] += 1
+            self._marked.clear()
+            self.start = timestamp
+        self.last = timestamp
+
+    # any telegram on the bus, as phase relative to the current burst of this talker
+    def mark(self, timestamp):
+        index = int((timestamp - self.start) / PHASE_BIN)
+        if 0 <= index < len(self.busy):
+            self._marked.add(index)
+
+    # free windows (start, end) in seconds after the burst start, within one mean period
+    def free_windows(self, threshold=FREE_THRESHOLD):
+        cycles = self.periods.count
+        if cycles < 2:
+            return []
+        bins = min(len(self.busy), int(self.periods.mean / PHASE_BIN))
+        windows, start = [], None
+        for index in range(bins + 1):
+            free = index < bins and self.busy[index] < threshold * cycles
+            if free and start is None:
+                start = index
+            elif not free and start is not None:
+                if (index - start) * PHASE_BIN >= MIN_FREE_WINDOW:
+                    windows.append((round(start * PHASE_BIN, 1), round(index * PHASE_BIN, 1)))
+                start = None
+        return windows
+
+
+class CaptureAnalyzer:
+
+    def __init__(self, per_second=None, free_threshold=FREE_THRESHOLD):
+        self.records = 0
+        self.telegrams = 0
+        self.first = self.last = None
+        self.jitter_records = 0
+        self.jitter_bytes = 0
+        self.pairs = {}                     # (sender, receiver) -> telegrams
+        self.unknown = {}                   # varid -> telegrams
+        self.latency = {}                   # varid -> RunningStats of reply latencies
+        self.unanswered = {}                # varid -> requests without reply
+        self.utilisation = RunningStats()   # bus utilisation per second
+        self.talkers = {}                   # talker -> TalkerCycle
+        self._pending = {}                  # (requester, varid) -> request timestamp
+        self._second, self._second_bytes = None, 0
+        self._per_second = per_second       # optional file for the utilisation per second
+        self._free_threshold = free_threshold
+
+    def feed(self, timestamp, data):
+        self.records += 1
+        if self.first is None:
+            self.first = timestamp
+        self.last = timestamp
+        self._count_bytes(timestamp, len(data))
+        if not is_telegram(data):
+            self.jitter_records += 1
+            self.jitter_bytes += len(data)
+            return
+        self.telegrams += 1
+        sender, receiver, register, value = data[1], data[2], data[3], data[4]
+        pair = (sender, receiver)
+        self.pairs[pair] = self.pairs.get(pair, 0) + 1
+        varid = value if register == 0x00 else register
+        if varid not in REGISTER_CODECS:
+            self.unknown[varid] = self.unknown.get(varid, 0) + 1
+        if register == 0x00 and receiver in MAINBOARDS:
+            key = (sender, varid)
+            if key in self._pending: # previous request was never answered
+                self.unanswered[varid] = self.unanswered.get(varid, 0) + 1
+            self._pending[key] = timestamp
+        elif sender == BUS_ADDRESSES["MB1"]:
+            requested = self._pending.pop((receiver, register), None)
+            if requested is not None:
+                self.latency.setdefault(register, RunningStats()).add(timestamp - requested)
+        # cadence: replies belong to the cycle of the requester (like arbiter.py)
+        talker = receiver if sender == BUS_ADDRESSES["MB1"] else sender
+        cycle = self.talkers.get(talker)
+        if cycle is None:
+            self.talkers[talker] = TalkerCycle(timestamp)
+        else:
+            cycle.observe(timestamp)
+        for cycle in self.talkers.values():
+            cycle.mark(timestamp)
+
+    def _count_bytes(self, timestamp, size):
+        second = int(timestamp)
+        if self._second is None:
+            self._second = second
+        while second > self._second: # close the finished second(s), idle ones included
+            self._closeSecond()
+            if second - self._second > 3600: # capture gap (sniffer down): skip it
+                self._second = second
+        self._second_bytes += size
+
+    def _closeSecond(self):
+        share = self._second_bytes * BYTE_TIME
+        self.utilisation.add(share)
+        if self._per_second is not None:
+            self._per_second.write(f"{self._second},{self._second_bytes},{share * 100:.2f}\n")
+        self._second += 1
+        self._second_bytes = 0
+
+    def report(self):
+        if self._second_bytes:
+            self._closeSecond()
+        duration = (self.last - self.first) if self.records else 0
+        minutes = duration / 60 if duration else None
+        def rate(count):
+            return round(count / minutes, 2) if minutes else None
+        # reference: the regular talker with the longest cycle (usually the MB1 broadcasts)
+        reference = max(
+            (t for t in self.talkers.items()
+             if t[0] != BUS_ADDRESSES["_HA"] and t[1].periods.count >= 2
+             and t[1].periods.deviation < REGULAR_JITTER * t[1].periods.mean),
+            key=lambda t: t[1].periods.mean, default=None
+        )
+        return {
+            "duration_s": round(duration, 1),
+            "records": self.records,
+            "telegrams": self.telegrams,
+            "utilisation_percent": self.utilisation.summary(scale=100, digits=2),
+            "pairs_per_minute": {
+                address_text(*pair): rate(count) for pair, count in sorted(self.pairs.items(), key=lambda p: -p[1])
+            },
+            "reply_latency_ms": {
+                f"0x{varid:02X}": stats.summary(scale=1000, digits=1) for varid, stats in sorted(self.latency.items())
+            },
+            "unanswered_requests": {f"0x{varid:02X}": n for varid, n in sorted(self.unanswered.items())},
+            "unknown_registers": {f"0x{varid:02X}": n for varid, n in sorted(self.unknown.items())},
+            "jitter": {
+                "records": self.jitter_records,
+                "bytes": self.jitter_bytes,
+                "per_hour": round(self.jitter_records / duration * 3600, 2) if duration else None,
+            },
+            "cadence": {
+                f"0x{talker:02X}": {
+                    "period_s": cycle.periods.summary(),
+                    "burst_s": cycle.durations.summary(),
+                }
+                for talker, cycle in sorted(self.talkers.items()) if cycle.periods.count
+            },
+            "free_windows": {
+                "reference": f"0x{reference[0]:02X}" if reference else None,
+                "windows_s": reference[1].free_windows(self._free_threshold) if reference else [],
+                "per_talker": {
+                    f"0x{talker:02X}": cycle.free_windows(self._free_threshold) for talker, cycle in sorted(self.talkers.items())
+                },
+            },
+        }
+
+
+def print_report(report):
+    print(f"Duration: {report['duration_s']} s, {report['records']} records, {report['telegrams']} telegrams")
+    util = report["utilisation_percent"]
+    if util:
+        print(f"Bus utilisation per second: mean {util['mean']}%, max {util['max']}%")
+    print("\nTelegrams per minute (sender>receiver):")
+    for pair, value in report["pairs_per_minute"].items():
+        print(f"  {pair:10} {value}")
+    print("\nReply latency per register (ms):")
+    for varid, stats in report["reply_latency_ms"].items():
+        print(f"  {varid}  mean {stats['mean']:7}  max {stats['max']:7}  ({stats['count']} replies)")
+    if report["unanswered_requests"]:
+        print(f"\nUnanswered requests: {report['unanswered_requests']}")
+    print(f"\nUnknown registers: {report['unknown_registers'] or 'none'}")
+    jitter = report["jitter"]
+    print(f"Jitter / collisions: {jitter['records']} ({jitter['bytes']} bytes, {jitter['per_hour']} per hour)")
+    print("\nCadence per talker (period / burst length in s):")
+    for talker, cadence in report["cadence"].items():
+        period, burst = cadence["period_s"], cadence["burst_s"]
+        print(f"  {talker}  period {period['mean']} ± {period['std']}  burst {burst['mean']} (max {burst['max']})")
+    free = report["free_windows"]
+    if free["reference"]:
+        print(f"\nFree slot windows after the burst start of {free['reference']} (s): {free['windows_s']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic analysis of Helios bus captures")
+    parser.add_argument("captures", nargs="+", help="Capture files (hvcap, pcap or sniffer text log), in time order")
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--per-second", help="Write the bus utilisation per second (CSV) to this file")
+    parser.add_argument("--free-threshold", type=float, default=FREE_THRESHOLD,
+                        help="Max. share of cycles with traffic for a free slot (default 0.1)")
+    args = parser.parse_args()
+
+    per_second = open(args.per_second, "w", encoding="utf-8") if args.per_second else None
+    try:
+        if per_second is not None:
+            per_second.write("second,bytes,utilisation_percent\n")
+        analyzer = CaptureAnalyzer(per_second, args.free_threshold)
+        for path in args.captures:
+            for timestamp, data in read_capture(path):
+                analyzer.feed(timestamp, data)
+        report = analyzer.report()
+    finally:
+        if per_second is not None:
+            per_second.close()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
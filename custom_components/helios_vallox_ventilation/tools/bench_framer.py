@@ -0,0 +1,81 @@
+# Micro-benchmark for the telegram framer (framer.py)
+# Replays the bus bytes recorded in sniffer_example.log and compares the bulk
+# framer with the former byte-by-byte ring buffer of vent_functions.py.
+# Note: the ring buffer also reports spurious telegrams overlapping valid ones.
+# How to use:
+#    python3 bench_framer.py [--log sniffer_example.log] [--repeat 200] [--chunk 64]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framer import TelegramFramer  # noqa: E402
+
+
+def load_capture(path):
+    # bus bytes of a sniffer log: all 2-digit hex tokens following the timestamp
+    stream = bytearray()
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            for token in line.split()[2:]:
+                if len(token) != 2:
+                    break
+                try:
+                    stream.append(int(token, 16))
+                except ValueError:
+                    break
+    return bytes(stream)
+
+
+def ring_buffer(stream, chunk):
+    # reference: the former per-byte FIFO of _receiveTelegram, one recv(1) per byte
+    telegram, telegrams, reads = [0, 0, 0, 0, 0, 0], [], 0
+    for byte in stream:
+        reads += 1
+        telegram.pop(0)
+        telegram.append(byte)
+        if telegram[0] == 0x01:
+            crc = 0
+            for c in telegram[:-1]:
+                crc = crc + c
+            if telegram[5] == crc % 256:
+                telegrams.append(list(telegram))
+    return len(telegrams), reads
+
+
+def bulk_framer(stream, chunk):
+    framer = TelegramFramer()
+    found, reads = 0, 0
+    for pos in range(0, len(stream), chunk):
+        reads += 1
+        found += len(framer.feed(stream[pos:pos + chunk]))
+    return found, reads
+
+
+def measure(function, stream, chunk):
+    start = time.perf_counter()
+    found, reads = function(stream, chunk)
+    return time.perf_counter() - start, found, reads
+
+
+def main():
+    default_log = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sniffer_example.log")
+    parser = argparse.ArgumentParser(description="Benchmark the telegram framer")
+    parser.add_argument("--log", default=default_log, help="Sniffer log to replay")
+    parser.add_argument("--repeat", type=int, default=200, help="Replay the log n times")
+    parser.add_argument("--chunk", type=int, default=64, help="Bytes per simulated recv()")
+    args = parser.parse_args()
+
+    capture = load_capture(args.log)
+    stream = capture * args.repeat
+    print(f"{len(capture)} bytes in log, replaying {len(stream)} bytes in chunks of {args.chunk}")
+    for name, function in (("ring buffer", ring_buffer), ("bulk framer", bulk_framer)):
+        duration, found, reads = measure(function, stream, args.chunk)
+        rate = len(stream) / duration / 1e6
+        print(f"{name:12} {duration * 1000:8.1f} ms  {rate:6.2f} MB/s  {reads:8} recv() calls  {found} telegrams")
+
+
+if __name__ == "__main__":
+    main()
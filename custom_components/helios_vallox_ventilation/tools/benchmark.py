@@ -0,0 +1,176 @@
+# Benchmark suite for the bus driver (vent_async.py) against the simulated mainboard
+# Reports full-read wall time, telegrams per refresh, retries, registers read in
+# pipelined sessions and the request to reply latency of the register reads (p50 / p99).
+# Options:
+#  --units n    n simulated units (one gateway each) are read concurrently, like the
+#               coordinators of a multi-unit setup; a full read lasts as long as the slowest unit
+#  --writes n   n writes per refresh are issued while the refresh is running (like a switch
+#               pressed meanwhile); see write_latency_* in the metrics
+#  --push n     afterwards the first unit only listens for n seconds in push mode (see push.py)
+#               and reports the variables published from bus traffic and the requests sent
+#  --json file  stores the results to compare them across commits
+# How to use:
+#    python3 benchmark.py [--refreshes 5] [--chatter] [--crc-errors 0.02] [--units 3] [--json result.json]
+#    python3 benchmark.py --chatter --writes 2
+#    python3 benchmark.py --chatter --push 30
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vent_async import HeliosAsyncBase  # noqa: E402
+from scheduler import READ_PLAN  # noqa: E402
+from push import PushDebouncer  # noqa: E402
+from simulator import HeliosSimulator, DEFAULT_LOG, parse_registers  # noqa: E402
+
+
+def ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run(args):
+    simulators = [
+        HeliosSimulator(args.log, args.chatter, args.reply_delay, args.noise,
+                        args.crc_errors, args.collisions, args.drop, seed=args.seed + unit,
+                        absent=parse_registers(args.absent))
+        for unit in range(args.units)
+    ]
+    units = [HeliosAsyncBase(ip="127.0.0.1", port=await simulator.start()) for simulator in simulators]
+    helios = units[0] # detailed statistics of the first unit
+    durations, unit_durations, requests, retries, pipelined, failed = [], [], [], [], [], 0
+    push = None
+
+    async def read(unit):
+        start = time.perf_counter()
+        values = await unit.readValues(None, args.max_age, args.deadline)
+        return values, time.perf_counter() - start
+
+    try:
+        await asyncio.gather(*(unit.connect() for unit in units))
+        for _ in range(args.refreshes):
+            start = time.perf_counter()
+            writes = [asyncio.create_task(write(helios, n * 0.1)) for n in range(1, args.writes + 1)]
+            results = await asyncio.gather(*(read(unit) for unit in units))
+            await asyncio.gather(*writes)
+            durations.append(time.perf_counter() - start)
+            unit_durations.extend(duration for _, duration in results)
+            stats = helios.readStats()
+            requests.append(stats.get("requests", 0))
+            retries.append(stats.get("requests", 0) - stats.get("fetched", 0))
+            pipelined.append(stats.get("pipelined", 0))
+            failed += sum(1 for values, _ in results for value in (values or {}).values() if value is None)
+        if args.push:
+            push = await listen(helios, args.push)
+    finally:
+        for unit in units:
+            await unit.close()
+        for simulator in simulators:
+            await simulator.stop()
+    if args.openmetrics:
+        with open(args.openmetrics, "w", encoding="utf-8") as file:
+            file.write(helios.metrics.render())
+    return {
+        "refreshes": args.refreshes,
+        "units": args.units,
+        "registers": READ_PLAN.transactions,
+        "full_read_mean_s": round(statistics.mean(durations), 3),
+        "full_read_max_s": round(max(durations), 3),
+        "unit_read_mean_s": round(statistics.mean(unit_durations), 3),
+        "unit_read_max_s": round(max(unit_durations), 3),
+        "telegrams_per_refresh": round(statistics.mean(requests), 1),
+        "retries_per_refresh": round(statistics.mean(retries), 1),
+        "pipelined_per_refresh": round(statistics.mean(pipelined), 1),
+        "failed_values": failed,
+        # request to reply latency of all register reads, sessions included (histogram bucket bound)
+        "read_latency_p50_ms": ms(helios.metrics.get("register_read_seconds").quantile(0.5)),
+        "read_latency_p99_ms": ms(helios.metrics.get("register_read_seconds").quantile(0.99)),
+        "bus": helios.busStats(),
+        "latency": helios.latencyStats(),
+        "metrics": helios.metricsSummary(),
+        "simulator": simulators[0].stats,
+        "connection": helios.connectionStats(),
+        "push": push,
+    }
+
+
+# write during a refresh, 'delay' seconds after its start
+async def write(helios, delay):
+    await asyncio.sleep(delay)
+    await helios.writeValue("fanspeed", 3)
+
+
+# push mode: publish the changes seen on the bus for 'seconds', without reading
+async def listen(helios, seconds):
+    data, delays, seen = {}, [], {}
+    loop = asyncio.get_running_loop()
+
+    def publish(values):
+        data.update(values)
+        delays.extend(loop.time() - seen.pop(name, loop.time()) for name in values)
+
+    debouncer = PushDebouncer(publish, data.get)
+    def feed(values):
+        for name, value in values.items():
+            if value != data.get(name):
+                seen.setdefault(name, loop.time())
+        debouncer.feed(values)
+
+    helios.setChangeHandler(feed)
+    requests_before = helios.metrics.get("requests").total()
+    await asyncio.sleep(seconds)
+    helios.setChangeHandler(None)
+    debouncer.close()
+    return {
+        **debouncer.stats,
+        "publish_delay_p50_s": round(percentile(delays, 0.5), 3) if delays else None,
+        "publish_delay_max_s": round(max(delays), 3) if delays else None,
+        "requests": helios.metrics.get("requests").total() - requests_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Helios bus driver")
+    parser.add_argument("--refreshes", type=int, default=5, help="Number of full reads")
+    parser.add_argument("--max-age", type=float, default=0, help="Accept snooped values up to this age (s)")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="Sniffer log for register values and chatter")
+    parser.add_argument("--chatter", action="store_true", help="Replay FB1 polling and MB1 broadcasts")
+    parser.add_argument("--reply-delay", type=float, default=0.005, help="Mainboard reply delay (s)")
+    parser.add_argument("--noise", type=float, default=0.0, help="Probability of garbage bytes")
+    parser.add_argument("--crc-errors", type=float, default=0.0, help="Probability of CRC errors")
+    parser.add_argument("--collisions", type=float, default=0.0, help="Probability of collisions")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability of missing replies")
+    parser.add_argument("--absent", default="", help="Registers never answered, e.g. 2B,2C")
+    parser.add_argument("--deadline", type=float, help="Deadline per full read (s), partial result after that")
+    parser.add_argument("--writes", type=int, default=0, help="Writes issued during each refresh")
+    parser.add_argument("--push", type=float, default=0, help="Listen in push mode for n seconds")
+    parser.add_argument("--units", type=int, default=1, help="Number of units read concurrently")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for fault injection")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--openmetrics", help="Write the driver metrics (OpenMetrics text) to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the driver log")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    result = asyncio.run(run(args))
+    for key, value in result.items():
+        print(f"{key:24} {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Capture files for the Helios / Vallox bus, shared by sniffer.py (writing),
+# decode_capture.py (export) and the analysis tools (reading).
+#
+# Formats:
+#  - hvcap: 8 byte file header b"HVCAP\x00\x01\x00", then one record per telegram:
+#           float64 timestamp (seconds since epoch, little endian), uint8 length, data.
+#           Valid telegrams have 6 bytes; other lengths are jitter (bytes outside telegrams).
+#  - pcap:  classic libpcap file (link type USER0), readable by Wireshark / tcpdump.
+#  - text:  the log lines of the former sniffer (see sniffer_example.log), read only.
+# Readers stream the file in blocks, so multi-GB captures need no more memory than a block.
+
+import datetime
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codec import REGISTER_CODECS  # noqa: E402
+from framer import TelegramFramer, TELEGRAM_LENGTH  # noqa: E402
+
+HVCAP_MAGIC = b"HVCAP\x00\x01\x00"
+HVCAP_RECORD = struct.Struct("<dB")
+PCAP_HEADER = struct.Struct("<IHHiIII")
+PCAP_RECORD = struct.Struct("<IIII")
+PCAP_MAGIC = 0xA1B2C3D4
+PCAP_LINKTYPE_USER0 = 147
+BLOCK_SIZE = 1 << 20
+
+# bus address -> short name as used in the sniffer output
+ADDRESS_NAMES = {
+    0x10: "MB*",
+    0x11: "MB1",
+    0x20: "FB*",
+    0x21: "FB1",
+    0x2D: "HA1",
+    0x2E: "HA2",
+    0x2F: "SH_",
+}
+
+# register -> text of a read request, precomputed for all 256 varids
+REQUEST_TEXTS = tuple(
+    f"request {REGISTER_CODECS[varid][0].name}" if varid in REGISTER_CODECS
+    else f"request Unknown variable 0x{varid:02x}"
+    for varid in range(256)
+)
+
+###### Writing ################################################################
+
+class CaptureWriter:
+
+    def __init__(self, path, fmt="hvcap", rotate_size=None, rotate_interval=None):
+        self._base, extension = os.path.splitext(path)
+        self._extension = extension or f".{fmt}"
+        self._format = fmt
+        self._rotate_size = rotate_size             # bytes per file (None: no limit)
+        self._rotate_interval = rotate_interval     # seconds per file (None: no limit)
+        self._file = None
+        self._opened = 0.0
+        self._size = 0
+        self.path = None
+        self.records = 0
+
+    def _open(self, timestamp):
+        if self._rotate_size or self._rotate_interval: # one file per period / size limit
+            stamp = datetime.datetime.fromtimestamp(timestamp).strftime("%Y%m%d-%H%M%S")
+            self.path = f"{self._base}-{stamp}{self._extension}"
+        else:
+            self.path = self._base + self._extension
+        self._file = open(self.path, "wb", buffering=BLOCK_SIZE)
+        if self._format == "pcap":
+            header = PCAP_HEADER.pack(PCAP_MAGIC, 2, 4, 0, 0, 255, PCAP_LINKTYPE_USER0)
+        else:
+            header = HVCAP_MAGIC
+        self._file.write(header)
+        self._size = len(header)
+        self._opened = timestamp
+
+    def _rotate(self, timestamp):
+        return (
+            (self._rotate_size and self._size >= self._rotate_size)
+            or (self._rotate_interval and timestamp - self._opened >= self._rotate_interval)
+        )
+
+    # store one telegram (or jitter, up to 255 bytes per record)
+    def write(self, timestamp, data):
+        if self._file is None:
+            self._open(timestamp)
+        elif self._rotate(timestamp):
+            self.close()
+            self._open(timestamp)
+        for pos in range(0, len(data), 255):
+            chunk = data[pos:pos + 255]
+            if self._format == "pcap":
+                seconds = int(timestamp)
+                record = PCAP_RECORD.pack(seconds, int((timestamp - seconds) * 1e6), len(chunk), len(chunk))
+            else:
+                record = HVCAP_RECORD.pack(timestamp, len(chunk))
+            self._file.write(record)
+            self._file.write(chunk)
+            self._size += len(record) + len(chunk)
+            self.records += 1
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+###### Reading ################################################################
+
+# (timestamp, data) of all records in a capture file of any supported format
+def read_capture(path):
+    with open(path, "rb") as file:
+        head = file.read(len(HVCAP_MAGIC))
+        file.seek(0)
+        if head == HVCAP_MAGIC:
+            yield from _read_records(file, len(HVCAP_MAGIC), HVCAP_RECORD, _hvcap_record)
+        elif len(head) >= 4 and struct.unpack("<I", head[:4])[0] == PCAP_MAGIC:
+            yield from _read_records(file, PCAP_HEADER.size, PCAP_RECORD, _pcap_record)
+        else:
+            yield from _read_text(path)
+
+def _hvcap_record(fields):
+    return fields[0], fields[1]
+
+def _pcap_record(fields):
+    return fields[0] + fields[1] / 1e6, fields[2]
+
+def _read_records(file, header_size, layout, decode):
+    file.seek(header_size)
+    buffer, pos = b"", 0
+    unpack_from, size = layout.unpack_from, layout.size
+    while True:
+        block = file.read(BLOCK_SIZE)
+        if not block:
+            return
+        buffer = buffer[pos:] + block if pos < len(buffer) else block
+        pos, end = 0, len(buffer)
+        while pos + size <= end:
+            timestamp, length = decode(unpack_from(buffer, pos))
+            if pos + size + length > end:
+                break # record continues in the next block
+            yield timestamp, buffer[pos + size:pos + size + length]
+            pos += size + length
+
+# former sniffer log: "2025-03-01 23:04:01,975       01 21 11 00 a3 d6    FB1>MB1 ..."
+def _read_text(path):
+    framer = TelegramFramer()
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            try:
+                timestamp = datetime.datetime.strptime(
+                    f"{fields[0]} {fields[1]}", "%Y-%m-%d %H:%M:%S,%f"
+                ).timestamp()
+            except ValueError:
+                continue
+            data = bytearray()
+            for token in fields[2:]:
+                if len(token) != 2:
+                    break
+                try:
+                    data.append(int(token, 16))
+                except ValueError:
+                    break
+            if fields[-1] == "jitter": # bytes outside of telegrams, keep as they are
+                yield timestamp, bytes(data)
+                continue
+            for telegram in framer.feed(data):
+                yield timestamp, telegram
+
+###### Decoding ###############################################################
+
+def is_telegram(data):
+    return len(data) == TELEGRAM_LENGTH and data[0] == 0x01 and sum(data[:5]) & 0xFF == data[5]
+
+# "MB1>FB1", unknown addresses as hex
+def address_text(sender, receiver):
+    return (
+        f"{ADDRESS_NAMES.get(sender) or f'{sender:02x}'}>"
+        f"{ADDRESS_NAMES.get(receiver) or f'{receiver:02x}'}"
+    )
+
+# human readable content of a telegram: request or decoded register value(s)
+def describe(telegram):
+    register, value = telegram[3], telegram[4]
+    if register == 0x00:
+        return REQUEST_TEXTS[value]
+    codecs = REGISTER_CODECS.get(register)
+    if not codecs:
+        return f"unknown variable 0x{register:02x}"
+    texts = []
+    for codec in codecs:
+        decoded = codec.decode(value)
+        if codec.type == "bit":
+            texts.append(f"{codec.name} (Bit {codec.shift}): {int(decoded)}")
+        elif codec.type == "temperature":
+            texts.append(f"{codec.name}: {decoded}°C")
+        else:
+            texts.append(f"{codec.name}: {decoded}")
+    return " ".join(texts)
+
+# one line in the format of the former sniffer log
+def format_line(timestamp, data):
+    stamp = datetime.datetime.fromtimestamp(timestamp)
+    prefix = f"{stamp:%Y-%m-%d %H:%M:%S},{stamp.microsecond // 1000:03d}       "
+    hexdump = " ".join(f"{byte:02x}" for byte in data)
+    if not is_telegram(data):
+        return f"{prefix}{hexdump.ljust(20)} jitter"
+    return f"{prefix}{hexdump.ljust(20)} {address_text(data[1], data[2]).ljust(10)}{describe(data)}"
@@ -0,0 +1,89 @@
+# Decoder / exporter for bus captures (hvcap, pcap or text logs, see capture.py)
+# Streams the capture, so it works for multi-day recordings as well.
+# How to use:
+#    python3 decode_capture.py bus.hvcap                          (text, like sniffer_example.log)
+#    python3 decode_capture.py bus.hvcap --format csv -o bus.csv
+#    python3 decode_capture.py bus-*.hvcap --format json          (JSON lines)
+#    python3 decode_capture.py sniffer_example.log --format hvcap -o example.hvcap
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from codec import REGISTER_CODECS  # noqa: E402
+from capture import (  # noqa: E402
+    CaptureWriter, read_capture, format_line, is_telegram, address_text, describe
+)
+
+CSV_FIELDS = ("timestamp", "hex", "sender", "receiver", "register", "value", "kind", "variables", "text")
+
+
+# one record as a dict (CSV / JSON)
+def record_fields(timestamp, data):
+    fields = {"timestamp": round(timestamp, 3), "hex": data.hex(" ")}
+    if not is_telegram(data):
+        fields["kind"] = "jitter"
+        return fields
+    register, value = data[3], data[4]
+    fields.update(
+        sender=f"0x{data[1]:02x}",
+        receiver=f"0x{data[2]:02x}",
+        register=f"0x{register:02x}",
+        value=value,
+        kind="request" if register == 0x00 else "data",
+        text=f"{address_text(data[1], data[2])} {describe(data)}",
+    )
+    if register != 0x00:
+        fields["variables"] = {codec.name: codec.decode(value) for codec in REGISTER_CODECS.get(register, ())}
+    return fields
+
+
+def export(paths, fmt, output):
+    records = ((ts, data) for path in paths for ts, data in read_capture(path))
+    if fmt in ("hvcap", "pcap"):
+        writer = CaptureWriter(output, fmt)
+        for timestamp, data in records:
+            writer.write(timestamp, data)
+        writer.close()
+        return writer.records
+    count = 0
+    with open(output, "w", encoding="utf-8", newline="") if output else sys.stdout as file:
+        if fmt == "csv":
+            writer = csv.DictWriter(file, CSV_FIELDS)
+            writer.writeheader()
+        for timestamp, data in records:
+            count += 1
+            if fmt == "text":
+                file.write(format_line(timestamp, data) + "\n")
+                continue
+            fields = record_fields(timestamp, data)
+            if fmt == "json":
+                file.write(json.dumps(fields, ensure_ascii=False) + "\n")
+            else:
+                if "variables" in fields:
+                    fields["variables"] = " ".join(f"{k}={v}" for k, v in fields["variables"].items())
+                writer.writerow(fields)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode / export Helios bus captures")
+    parser.add_argument("captures", nargs="+", help="Capture files (hvcap, pcap or sniffer text log)")
+    parser.add_argument("--format", choices=("text", "csv", "json", "hvcap", "pcap"), default="text",
+                        help="Output format (json: one object per line)")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout; required for hvcap / pcap)")
+    args = parser.parse_args()
+    if args.format in ("hvcap", "pcap") and not args.output:
+        parser.error(f"--format {args.format} needs --output")
+    try:
+        count = export(args.captures, args.format, args.output)
+    except BrokenPipeError: # e.g. piped into head
+        return
+    print(f"{count} records exported.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
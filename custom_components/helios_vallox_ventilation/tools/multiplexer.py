@@ -0,0 +1,285 @@
+# Gateway multiplexer for Helios / Vallox ventilation devices
+# Holds the only connection to the RS485-TCP gateway and offers the same raw byte
+# stream to any number of local clients (HA, SmartHomeNG, vent_functions.py,
+# sniffer.py, ...), which simply connect to the multiplexer instead of the gateway:
+#  - every byte from the gateway is forwarded to all clients
+#  - telegrams sent by the clients are queued and put on the bus one at a time:
+#    in a quiet moment, outside of the predicted remote / broadcast bursts (see
+#    arbiter.py), and a read request only after the reply to the previous one
+#    (adaptive reply timeout, see latency.py). So the clients no longer collide
+#    with each other. Telegrams of clients gone meanwhile and read requests the
+#    client has given up on are dropped.
+#  - telegrams sent by one client are forwarded to the other clients, too (like
+#    a gateway shared by several clients), so a connected sniffer sees everything
+#  - optionally the bus traffic is captured right here (see sniffer.py / capture.py)
+# How to use:
+#    python3 multiplexer.py --ip 192.168.178.36 --port 502 --listen-port 5020 [--capture bus.hvcap]
+# and point the integration (ip_address / port in vent_conf.yaml) and the other clients to
+# this host and port 5020.
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from const import BUS_ADDRESSES, RECONNECT_MIN_DELAY, RECONNECT_MAX_DELAY  # noqa: E402
+from framer import TelegramFramer  # noqa: E402
+from arbiter import BusArbiter  # noqa: E402
+from latency import LatencyTracker  # noqa: E402
+from vent_async import SILENCE_TIME, SYNC_TIMEOUT, REPLY_TIMEOUT  # noqa: E402
+from capture import CaptureWriter  # noqa: E402
+from sniffer import Sniffer  # noqa: E402
+
+_LOGGER = logging.getLogger("helios_vallox.multiplexer")
+
+MAINBOARDS = (BUS_ADDRESSES["MB*"], BUS_ADDRESSES["MB1"])
+RECEIVE_SIZE = 4096         # bytes per read from the gateway / a client
+STATS_INTERVAL = 600        # seconds between statistics in the log
+CLIENT_TIMEOUT = REPLY_TIMEOUT # a client waits this long for a reply, then repeats the request
+
+
+class Multiplexer:
+
+    def __init__(self, ip, port, sniffer=None):
+        self._ip = ip
+        self._port = port
+        self._sniffer = sniffer             # optional Sniffer recording the bus traffic
+        self._writer = None                 # gateway connection
+        self._clients = {}                  # client writer -> name
+        self._queue = asyncio.Queue()       # (client writer, telegram, loop time queued) to put on the bus
+        self._arbiter = BusArbiter(own_address=None)
+        self._latency = LatencyTracker(REPLY_TIMEOUT, SILENCE_TIME, SYNC_TIMEOUT)
+        self._senders = set()               # bus addresses used by the clients
+        self._reply = None                  # (key, future, loop time sent) of the read request on the bus
+        self._last_activity = 0.0           # loop time of the last byte from the gateway
+        self._connected = asyncio.Event()
+        self._tasks = []
+        self._server = None
+        self.stats = {
+            "clients": 0,
+            "bytes_in": 0,
+            "telegrams_out": 0,
+            "requests": 0,
+            "replies": 0,
+            "reply_timeouts": 0,
+            "dropped": 0,
+            "queue_wait_max_ms": 0.0,
+            "reconnects": 0,
+        }
+
+    async def start(self, host="127.0.0.1", port=5020):
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._upstream()), loop.create_task(self._sendQueued())]
+        self._server = await asyncio.start_server(self._handleClient, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._clients):
+            writer.close()
+        if self._writer is not None:
+            self._writer.close()
+
+    ###### Gateway side ########################################################
+
+    # keep the gateway connection open, reconnect with back-off
+    async def _upstream(self):
+        failures, connects = 0, 0
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(self._ip, self._port)
+            except OSError as e:
+                failures += 1
+                delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** (failures - 1))
+                _LOGGER.error(f"Connection to {self._ip}:{self._port} failed: {e} (next attempt in {delay}s).")
+                await asyncio.sleep(delay)
+                continue
+            failures, connects = 0, connects + 1
+            self.stats["reconnects"] = connects - 1
+            _LOGGER.info(f"Connected to the gateway {self._ip}:{self._port}.")
+            self._connected.set()
+            try:
+                await self._receive(reader)
+            except ConnectionError as e:
+                _LOGGER.error(f"Connection lost: {e}")
+            finally:
+                self._connected.clear()
+                self._writer.close()
+                self._writer = None
+            await asyncio.sleep(RECONNECT_MIN_DELAY)
+
+    async def _receive(self, reader):
+        framer = TelegramFramer()
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await reader.read(RECEIVE_SIZE)
+            if not data:
+                _LOGGER.error("Connection closed by the gateway.")
+                return
+            self._last_activity = loop.time()
+            self.stats["bytes_in"] += len(data)
+            self._broadcast(data)
+            if self._sniffer is not None:
+                self._sniffer.feed(data)
+            for telegram in framer.feed(data):
+                self._observe(telegram)
+
+    def _observe(self, telegram):
+        sender, receiver, register = telegram[1], telegram[2], telegram[3]
+        if self._reply is not None and self._reply[0] == (sender, receiver, register):
+            self.stats["replies"] += 1
+            if not self._reply[1].done():
+                self._latency.record(asyncio.get_running_loop().time() - self._reply[2])
+                self._reply[1].set_result(True)
+        if sender not in self._senders and receiver not in self._senders:
+            self._arbiter.observe(telegram) # learn the cadence of the remote and the broadcasts
+
+    ###### Client side #########################################################
+
+    async def _handleClient(self, reader, writer):
+        name = "{}:{}".format(*writer.get_extra_info("peername")[:2])
+        self._clients[writer] = name
+        self.stats["clients"] += 1
+        _LOGGER.info(f"Client {name} connected ({len(self._clients)} clients).")
+        framer = TelegramFramer()
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await reader.read(RECEIVE_SIZE)
+                if not data:
+                    break
+                for telegram in framer.feed(data):
+                    self._senders.add(telegram[1])
+                    self._queue.put_nowait((writer, telegram, loop.time()))
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            writer.close()
+            _LOGGER.info(f"Client {name} disconnected ({len(self._clients)} clients).")
+
+    # data to all clients except the source
+    def _broadcast(self, data, source=None):
+        for writer in list(self._clients):
+            if writer is source:
+                continue
+            try:
+                writer.write(data)
+            except (ConnectionError, RuntimeError):
+                self._clients.pop(writer, None)
+
+    ###### Serialised sending ##################################################
+
+    # put the queued telegrams on the bus one at a time
+    async def _sendQueued(self):
+        loop = asyncio.get_running_loop()
+        last_stats = time.monotonic()
+        while True:
+            source, telegram, queued = await self._queue.get()
+            try:
+                await self._send(loop, source, telegram, queued)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e: # keep serving the other telegrams / clients
+                _LOGGER.error(f"Error sending {telegram.hex(' ')}: {e}", exc_info=True)
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                last_stats = time.monotonic()
+                _LOGGER.info(f"Statistics: {self.stats}, bus: {self._arbiter.stats}, latency: {self._latency.stats}")
+
+    async def _send(self, loop, source, telegram, queued):
+        while True: # the gateway connection may drop while waiting for a slot
+            await self._connected.wait()
+            await self._waitForSlot(loop)
+            if self._connected.is_set() and self._writer is not None:
+                break
+        sender, receiver, register, value = telegram[1], telegram[2], telegram[3], telegram[4]
+        request = register == 0x00 and receiver in MAINBOARDS
+        # client gone, or a request it has given up on (and sent again meanwhile): keep the bus free
+        if source not in self._clients or (request and loop.time() - queued > CLIENT_TIMEOUT):
+            self.stats["dropped"] += 1
+            return
+        if request: # reply: MB1 -> requester, register = requested varid
+            self._reply = ((BUS_ADDRESSES["MB1"], sender, value), loop.create_future(), loop.time())
+            self.stats["requests"] += 1
+        self.stats["queue_wait_max_ms"] = max(
+            self.stats["queue_wait_max_ms"], round((loop.time() - queued) * 1000, 1)
+        )
+        self._writer.write(telegram)
+        self.stats["telegrams_out"] += 1
+        self._last_activity = loop.time() + len(telegram) * 10 / 9600 # own bytes on the wire
+        self._broadcast(telegram, source)
+        if self._sniffer is not None:
+            self._sniffer.add(telegram)
+        if request:
+            try:
+                await asyncio.wait_for(self._reply[1], self._latency.replyTimeout())
+            except asyncio.TimeoutError:
+                self.stats["reply_timeouts"] += 1
+            finally:
+                self._reply = None
+
+    # wait for a quiet bus outside of the predicted bursts of the remote / broadcasts
+    async def _waitForSlot(self, loop):
+        silence = self._latency.silence()
+        deadline = loop.time() + self._latency.syncTimeout(self._arbiter.burstLength())
+        while loop.time() < deadline:
+            wait = self._arbiter.waitTime()
+            quiet = loop.time() - self._last_activity
+            if wait <= 0 and quiet >= silence:
+                return
+            await asyncio.sleep(max(wait, silence - quiet, 0.001))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Helios / Vallox gateway multiplexer")
+    parser.add_argument("--ip", default="192.168.178.36", help="IP address of the RS485 gateway")
+    parser.add_argument("--port", type=int, default=502, help="Port of the RS485 gateway")
+    parser.add_argument("--listen", default="0.0.0.0", help="Address to listen on for clients")
+    parser.add_argument("--listen-port", type=int, default=5020, help="Port to listen on for clients")
+    parser.add_argument("--capture", help="Binary capture file of the bus traffic (see capture.py)")
+    parser.add_argument("--format", choices=("hvcap", "pcap"), default="hvcap", help="Capture format")
+    parser.add_argument("--rotate-hours", type=float, help="Start a new capture file after n hours")
+    parser.add_argument("--verbose", action="store_true", help="Show debug output")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    capture = None
+    if args.capture:
+        capture = CaptureWriter(
+            args.capture, args.format,
+            rotate_interval=args.rotate_hours * 3600 if args.rotate_hours else None,
+        )
+
+    async def run():
+        sniffer = Sniffer(capture, quiet=True) if capture is not None else None
+        multiplexer = Multiplexer(args.ip, args.port, sniffer)
+        port = await multiplexer.start(args.listen, args.listen_port)
+        _LOGGER.info(f"Multiplexer for {args.ip}:{args.port} listening on {args.listen}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await multiplexer.stop()
+            if sniffer is not None:
+                sniffer.flush()
+            _LOGGER.info(f"Statistics: {multiplexer.stats}")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if capture is not None:
+            capture.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# Simulated Helios / Vallox mainboard behind an RS485-TCP gateway
+# Emulates MB1 with the register map of const.py: answers read requests, applies
+# writes and replays the remote control / broadcast chatter recorded in
+# sniffer_example.log. Noise, collisions and CRC errors can be injected.
+# Every telegram on the simulated bus is forwarded to all other clients, like a
+# real gateway does, so the sniffer can be connected as well.
+# How to use:
+#    python3 simulator.py [--port 5020] [--chatter] [--crc-errors 0.01] [--collisions 0.01]
+# and point the integration / vent_functions.py / sniffer.py to that port.
+
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from const import REGISTERS_AND_COILS, BUS_ADDRESSES  # noqa: E402
+from framer import TelegramFramer  # noqa: E402
+
+_LOGGER = logging.getLogger("helios_vallox.simulator")
+
+DEFAULT_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sniffer_example.log")
+BAUD_RATE = 9600                        # RS485 speed of the ventilation bus
+BYTE_TIME = 10 / BAUD_RATE              # 8N1: 10 bits per byte
+MAINBOARDS = (BUS_ADDRESSES["MB*"], BUS_ADDRESSES["MB1"])
+
+
+def telegram(sender, receiver, register, value):
+    data = bytearray((0x01, sender, receiver, register, value, 0))
+    data[5] = sum(data[:5]) & 0xFF
+    return bytes(data)
+
+
+def load_log(path):
+    # (seconds since start, telegram bytes) of all valid telegrams in a sniffer log
+    records, framer, start = [], TelegramFramer(), None
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) < 8:
+                continue
+            try:
+                stamp = datetime.datetime.strptime(f"{fields[0]} {fields[1]}", "%Y-%m-%d %H:%M:%S,%f")
+                data = bytes(int(token, 16) for token in fields[2:8])
+            except ValueError:
+                continue
+            for found in framer.feed(data):
+                start = start or stamp
+                records.append(((stamp - start).total_seconds(), found))
+    return records
+
+
+def parse_registers(text):
+    # "2B,2C" -> [0x2B, 0x2C]
+    return [int(token, 16) for token in text.replace(",", " ").split()]
+
+
+class HeliosSimulator:
+
+    def __init__(self, log=DEFAULT_LOG, chatter=False, reply_delay=0.005, noise=0.0,
+                 crc_errors=0.0, collisions=0.0, drop=0.0, seed=None, absent=()):
+        self.registers = bytearray(256)         # raw register values of MB1
+        self.chatter = chatter                  # replay FB1 polling and MB1 broadcasts
+        self.reply_delay = reply_delay          # mainboard processing time
+        self.noise = noise                      # probability of garbage bytes per telegram
+        self.crc_errors = crc_errors            # probability of a broken checksum
+        self.collisions = collisions            # probability of a reply colliding with chatter
+        self.drop = drop                        # probability of a missing reply
+        self.absent = set(absent)               # registers never answered (e.g. no CO2 sensor)
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "replies": 0, "writes": 0, "chatter": 0, "faults": 0}
+        self._clients = set()
+        self._bus = None
+        self._server = None
+        self._tasks = []
+        self._records = load_log(log) if log and os.path.exists(log) else []
+        self._initRegisters()
+
+    # register values as last seen in the log (fallback: 0)
+    def _initRegisters(self):
+        for _, found in self._records:
+            if found[1] == BUS_ADDRESSES["MB1"] and found[3] != 0x00:
+                self.registers[found[3]] = found[4]
+        for vardef in REGISTERS_AND_COILS.values():
+            if vardef["type"] == "temperature" and not self.registers[vardef["varid"]]:
+                self.registers[vardef["varid"]] = 0x64 # about 0°C
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._bus = asyncio.Lock()
+        self._server = await asyncio.start_server(self._handleClient, host, port)
+        if self.chatter and self._records:
+            self._tasks.append(asyncio.get_running_loop().create_task(self._replayChatter()))
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._clients):
+            writer.close()
+
+    # put bytes on the simulated bus (paced at the bus baud rate)
+    async def _transmit(self, data, source=None):
+        async with self._bus:
+            for writer in list(self._clients):
+                if writer is source:
+                    continue
+                try:
+                    writer.write(data)
+                except (ConnectionError, RuntimeError):
+                    self._clients.discard(writer)
+            await asyncio.sleep(len(data) * BYTE_TIME)
+
+    # mainboard output, subject to the configured faults
+    async def _send(self, data):
+        chance = self.random.random
+        if self.drop and chance() < self.drop:
+            self.stats["faults"] += 1
+            return
+        if self.collisions and chance() < self.collisions:
+            self.stats["faults"] += 1 # two senders at once: the bytes get mixed up
+            other = telegram(BUS_ADDRESSES["FB1"], BUS_ADDRESSES["MB1"], 0x00, 0xA3)
+            data = bytes(a | b for a, b in zip(data, other))
+        elif self.crc_errors and chance() < self.crc_errors:
+            self.stats["faults"] += 1
+            data = data[:5] + bytes(((data[5] + 1) & 0xFF,))
+        if self.noise and chance() < self.noise:
+            self.stats["faults"] += 1
+            data = bytes(self.random.randrange(256) for _ in range(self.random.randint(1, 4))) + data
+        await self._transmit(data)
+
+    async def _handleClient(self, reader, writer):
+        self._clients.add(writer)
+        framer = TelegramFramer()
+        try:
+            while True:
+                data = await reader.read(256)
+                if not data:
+                    break
+                for found in framer.feed(data):
+                    await self._transmit(found, source=writer) # other clients see it, too
+                    await self._process(found)
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    # mainboard logic: answer read requests, apply writes
+    async def _process(self, found):
+        sender, receiver, register, value = found[1:5]
+        if receiver not in MAINBOARDS:
+            return
+        if register == 0x00:
+            self.stats["requests"] += 1
+            if value in self.absent:
+                return
+            await asyncio.sleep(self.reply_delay)
+            self.stats["replies"] += 1
+            await self._send(telegram(BUS_ADDRESSES["MB1"], sender, value, self.registers[value]))
+        elif register != 0x06: # never touch 06h
+            self.stats["writes"] += 1
+            self.registers[register] = value
+
+    # replay remote polling and broadcasts with the recorded timing (values are live)
+    async def _replayChatter(self):
+        internal = (BUS_ADDRESSES["_HA"], BUS_ADDRESSES["_SH"], BUS_ADDRESSES["_H1"])
+        pattern = [(ts, found) for ts, found in self._records if found[1] not in internal and found[2] not in internal]
+        duration = pattern[-1][0] + 1 if pattern else 0
+        loop = asyncio.get_running_loop()
+        while pattern:
+            start = loop.time()
+            for ts, found in pattern:
+                await asyncio.sleep(max(0, start + ts - loop.time()))
+                self.stats["chatter"] += 1
+                sender, receiver, register, value = found[1:5]
+                if sender == BUS_ADDRESSES["MB1"]: # mainboard output: current register value
+                    if register != 0x00:
+                        await self._send(telegram(sender, receiver, register, self.registers[register]))
+                else:
+                    await self._transmit(found)
+            await asyncio.sleep(max(0, start + duration - loop.time()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated Helios / Vallox mainboard")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5020, help="Port to listen on")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="Sniffer log for register values and chatter")
+    parser.add_argument("--chatter", action="store_true", help="Replay FB1 polling and MB1 broadcasts")
+    parser.add_argument("--reply-delay", type=float, default=0.005, help="Mainboard reply delay (s)")
+    parser.add_argument("--noise", type=float, default=0.0, help="Probability of garbage bytes")
+    parser.add_argument("--crc-errors", type=float, default=0.0, help="Probability of CRC errors")
+    parser.add_argument("--collisions", type=float, default=0.0, help="Probability of collisions")
+    parser.add_argument("--drop", type=float, default=0.0, help="Probability of missing replies")
+    parser.add_argument("--absent", default="", help="Registers never answered, e.g. 2B,2C")
+    args = parser.parse_args()
+
+    async def run():
+        simulator = HeliosSimulator(args.log, args.chatter, args.reply_delay, args.noise,
+                                    args.crc_errors, args.collisions, args.drop,
+                                    absent=parse_registers(args.absent))
+        port = await simulator.start(args.host, args.port)
+        print(f"Simulated mainboard listening on {args.host}:{port} (Ctrl-C to stop)")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await simulator.stop()
+            print(simulator.stats)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,801 @@
+import asyncio
+import logging
+import socket
+import time
+
+try:
+    from .const import ( # HA
+        REGISTERS_AND_COILS,
+        BUS_ADDRESSES,
+        SOCKET_TIMEOUT,
+        RECONNECT_MIN_DELAY,
+        RECONNECT_MAX_DELAY,
+        KEEPALIVE_IDLE,
+        KEEPALIVE_INTERVAL,
+        KEEPALIVE_COUNT,
+        SNOOP_MAX_AGE,
+        PIPELINE_REPLY_TIMEOUT,
+        PIPELINE_MAX_MISSES,
+        SCAN_MIN_INTERVAL,
+        SCAN_REPLY_TIMEOUT
+    )
+    from .scheduler import READ_PLAN
+    from .framer import TelegramFramer
+    from .codec import CODECS, decodeRegister
+    from .arbiter import BusArbiter
+    from .latency import LatencyTracker, CircuitBreaker
+    from .metrics import MetricsRegistry, DURATION_BUCKETS
+    from .derived import DerivedEngine
+    from .bus_lock import PriorityLock, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_REFRESH
+except ImportError:
+    from const import ( # Shell / CLI for testing
+        REGISTERS_AND_COILS,
+        BUS_ADDRESSES,
+        SOCKET_TIMEOUT,
+        RECONNECT_MIN_DELAY,
+        RECONNECT_MAX_DELAY,
+        KEEPALIVE_IDLE,
+        KEEPALIVE_INTERVAL,
+        KEEPALIVE_COUNT,
+        SNOOP_MAX_AGE,
+        PIPELINE_REPLY_TIMEOUT,
+        PIPELINE_MAX_MISSES,
+        SCAN_MIN_INTERVAL,
+        SCAN_REPLY_TIMEOUT
+    )
+    from scheduler import READ_PLAN
+    from framer import TelegramFramer
+    from codec import CODECS, decodeRegister
+    from arbiter import BusArbiter
+    from latency import LatencyTracker, CircuitBreaker
+    from metrics import MetricsRegistry, DURATION_BUCKETS
+    from derived import DerivedEngine
+    from bus_lock import PriorityLock, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_REFRESH
+
+SILENCE_TIME = 0.007    # free sending slot length (minimum, see latency.py)
+SYNC_TIMEOUT = 1.0      # max. time to wait for a free sending slot (maximum, see latency.py)
+REPLY_TIMEOUT = 1.5     # max. time to wait for the reply to a read request (maximum, see latency.py)
+
+# calculate a telegram checksum (last byte / byte 6 of each telegram)
+def calculateCRC(telegram):
+    return sum(telegram[:5]) % 256
+
+# asyncio protocol: receives every byte on the bus, frames telegrams,
+# tracks bus activity and hands replies to waiting readers
+class HeliosBusProtocol(asyncio.Protocol):
+
+    def __init__(self, base):
+        self._base = base
+        self._loop = asyncio.get_running_loop()
+        self._transport = None
+        self.framer = TelegramFramer()          # bulk framer, see framer.py
+        self._waiters = {}                      # (sender, receiver, register) -> futures
+        self.last_activity = self._loop.time()  # loop time of the last received byte
+        self.closed = self._loop.create_future()
+
+    def connection_made(self, transport):
+        self._transport = transport
+
+    def connection_lost(self, exc):
+        self._transport = None
+        for futures in self._waiters.values():
+            for future in futures:
+                if not future.done():
+                    future.set_result(None)
+        self._waiters.clear()
+        if not self.closed.done():
+            self.closed.set_result(exc)
+        self._base._connectionLost(self, exc)
+
+    def data_received(self, data):
+        self.last_activity = self._loop.time()
+        crc_errors = self.framer.crc_errors
+        telegrams = self.framer.feed(data)
+        self._base._bytesReceived(len(data), len(telegrams), self.framer.crc_errors - crc_errors)
+        for telegram in telegrams:
+            self._base._telegramReceived(telegram)
+            futures = self._waiters.pop((telegram[1], telegram[2], telegram[3]), None)
+            if futures is None and telegram[2] == BUS_ADDRESSES["_HA"]:
+                self._base._lateReply(telegram[3]) # nobody waiting (anymore)
+            for future in futures or ():
+                if not future.done():
+                    future.set_result(telegram[4])
+
+    @property
+    def connected(self):
+        return self._transport is not None and not self._transport.is_closing()
+
+    # wait until the bus has been quiet for 'silence' seconds (checked on loop timers)
+    async def waitForSilence(self, silence, timeout):
+        deadline = self._loop.time() + timeout
+        while self.connected:
+            now = self._loop.time()
+            quiet = now - self.last_activity
+            if quiet >= silence:
+                return True
+            if now >= deadline:
+                return False
+            await asyncio.sleep(min(silence - quiet, deadline - now))
+        return False
+
+    # register interest in a reply before sending the request
+    def expect(self, sender, receiver, register):
+        future = self._loop.create_future()
+        self._waiters.setdefault((sender, receiver, register), []).append(future)
+        return future
+
+    # forget a reply that did not arrive in time
+    def forget(self, sender, receiver, register, future):
+        futures = self._waiters.get((sender, receiver, register), [])
+        if future in futures:
+            futures.remove(future)
+        if not futures:
+            self._waiters.pop((sender, receiver, register), None)
+
+    def write(self, data):
+        self._transport.write(data)
+
+    def close(self):
+        if self._transport is not None:
+            self._transport.close()
+
+
+class HeliosAsyncBase:
+
+    ###### Init ################################################################
+
+    def __init__(self, hass=None, ip=None, port=None, coordinator=None, limits=None):
+        # self.logger = logging.getLogger(__name__)
+        self.logger = logging.getLogger("helios_vallox.vent_async")
+        self._hass = hass
+        self._limits = limits or {}     # varname -> (min_value, max_value) of the sensors (HA only)
+        self._ip = ip
+        self._port = port
+        self._coordinator = coordinator
+        self._protocol = None
+        self._lock = PriorityLock()     # writes and single reads go before a refresh
+        self._all_values, self._cache = {}, {}
+        # connection manager state (one long-lived connection, see _connect)
+        self._connected_since = None    # monotonic time of the current connect
+        self._connects = 0              # successful connects in total
+        self._connect_failures = 0      # consecutive failed connects (back-off)
+        self._next_connect = 0.0        # earliest monotonic time for a new attempt
+        self._handshake_time = 0.0      # duration of the last connect in seconds
+        self._reused = 0                # calls served by an already open connection
+        # passive bus snooping: every valid telegram seen on the bus ends up here
+        self._registers = {}            # varid -> (raw value, monotonic timestamp)
+        # statistics of the last read (see readStats)
+        self._requests = 0              # read request telegrams sent (incl. retries)
+        self._read_stats = {}
+        # bus arbitration: learned traffic cadence, back-off and collision metrics
+        self._arbiter = BusArbiter()
+        # adaptive timeouts from the measured reply latency, quarantine of failing registers
+        self._latency = LatencyTracker(REPLY_TIMEOUT, SILENCE_TIME, SYNC_TIMEOUT)
+        self._breaker = CircuitBreaker()
+        self._sent = {}                 # varid -> loop time of the last read request
+        self._written = {}              # varid -> (raw value, monotonic time) of the last write
+        # push mode: handler for register values changing on the bus (see push.py)
+        self._on_change = None
+        self._pushed = {}               # varid -> raw value last handed to the handler
+        # calculated values without house data (fault text, heat recovery, ...; see derived.py)
+        self._derived = DerivedEngine()
+        # metrics (histograms and counters, see metrics.py)
+        self.metrics = MetricsRegistry()
+        self._initMetrics()
+
+    ###### Exposed functions (used from outside) ###############################
+
+    # reads a single variable from the ventilation
+    async def readSingleValue(self, varname):
+        async with self._lock(PRIORITY_READ):
+            if not await self._connect():
+                return {}
+            self._cache.pop(REGISTERS_AND_COILS[varname]["varid"], None)
+            try:
+                value = await self._performRead(varname)
+                return {varname: value}
+            except Exception as e:
+                self.logger.error(f"Exception in readSingleValue(): {e}")
+
+    # reads all known variables from the ventilation, including calculated values
+    async def readAllValues(self, max_age=SNOOP_MAX_AGE, deadline=None):
+        values = await self.readValues(None, max_age, deadline)
+        return self._addCalculationsToReadings(values)
+
+    # reads the variables of some registers (None = all), one bus transaction per register
+    # (registers snooped from the bus within max_age seconds are not requested again).
+    # After 'deadline' seconds no further registers are requested; registers not read
+    # (deadline, failures, exceptions) are returned as None, the rest as a partial result.
+    async def readValues(self, varids=None, max_age=SNOOP_MAX_AGE, deadline=None):
+        plan = READ_PLAN if varids is None else READ_PLAN.subset(varids)
+        async with self._lock(PRIORITY_REFRESH):
+            if not await self._connect():
+                return {}
+            values = {} # local: the lock may be released in between (see _sleepUnlocked)
+            if varids is None:
+                self._cache = {}
+            start_time, start_monotonic = time.time(), time.monotonic()
+            end = start_monotonic + deadline if deadline else None
+            requests_before, snooped, fetched = self._requests, 0, 0
+            raw, pipelined, quarantined, skipped = {}, {}, [], 0
+            try:
+                for varid in plan.registers:
+                    rawvalue = self._snoopedValue(varid, max_age)
+                    if rawvalue is not None:
+                        raw[varid] = rawvalue
+                        snooped += 1
+                missing = [varid for varid in plan.registers if varid not in raw]
+                quarantined = [varid for varid in missing if not self._breaker.allow(varid)]
+                if quarantined: # known to fail, don't let them stall the refresh
+                    missing = [varid for varid in missing if varid not in quarantined]
+                # one pipelined session for all missing registers, single reads as fallback
+                pipelined = await self._readSession(missing, end) if len(missing) > 1 else {}
+                raw.update(pipelined)
+                for varid in missing:
+                    if varid in raw:
+                        continue
+                    if end is not None and time.monotonic() >= end: # out of time: partial result
+                        skipped += 1
+                        continue
+                    await self._yieldBus()
+                    raw[varid] = await self._readRegister(varid, plan.variables(varid)[0], end)
+                fetched = len(missing) - skipped
+            except Exception as e:
+                self.logger.error(f"Exception in readValues(), returning a partial result: {e}")
+            for varid, written in self._written.items(): # written while the refresh had to wait
+                if written[1] >= start_monotonic and varid in raw:
+                    raw[varid] = written[0]
+            for varid, varnames in plan:
+                rawvalue = raw.get(varid)
+                if rawvalue is not None:
+                    self._cache[varid] = rawvalue
+                    values.update(decodeRegister(varid, rawvalue))
+                else:
+                    values.update(dict.fromkeys(varnames))
+            self._read_stats = {
+                "registers": plan.transactions,
+                "fetched": fetched,
+                "snooped": snooped,
+                "pipelined": len(pipelined),
+                "quarantined": len(quarantined),
+                "missing": sum(1 for varid in plan.registers if raw.get(varid) is None),
+                "deadline_skipped": skipped,
+                "requests": self._requests - requests_before,
+                "duration": round(time.time() - start_time, 3),
+            }
+            kind = "Full" if varids is None else "Partial"
+            self.metrics.get("read_seconds").observe(time.time() - start_time, kind=kind.lower())
+            self.logger.info(f"{kind} read took {time.time() - start_time:.2f}s ({fetched} registers read, {snooped} from bus snooping, {self._read_stats['missing']} missing).")
+            self._all_values = values
+            return values
+
+    # writes a single variable to the ventilation, including plausability checks
+    async def writeValue(self, varname, value):
+        results = await self.writeValues({varname: value})
+        return results.get(varname, False)
+
+    # writes several variables in one bus session, including plausability checks;
+    # all changes to the same register are merged into one telegram
+    async def writeValues(self, values):
+        start = time.monotonic()
+        results = {varname: False for varname in values}
+        registers = {} # varid -> [(varname, value)]
+        for varname, value in values.items():
+            if self._validateBeforeWrite(varname, value):
+                registers.setdefault(REGISTERS_AND_COILS[varname]["varid"], []).append((varname, value))
+        if not registers:
+            return results
+        async with self._lock(PRIORITY_WRITE):
+            if not await self._connect():
+                return results
+            for varid, changes in registers.items():
+                try:
+                    success = await self._writeRegister(varid, changes)
+                except Exception as e:
+                    self.logger.error(f"Exception in writeValues(): {e}")
+                    success = False
+                for varname, _ in changes:
+                    results[varname] = success
+                self.metrics.get("writes").inc(len(changes), result="ok" if success else "failed")
+        self.metrics.get("write_seconds").observe(time.monotonic() - start) # incl. waiting for the bus
+        return results
+
+    # register scanner: raw values of any registers (default: all varids 1..255, known or
+    # not) in one pipelined session, at most one request per 'interval' seconds; writes and
+    # single reads go first. Registers without a reply are None (see scanner.py).
+    async def scanRegisters(self, varids=None, interval=SCAN_MIN_INTERVAL):
+        varids = list(range(1, 256)) if varids is None else list(varids)
+        result = dict.fromkeys(varids)
+        async with self._lock(PRIORITY_REFRESH):
+            if await self._connect():
+                result.update(await self._readSession(varids, interval=interval, timeout=SCAN_REPLY_TIMEOUT, scan=True))
+        return result
+
+    # open the connection; the protocol keeps listening (and snooping) from now on
+    async def connect(self):
+        async with self._lock:
+            return await self._connect()
+
+    # close the connection (HA shutdown / end of CLI run)
+    async def close(self):
+        async with self._lock:
+            self._disconnect()
+
+    # cached register values picked up from the bus: {varid: (raw value, age in s)}
+    def snoopedRegisters(self):
+        now = time.monotonic()
+        return {varid: (raw, now - ts) for varid, (raw, ts) in self._registers.items()}
+
+    # statistics of the last read (registers, fetched, snooped, requests, duration)
+    def readStats(self):
+        return dict(self._read_stats)
+
+    # bus access statistics: collisions, slot wait time, retries per register, cadence
+    def busStats(self):
+        return self._arbiter.stats
+
+    # registers currently skipped by the circuit breaker
+    def quarantinedRegisters(self):
+        return {varid for varid, remaining in self._breaker.quarantined().items() if remaining > 0}
+
+    # reply latency, derived timeouts and registers in quarantine
+    def latencyStats(self):
+        return dict(self._latency.stats, quarantined=self._breaker.stats)
+
+    # the most important metrics as plain numbers (diagnostic sensors, benchmark)
+    def metricsSummary(self):
+        m = self.metrics
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+        received = m.get("bytes_received").total()
+        return {
+            "read_latency_p50_ms": ms(m.get("register_read_seconds").quantile(0.5)),
+            "read_latency_p99_ms": ms(m.get("register_read_seconds").quantile(0.99)),
+            "full_read_mean_s": round(m.get("read_seconds").mean(kind="full") or 0, 3),
+            "retries": m.get("retries").total(),
+            "crc_errors": m.get("crc_errors").total(),
+            "timeouts": m.get("timeouts").total(),
+            "reconnects": m.get("reconnects").total(),
+            "bytes_received": received,
+            "useful_bytes_ratio": round(m.get("telegram_bytes").total() / received, 3) if received else None,
+            "write_latency_p50_ms": ms(m.get("write_seconds").quantile(0.5)),
+            "write_latency_p99_ms": ms(m.get("write_seconds").quantile(0.99)),
+            "writes": m.get("writes").value(result="ok"),
+            "write_failures": m.get("writes").value(result="failed"),
+        }
+
+    # connection statistics: reconnects and age of the current connection
+    def connectionStats(self):
+        age = time.monotonic() - self._connected_since if self._connected_since else None
+        return {
+            "connected": self._protocol is not None and self._protocol.connected,
+            "connection_age": round(age, 1) if age is not None else None,
+            "connects": self._connects,
+            "reconnects": max(0, self._connects - 1),
+            "connect_failures": self._connect_failures,
+            "reused": self._reused,
+            "last_handshake_ms": round(self._handshake_time * 1000, 1),
+        }
+
+    ###### Internal functions (higher layers) ##################################
+
+    # metrics of the bus driver (see metrics.py)
+    def _initMetrics(self):
+        m = self.metrics
+        m.histogram("register_read_seconds", "Request to reply latency of a single register read.")
+        m.histogram("read_seconds", "Duration of a full or partial read of all due registers.", DURATION_BUCKETS)
+        m.counter("retries", "Repeated register read requests.")
+        m.counter("crc_errors", "Telegram starts with a wrong checksum.")
+        m.counter("timeouts", "Read requests without a reply in time.")
+        m.counter("reconnects", "Connections re-established to the RS485 gateway.",
+                  lambda: max(0, self._connects - 1))
+        m.counter("connect_failures", "Failed connection attempts.")
+        m.counter("bytes_received", "Bytes received from the bus.")
+        m.counter("telegram_bytes", "Received bytes belonging to valid telegrams.")
+        m.counter("requests", "Read request telegrams sent.", lambda: self._requests)
+        m.counter("writes", "Register writes by result.")
+        m.histogram("write_seconds", "Duration of a write, including the wait for the bus.")
+        m.counter("preemptions", "Refreshes interrupted for a write or single read.")
+        m.gauge("quarantined_registers", "Registers skipped by the circuit breaker.",
+                lambda: len(self.quarantinedRegisters()))
+        m.gauge("reply_timeout_seconds", "Current adaptive reply timeout.", self._latency.replyTimeout)
+
+    # read a single variable, cache registers containing single bits ('coils')
+    async def _performRead(self, varname):
+        varid = REGISTERS_AND_COILS[varname]["varid"]
+        if REGISTERS_AND_COILS[varname]["type"] == "bit" and varid in self._cache:
+            return self._convertFromRaw(varname, self._cache[varid])
+        value = await self._readRegister(varid, varname)
+        if value is None:
+            return None
+        if REGISTERS_AND_COILS[varname]["type"] == "bit":
+            self._cache[varid] = value
+        return self._convertFromRaw(varname, value)
+
+    # read the raw byte of a single register (label is only used for logging)
+    # caller must hold self._lock; it is released while backing off after a failure
+    # no retries after 'end' (monotonic time, deadline of the refresh)
+    async def _readRegister(self, varid, label, end=None):
+        try:
+            sender, receiver = BUS_ADDRESSES["_HA"], BUS_ADDRESSES["MB1"]
+            retry_count = 0
+            max_retries = 1 if self._breaker.tripped(varid) else 10 # trial read after quarantine
+            loop = asyncio.get_running_loop()
+            while retry_count < max_retries:
+                if retry_count and end is not None and time.monotonic() >= end: # deadline of the refresh
+                    return None
+                if not await self._syncWithRS485():
+                    return None
+                skipped = self._protocol.framer.skipped
+                reply = self._protocol.expect(receiver, sender, varid)
+                await self._sendTelegram(sender, receiver, 0, varid)  # request register
+                self._sent[varid] = loop.time()
+                self._requests += 1
+                value = await self._receiveTelegram(receiver, sender, varid, reply) # read response
+                if value is not None:
+                    self._recordLatency(varid)
+                    if self._breaker.recordSuccess(varid):
+                        self.logger.info(f"'{label}' answers again, quarantine lifted.")
+                    if retry_count > 1: # log multiple re-reads (a single one is ok)
+                        self.logger.info(f"Retries for {label}: {retry_count}.")
+                    return value
+                retry_count += 1
+                self.metrics.get("retries").inc()
+                # garbage on the bus means another client was talking at the same time
+                collision = self._protocol is not None and self._protocol.framer.skipped > skipped
+                self._arbiter.recordFailure(varid, collision)
+                # de-sync from other clients with a short random back-off, lock released
+                await self._sleepUnlocked(self._arbiter.backoff(retry_count))
+            # give up, too many re-reads
+            if self._breaker.recordFailure(varid):
+                self.logger.warning(f"'{label}' keeps failing, register 0x{varid:02X} is skipped for a while.")
+            elif not self._breaker.tripped(varid):
+                self.logger.error(f"Failed to read '{label}' after {retry_count} attempts.")
+            return None
+        except Exception as e:
+            self.logger.error(f"Exception in _readRegister(): {e}")
+            return None
+
+    # pipelined read session: one bus slot, the next request goes out as soon as the
+    # previous reply is in (but at most one per 'interval' seconds). Replies are matched by
+    # register, so late replies still count. Returns {varid: raw} for the registers answered;
+    # the rest is left to _readRegister. No further requests after 'end' (monotonic time,
+    # deadline of the refresh). PIPELINE_MAX_MISSES replies missing in a row end the session
+    # (someone else is on the bus); when scanning, absent registers are expected, so a
+    # register that answered before is asked again and only its miss ends the session.
+    async def _readSession(self, varids, end=None, interval=0, timeout=PIPELINE_REPLY_TIMEOUT, scan=False):
+        if not varids or not await self._syncWithRS485():
+            return {}
+        sender, receiver = BUS_ADDRESSES["_HA"], BUS_ADDRESSES["MB1"]
+        protocol = self._protocol
+        replies = {varid: protocol.expect(receiver, sender, varid) for varid in varids}
+        timeout = min(timeout, self._latency.replyTimeout())
+        loop = asyncio.get_running_loop()
+        misses = 0
+        known = REGISTERS_AND_COILS["fanspeed"]["varid"] if scan else None # answers for sure
+        try:
+            for varid in varids:
+                if replies[varid].done(): # answered late to an earlier request
+                    continue
+                if end is not None and time.monotonic() >= end: # deadline of the refresh
+                    break
+                if await self._yieldBus(): # a write went first: the bus is not ours anymore
+                    if not await self._syncWithRS485() or self._protocol is not protocol:
+                        break
+                elif self._arbiter.waitTime() > 0: # predicted remote / broadcast burst ahead
+                    if not await self._syncWithRS485() or self._protocol is not protocol:
+                        break
+                sent = loop.time()
+                if not await self._sendTelegram(sender, receiver, 0, varid, sync=False):
+                    break
+                self._sent[varid] = sent
+                self._requests += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(replies[varid]), timeout)
+                    self._recordLatency(varid)
+                    misses = 0
+                    known = varid if scan else None
+                except asyncio.TimeoutError:
+                    if not scan:
+                        self.metrics.get("timeouts").inc()
+                    misses += 1
+                    if misses >= PIPELINE_MAX_MISSES: # someone else is on the bus?
+                        if not scan or not await self._stillAnswering(protocol, known, timeout):
+                            break
+                        misses = 0
+                if self._protocol is not protocol or not protocol.connected:
+                    break
+                if interval:
+                    await asyncio.sleep(max(0.0, sent + interval - loop.time())) # rate limit
+            answered = {
+                varid: reply.result() for varid, reply in replies.items()
+                if reply.done() and not reply.cancelled() and reply.result() is not None
+            }
+            for varid in answered:
+                self._breaker.recordSuccess(varid)
+            return answered
+        finally:
+            for varid, reply in replies.items():
+                protocol.forget(receiver, sender, varid, reply)
+
+    # does the mainboard still answer a register that did before? (within a session)
+    async def _stillAnswering(self, protocol, varid, timeout):
+        sender, receiver = BUS_ADDRESSES["_HA"], BUS_ADDRESSES["MB1"]
+        reply = protocol.expect(receiver, sender, varid)
+        try:
+            if not await self._sendTelegram(sender, receiver, 0, varid, sync=False):
+                return False
+            self._requests += 1
+            await asyncio.wait_for(asyncio.shield(reply), timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.metrics.get("timeouts").inc()
+            return False
+        finally:
+            protocol.forget(receiver, sender, varid, reply)
+
+    # called by the protocol for every chunk of received data
+    def _bytesReceived(self, size, telegrams, crc_errors):
+        m = self.metrics
+        m.get("bytes_received").inc(size)
+        m.get("telegram_bytes").inc(6 * telegrams)
+        if crc_errors:
+            m.get("crc_errors").inc(crc_errors)
+
+    # book the latency of the reply to our last request for varid
+    def _recordLatency(self, varid):
+        sent = self._sent.pop(varid, None)
+        if sent is not None:
+            latency = asyncio.get_running_loop().time() - sent
+            self._latency.record(latency)
+            self.metrics.get("register_read_seconds").observe(latency)
+
+    # reply after its timeout: still a latency sample, so too short timeouts grow again
+    def _lateReply(self, varid):
+        sent = self._sent.get(varid)
+        if sent is not None and asyncio.get_running_loop().time() - sent <= REPLY_TIMEOUT:
+            self.logger.debug(f"Late reply for register 0x{varid:02X}.")
+            self._recordLatency(varid)
+
+    # sleep without blocking other bus users (caller holds self._lock)
+    async def _sleepUnlocked(self, seconds):
+        if seconds <= 0:
+            return
+        priority = self._lock.priority
+        self._lock.release()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await self._lock.acquire(priority)
+
+    # between two transactions of a refresh: let waiting writes / single reads go first
+    # (caller holds self._lock); returns True if the refresh was interrupted
+    async def _yieldBus(self):
+        if not self._lock.contended():
+            return False
+        self.metrics.get("preemptions").inc()
+        await self._lock.yieldLock()
+        return True
+
+    # add calculated values to the readings (see derived.py)
+    def _addCalculationsToReadings(self, all_values):
+        self._derived.update(all_values)
+        return all_values
+
+    # write one register; coils are read first, so the telegram carries all bit changes
+    # on top of the current register value (read-modify-write)
+    async def _writeRegister(self, varid, changes):
+        names = ", ".join(varname for varname, _ in changes)
+        if REGISTERS_AND_COILS[changes[0][0]]["type"] == "bit":
+            rawvalue = await self._readRegister(varid, names)
+            if rawvalue is None:
+                self.logger.error(f"Writing failed: Cannot read current value of {names}.")
+                return False
+        else:
+            rawvalue, changes = None, changes[-1:] # only the last value counts
+        for varname, value in changes:
+            rawvalue = self._convertToRaw(varname, value, rawvalue)
+            if rawvalue is None:
+                self.logger.error(f"Writing failed: Cannot convert {value}.")
+                return False
+        sender, receiver = BUS_ADDRESSES["_HA"], BUS_ADDRESSES["MB1"]
+        # the actual write
+        self.logger.info(f"Writing {', '.join(f'{v} to {k}' for k, v in changes)}")
+        if not await self._sendTelegram(sender, receiver, varid, rawvalue):
+            return False
+        for varname, value in changes:
+            self._all_values[varname] = value   # update entities and bitcache
+        self._cache[varid] = rawvalue
+        self._written[varid] = (rawvalue, time.monotonic())
+        self._registers.pop(varid, None) # snooped value is outdated now
+        self._pushed[varid] = rawvalue # published with the write, a later revert is a change
+        return True
+
+    # return a snooped raw register value if it is fresh enough
+    def _snoopedValue(self, varid, max_age):
+        entry = self._registers.get(varid)
+        if entry is None or not max_age or time.monotonic() - entry[1] > max_age:
+            return None
+        return entry[0]
+
+    # called by the protocol for every valid telegram on the bus
+    # register values sent by the mainboard (replies to anyone, broadcasts) are cached,
+    # those and writes to the mainboard (e.g. fan speed set on the remote) are pushed
+    def _telegramReceived(self, telegram):
+        self._arbiter.observe(telegram)
+        sender, receiver, register, value = telegram[1], telegram[2], telegram[3], telegram[4]
+        if register == 0x00:
+            return
+        if sender == BUS_ADDRESSES["MB1"]:
+            self._registers[register] = (value, time.monotonic())
+        elif receiver not in (BUS_ADDRESSES["MB*"], BUS_ADDRESSES["MB1"]):
+            return
+        if self._on_change is not None and self._pushed.get(register) != value:
+            self._pushed[register] = value
+            values = decodeRegister(register, value)
+            if values:
+                self._on_change(values)
+
+    # push mode: handler(values) gets the decoded variables of every register whose value
+    # changes on the bus (mainboard broadcasts and replies, writes of the remote control);
+    # no requests are sent for this
+    def setChangeHandler(self, handler):
+        self._on_change = handler
+        self._pushed = {}
+
+    ###### Internal functions (lower layers) ###################################
+
+    # connect to bus upon start and re-connect if needed (connection is kept open)
+    async def _connect(self):
+        if self._protocol is not None:
+            if self._protocol.connected:
+                self._reused += 1
+                return True
+            self.logger.debug("Connection lost, re-connecting to RS485.")
+            self._disconnect()
+        now = time.monotonic()
+        if now < self._next_connect: # still backing off after failed attempts
+            self.logger.debug(f"Reconnect delayed for {self._next_connect - now:.0f}s.")
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            _, protocol = await asyncio.wait_for(
+                loop.create_connection(lambda: HeliosBusProtocol(self), self._ip, self._port),
+                SOCKET_TIMEOUT
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            self._connect_failures += 1
+            self.metrics.get("connect_failures").inc()
+            delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** (self._connect_failures - 1))
+            self._next_connect = now + delay
+            self.logger.error(f"Connection failed: {e or 'timeout'} (next attempt in {delay}s).")
+            return False
+        self._protocol = protocol
+        self._setSocketOptions(protocol._transport.get_extra_info("socket"))
+        self._handshake_time = time.monotonic() - now
+        self._connected_since = time.monotonic()
+        self._connects += 1
+        self._connect_failures, self._next_connect = 0, 0.0
+        if self._connects > 1:
+            self.logger.info(f"Re-connected to RS485 (reconnect #{self._connects - 1}).")
+        return True
+
+    # keepalive / latency related socket options
+    def _setSocketOptions(self, sock):
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            for option, value in (("TCP_USER_TIMEOUT", int(SOCKET_TIMEOUT * 1000)), # not on every OS
+                                  ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+                                  ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+                                  ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+                if hasattr(socket, option):
+                    sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        except OSError as e:
+            self.logger.debug(f"Could not set socket options: {e}")
+
+    # called by the protocol when the gateway connection is gone
+    def _connectionLost(self, protocol, exc):
+        if protocol is self._protocol:
+            if exc is not None:
+                self.logger.error(f"Connection lost: {exc}")
+            self._connected_since = None
+
+    # disconnect from bus
+    def _disconnect(self):
+        if self._protocol is not None:
+            self.logger.debug("Disconnecting.")
+            self._protocol.close()
+            self._protocol = None
+            self._connected_since = None
+
+    # discover bus silence, return a free sending slot or a timeout
+    # (predicted bursts of the remote / mainboard broadcasts are waited out first)
+    async def _syncWithRS485(self):
+        wait = self._arbiter.waitTime()
+        if wait > 0:
+            self._arbiter.recordWait(wait)
+            await self._sleepUnlocked(wait)
+        if (self._protocol is None or not self._protocol.connected) and not await self._connect():
+            return False # lost during a scan and not back yet
+        return await self._protocol.waitForSilence(
+            self._latency.silence(), self._latency.syncTimeout(self._arbiter.burstLength())
+        )
+
+    # return entity value from a raw int received from the bus (see codec.py)
+    def _convertFromRaw(self, varname, rawvalue):
+        return CODECS[varname].decode(rawvalue)
+
+    # return a raw value from int/bool for writing to the bus (see codec.py)
+    def _convertToRaw(self, varname, value, currentval):
+        return CODECS[varname].encode(value, currentval)
+
+    # send a telegram to the RS485 (=register read request or register write)
+    async def _sendTelegram(self, sender, receiver, register, value, sync=True):
+        telegram = [ 0x01, sender, receiver, register, value, 0 ]
+        telegram[5] = calculateCRC(telegram)
+        if sync and not await self._syncWithRS485():
+            self.logger.error("Writing failed: No proper connection available.")
+            if self._protocol is None or not self._protocol.connected:
+                return False
+        try:
+            self._protocol.write(bytes(telegram))
+            return True
+        except (OSError, AttributeError) as e:
+            self.logger.error(f"Socket error during send: {e}")
+            self._disconnect()
+            return False
+
+    # wait for a telegram announced with expect() (called after sending a register read request)
+    async def _receiveTelegram(self, sender, receiver, register, reply):
+        try:
+            return await asyncio.wait_for(reply, self._latency.replyTimeout())
+        except asyncio.TimeoutError:
+            self.metrics.get("timeouts").inc()
+            self.logger.debug("Read timeout.")
+            return None
+        finally:
+            if self._protocol is not None:
+                self._protocol.forget(sender, receiver, register, reply)
+
+    # Plausibility checks before writing to the bus
+    def _validateBeforeWrite(self, varname, value):
+        # Check for valid variable name
+        if REGISTERS_AND_COILS.get(varname) is None:
+            self.logger.error(f"Writing stopped: Invalid variable '{varname}'.")
+            return False
+        # Prevent writing to register 06h (may cause irrepairable damage)
+        if REGISTERS_AND_COILS[varname]["varid"] == 0x06:
+            self.logger.critical("Writing stopped: 06h writes are prohibited.")
+            return False
+        # Prevent writing read-only variables
+        if REGISTERS_AND_COILS[varname]["write"] != True:
+            self.logger.error(f"Writing stopped: '{varname}' is read-only.")
+            return False
+        # Make sure value is int or bool
+        if not isinstance(value, (int, bool)):
+            if REGISTERS_AND_COILS[varname]["type"] == "bit":
+                if value in ['1', True, 'True', 'true', 'On', 'on', 'ON'] or \
+                value in ['0', False, 'False', 'false', 'Off', 'off', 'OFF']:
+                    self.logger.debug(f"Valid bool '{value}' detected.")
+                else:
+                    self.logger.error(f"Writing stopped: '{value}' is not a bool.")
+                    return False
+            else:
+                self.logger.error(f"Writing stopped: '{value}' is not an integer.")
+                return False
+        # Check if value is within allowed limits (sensors of vent_conf.yaml; HA only, not at CLI!)
+        min_value, max_value = self._limits.get(varname, (None, None))
+        min_value = int(min_value) if isinstance(min_value, (int, float)) else None
+        max_value = int(max_value) if isinstance(max_value, (int, float)) else None
+        self.logger.debug(f"Validating '{varname}': value={value}, min={min_value}, max={max_value}")
+        if min_value is not None and int(value) < min_value:
+            self.logger.error(f"Writing stopped: {value} below min of {min_value}.")
+            return False
+        if max_value is not None and int(value) > max_value:
+            self.logger.error(f"Writing stopped: {value} above max of {max_value}.")
+            return False
+        return True
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+
+try:
+    from .const import WRITE_COALESCE_DELAY # HA
+except ImportError:
+    from const import WRITE_COALESCE_DELAY # Shell / CLI for testing
+
+# _LOGGER = logging.getLogger(__name__)
+_LOGGER = logging.getLogger("helios_vallox.write_queue")
+
+# Write queue for switches and the write_value service. Writes arriving within
+# WRITE_COALESCE_DELAY are collected; a newer write to the same variable replaces
+# the pending one. The batch is handed to write_batch (HeliosAsyncBase.writeValues),
+# which merges bit changes per register, and on_flush is called once per batch.
+class WriteQueue:
+
+    def __init__(self, write_batch, on_flush=None, delay=WRITE_COALESCE_DELAY):
+        self._write_batch = write_batch
+        self._on_flush = on_flush
+        self._delay = delay
+        self._pending = {}      # varname -> value
+        self._waiters = {}      # varname -> futures of all callers
+        self._task = None       # running flush task (waiting or writing)
+        self.submitted = 0      # writes handed to the queue
+        self.superseded = 0     # writes replaced by a newer value before flushing
+        self.batches = 0        # bus sessions used for flushing
+
+    # queue a write and wait for its result (True / False)
+    async def submit(self, varname, value):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.submitted += 1
+        if varname in self._pending:
+            self.superseded += 1
+        self._pending[varname] = value
+        self._waiters.setdefault(varname, []).append(future)
+        if self._task is None:
+            self._task = loop.create_task(self._flush())
+        return await future
+
+    # queue statistics
+    @property
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "batches": self.batches,
+        }
+
+    # write everything pending; writes arriving meanwhile go into the next batch
+    async def _flush(self):
+        try:
+            while self._pending:
+                await asyncio.sleep(self._delay)
+                values, waiters = self._pending, self._waiters
+                self._pending, self._waiters = {}, {}
+                try:
+                    results = await self._write_batch(values)
+                except Exception as e:
+                    _LOGGER.error(f"Error writing {values}: {e}", exc_info=True)
+                    results = {}
+                self.batches += 1
+                for varname, futures in waiters.items():
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(bool(results.get(varname)))
+                if self._on_flush is not None:
+                    self._on_flush(values, results)
+        finally:
+            self._task = None
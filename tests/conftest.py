@@ -0,0 +1,20 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+# the modules are imported flat, like the CLI and the tools do (no Home Assistant needed)
+COMPONENT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom_components", "helios_vallox_ventilation"
+)
+sys.path.insert(0, COMPONENT)
+sys.path.insert(0, os.path.join(COMPONENT, "tools"))
+
+
+# the simulator tests talk TCP on localhost; Home Assistant's test harness (pytest-socket)
+# blocks sockets unless a test asks for 'socket_enabled', without it there is nothing to enable
+if importlib.util.find_spec("pytest_socket") is None:
+    @pytest.fixture
+    def socket_enabled():
+        yield
@@ -0,0 +1,104 @@
+import random
+
+from const import BUS_ADDRESSES, BURST_GAP, BACKOFF_BASE, BACKOFF_MAX
+from arbiter import BurstTracker, BusArbiter
+
+FB1, MB1, HA = BUS_ADDRESSES["FB1"], BUS_ADDRESSES["MB1"], BUS_ADDRESSES["_HA"]
+
+
+def telegram(sender, receiver, register=0x00, value=0x29):
+    return bytes((0x01, sender, receiver, register, value, 0))
+
+
+# remote control polling: a burst of 'size' request/reply pairs every 'period' seconds
+def _feed(arbiter, bursts, period=5.0, size=3, spacing=0.05, start=100.0):
+    now = start
+    for burst in range(bursts):
+        now = start + burst * period
+        for _ in range(size):
+            arbiter.observe(telegram(FB1, MB1), now)
+            arbiter.observe(telegram(MB1, FB1, 0x29, 3), now + spacing / 2)
+            now += spacing
+    return now
+
+
+def test_burst_tracker_groups_telegrams_and_learns_the_period():
+    tracker = BurstTracker(0.0)
+    tracker.observe(0.1)
+    tracker.observe(0.2) # same burst
+    assert tracker.periods == 0
+    tracker.observe(5.0)
+    assert tracker.periods == 1
+    assert tracker.period == 5.0 and abs(tracker.duration - 0.2) < 1e-9
+    assert tracker.predict(5.1) is None # not enough periods yet
+    tracker.observe(10.0)
+    start, end = tracker.predict(10.1)
+    assert start == 15.0 and end > start
+
+
+def test_prediction_rolls_forward_over_missed_bursts():
+    tracker = BurstTracker(0.0)
+    for now in (5.0, 10.0):
+        tracker.observe(now)
+    assert tracker.predict(30.1) == (30.0, 30.0 + BURST_GAP / 2)
+    assert tracker.predict(31.0)[0] == 35.0 # the one at 30 s is over
+
+
+def test_no_wait_while_the_cadence_is_unknown():
+    arbiter = BusArbiter()
+    _feed(arbiter, 2)
+    assert arbiter.cadence() == {}
+    assert arbiter.waitTime(now=109.9) == 0.0
+
+
+def test_transaction_is_moved_behind_a_predicted_burst():
+    arbiter = BusArbiter()
+    _feed(arbiter, 4) # bursts at 100, 105, 110, 115
+    period, duration = arbiter.cadence()[FB1]
+    assert abs(period - 5.0) < 0.01 and 0.0 < duration < BURST_GAP
+    assert arbiter.waitTime(now=117.0) == 0.0 # gap between two bursts
+    wait = arbiter.waitTime(now=119.99)
+    assert 0.0 < wait <= duration + BURST_GAP
+
+
+def test_own_telegrams_are_not_learned():
+    arbiter = BusArbiter(HA)
+    for burst in range(4):
+        arbiter.observe(telegram(HA, MB1), burst * 5.0)
+        arbiter.observe(telegram(MB1, HA, 0x29, 3), burst * 5.0 + 0.01)
+    assert arbiter.cadence() == {}
+
+
+def test_mainboard_replies_belong_to_the_requester():
+    arbiter = BusArbiter()
+    _feed(arbiter, 4)
+    assert set(arbiter.cadence()) == {FB1}
+
+
+def test_failures_and_waits_are_counted():
+    arbiter = BusArbiter()
+    arbiter.recordFailure(0x29, collision=True)
+    arbiter.recordFailure(0x29, collision=False)
+    arbiter.recordWait(0.25)
+    stats = arbiter.stats
+    assert stats["collisions"] == 1 and stats["timeouts"] == 1
+    assert stats["retries"] == {"0x29": 2}
+    assert stats["slot_wait_ms"] == 250.0 and stats["slot_waits"] == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    arbiter = BusArbiter(rng=random.Random(1))
+    for attempt in range(1, 10):
+        assert 0 <= arbiter.backoff(attempt) <= min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+
+
+def test_burst_length_is_the_longest_learned_burst():
+    arbiter = BusArbiter()
+    assert arbiter.burstLength() is None
+    _feed(arbiter, 4, size=3)
+    short = arbiter.burstLength()
+    arbiter.observe(telegram(BUS_ADDRESSES["_SH"], MB1), 100.0) # second talker, longer bursts
+    for burst in range(1, 4):
+        for step in range(6):
+            arbiter.observe(telegram(BUS_ADDRESSES["_SH"], MB1), 100.0 + burst * 7.0 + step * 0.1)
+    assert arbiter.burstLength() > short
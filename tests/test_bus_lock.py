@@ -0,0 +1,191 @@
+import asyncio
+
+import pytest
+
+from bus_lock import PriorityLock, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_REFRESH
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# queue waiters behind a held lock, release it and record the order they get it in
+async def _grantOrder(lock, waiters):
+    order = []
+
+    async def waiter(name, priority):
+        async with lock(priority):
+            order.append(name)
+
+    await lock.acquire(PRIORITY_REFRESH)
+    tasks = []
+    for name, priority in waiters:
+        tasks.append(asyncio.create_task(waiter(name, priority)))
+        await asyncio.sleep(0) # queued in this order
+    lock.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_uncontended_acquire_and_release():
+    async def scenario():
+        lock = PriorityLock()
+        assert not lock.locked()
+        async with lock(PRIORITY_READ):
+            assert lock.locked() and lock.priority == PRIORITY_READ
+        assert not lock.locked() and lock.priority is None
+        async with lock: # default priority
+            assert lock.priority == PRIORITY_REFRESH
+    run(scenario())
+
+
+def test_priority_order():
+    async def scenario():
+        return await _grantOrder(PriorityLock(), [
+            ("refresh", PRIORITY_REFRESH), ("read", PRIORITY_READ), ("write", PRIORITY_WRITE),
+        ])
+    assert run(scenario()) == ["write", "read", "refresh"]
+
+
+def test_fifo_within_priority():
+    async def scenario():
+        return await _grantOrder(PriorityLock(), [
+            ("write1", PRIORITY_WRITE), ("read1", PRIORITY_READ), ("write2", PRIORITY_WRITE),
+            ("read2", PRIORITY_READ), ("write3", PRIORITY_WRITE),
+        ])
+    assert run(scenario()) == ["write1", "write2", "write3", "read1", "read2"]
+
+
+def test_handover_counts_and_no_barging():
+    async def scenario():
+        lock = PriorityLock()
+        await lock.acquire(PRIORITY_REFRESH)
+        waiter = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        await asyncio.sleep(0)
+        lock.release() # handed over directly, the lock stays taken
+        assert lock.locked() and lock.priority == PRIORITY_WRITE and lock.handovers == 1
+        late = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        await waiter
+        await asyncio.sleep(0)
+        assert not late.done() # nobody barges in between
+        lock.release()
+        await late
+        lock.release()
+        assert not lock.locked()
+    run(scenario())
+
+
+def test_cancelled_waiter_is_skipped():
+    async def scenario():
+        lock = PriorityLock()
+        await lock.acquire(PRIORITY_REFRESH)
+        cancelled = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        other = asyncio.create_task(lock.acquire(PRIORITY_READ))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        lock.release()
+        await other
+        assert lock.priority == PRIORITY_READ
+        lock.release()
+        assert not lock.locked()
+    run(scenario())
+
+
+def test_cancel_after_handover_passes_the_lock_on():
+    async def scenario():
+        lock = PriorityLock()
+        await lock.acquire(PRIORITY_REFRESH)
+        first = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        second = asyncio.create_task(lock.acquire(PRIORITY_READ))
+        await asyncio.sleep(0)
+        lock.release() # handed over to 'first', which is cancelled before it runs
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        await asyncio.wait_for(second, 1) # not lost: passed on to the next waiter
+        assert lock.priority == PRIORITY_READ
+        lock.release()
+        assert not lock.locked()
+    run(scenario())
+
+
+def test_cancel_after_handover_without_other_waiters_frees_the_lock():
+    async def scenario():
+        lock = PriorityLock()
+        await lock.acquire(PRIORITY_REFRESH)
+        waiter = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        await asyncio.sleep(0)
+        lock.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not lock.locked()
+    run(scenario())
+
+
+def test_contended_only_for_higher_priority():
+    async def scenario():
+        lock = PriorityLock()
+        assert not lock.contended() # not even locked
+        await lock.acquire(PRIORITY_READ)
+        refresh = asyncio.create_task(lock.acquire(PRIORITY_REFRESH))
+        await asyncio.sleep(0)
+        assert not lock.contended() # lower priority waiting
+        write = asyncio.create_task(lock.acquire(PRIORITY_WRITE))
+        await asyncio.sleep(0)
+        assert lock.contended()
+        write.cancel()
+        await asyncio.sleep(0)
+        assert not lock.contended() # cancelled waiters do not count
+        lock.release()
+        await refresh
+        lock.release()
+    run(scenario())
+
+
+def test_yield_lets_higher_priority_go_first_then_continues():
+    async def scenario():
+        lock = PriorityLock()
+        order = []
+
+        async def write():
+            async with lock(PRIORITY_WRITE):
+                order.append("write")
+
+        async with lock(PRIORITY_REFRESH):
+            order.append("refresh 1")
+            task = asyncio.create_task(write())
+            await asyncio.sleep(0)
+            assert lock.contended()
+            await lock.yieldLock()
+            assert lock.priority == PRIORITY_REFRESH and not lock.contended()
+            order.append("refresh 2")
+        await task
+        return order
+
+    assert run(scenario()) == ["refresh 1", "write", "refresh 2"]
+
+
+def test_yield_requeues_behind_waiters_of_the_same_priority():
+    async def scenario():
+        lock = PriorityLock()
+        order = []
+
+        async def refresh(name, rounds):
+            async with lock(PRIORITY_REFRESH):
+                for n in range(rounds):
+                    order.append(f"{name} {n + 1}")
+                    await lock.yieldLock()
+
+        await lock.acquire(PRIORITY_WRITE) # both refreshes queue up meanwhile
+        first = asyncio.create_task(refresh("a", 2))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(refresh("b", 1))
+        await asyncio.sleep(0)
+        lock.release()
+        await asyncio.wait_for(asyncio.gather(first, second), 1)
+        assert not lock.locked()
+        return order
+
+    assert run(scenario()) == ["a 1", "b 1", "a 2"]
@@ -0,0 +1,55 @@
+from codec import CODECS, REGISTER_CODECS, decodeRegister, decodeSnapshot
+from const import REGISTERS_AND_COILS, NTC5K_TEMPERATURES, FANSPEEDS
+
+
+def test_one_codec_per_variable():
+    assert set(CODECS) == set(REGISTERS_AND_COILS)
+    assert all(codec.varid == REGISTERS_AND_COILS[name]["varid"] for name, codec in CODECS.items())
+    assert sum(len(codecs) for codecs in REGISTER_CODECS.values()) == len(CODECS)
+
+
+def test_temperatures():
+    codec = CODECS["temperature_outdoor_air"]
+    assert [codec.decode(raw) for raw in range(256)] == [int(t) for t in NTC5K_TEMPERATURES]
+    for raw in (0x32, 0x68, 0x98, 0xC8):
+        temperature = codec.decode(raw)
+        assert codec.decode(codec.encode(temperature)) == temperature
+    assert codec.encode(1000) is None
+
+
+def test_fanspeeds():
+    codec = CODECS["fanspeed"]
+    for raw, speed in FANSPEEDS.items():
+        assert codec.decode(raw) == speed and codec.encode(speed) == raw
+    assert codec.decode(0x02) == 1 # no valid bit pattern
+    assert codec.encode(9) is None
+
+
+def test_bits_need_the_current_register_value():
+    codec = CODECS["input_fan_off"] # bit 3 of 0x08
+    assert codec.decode(0b1000) is True and codec.decode(0b0111) is False
+    assert codec.encode(True) is None
+    assert codec.encode(True, 0b0001) == 0b1001
+    assert codec.encode("on", 0b0001) == 0b1001
+    assert codec.encode(False, 0b1111) == 0b0111
+    assert codec.encode("0", 0xFF) == 0xF7
+
+
+def test_decimals_and_thirds():
+    codec = CODECS["fault_number"]
+    assert codec.decode(7) == 7 and codec.encode(7) == 7
+    assert codec.encode(256) is None and codec.encode(-1) is None
+    hysteresis = CODECS["defrost_hysteresis"] # 1/3 °C steps
+    assert hysteresis.decode(9) == 3 and hysteresis.encode(3) == 9
+
+
+def test_decode_register_and_snapshot():
+    varid = REGISTERS_AND_COILS["input_fan_off"]["varid"]
+    values = decodeRegister(varid, 0b1000)
+    assert set(values) == {codec.name for codec in REGISTER_CODECS[varid]}
+    assert values["input_fan_off"] is True
+    assert decodeRegister(0x00, 1) == {}
+    snapshot = bytearray(256)
+    snapshot[REGISTERS_AND_COILS["fanspeed"]["varid"]] = 0x07
+    decoded = decodeSnapshot(bytes(snapshot))
+    assert set(decoded) == set(REGISTERS_AND_COILS) and decoded["fanspeed"] == 3
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+
+import pytest
+
+# the coordinator needs Home Assistant and its test harness
+common = pytest.importorskip("pytest_homeassistant_custom_component.common")
+
+from custom_components.helios_vallox_ventilation import coordinator as coordinator_module # noqa: E402
+from custom_components.helios_vallox_ventilation.coordinator import HeliosCoordinator # noqa: E402
+from custom_components.helios_vallox_ventilation.const import ( # noqa: E402
+    REGISTERS_AND_COILS,
+    BUS_ADDRESSES,
+    SNAPSHOT_STORAGE_VERSION
+)
+from simulator import HeliosSimulator, telegram # noqa: E402
+
+pytestmark = pytest.mark.usefixtures("socket_enabled") # the simulator listens on localhost
+
+SNAPSHOT = "helios_vallox_ventilation.snapshot"
+FB1, MB1 = BUS_ADDRESSES["FB1"], BUS_ADDRESSES["MB1"]
+FANSPEED_RAW = {1: 0x01, 2: 0x03, 3: 0x07, 4: 0x0F, 5: 0x1F, 6: 0x3F, 7: 0x7F, 8: 0xFF}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# Home Assistant test instance with a simulated mainboard
+@contextlib.asynccontextmanager
+async def _home_assistant(**options):
+    simulator = HeliosSimulator(**options)
+    port = await simulator.start()
+    async with common.async_test_home_assistant() as hass:
+        try:
+            yield hass, simulator, port
+        finally:
+            await hass.async_stop(force=True)
+            await simulator.stop()
+
+
+# another client on the bus (e.g. the remote control), talking to the mainboard
+@contextlib.asynccontextmanager
+async def _remote(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        yield writer
+    finally:
+        writer.close()
+
+
+# wait for something the coordinator does in the background
+async def _until(condition, timeout=5):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not condition():
+        assert loop.time() < end, "timed out"
+        await asyncio.sleep(0.01)
+
+
+# entity callback counting its calls
+def _listener(coordinator, variable, calls):
+    calls[variable] = 0
+    def update():
+        calls[variable] += 1
+    return coordinator.async_add_variable_listener(variable, update)
+
+
+def test_entities_are_only_told_about_their_own_changes(hass_storage):
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port)
+            calls = {}
+            _listener(coordinator, "fanspeed", calls)
+            remove = _listener(coordinator, "temperature_outdoor_air", calls)
+            coordinator.coordinator.async_set_updated_data({"fanspeed": 3, "temperature_outdoor_air": 5})
+            assert calls == {"fanspeed": 1, "temperature_outdoor_air": 1}
+            coordinator.coordinator.async_set_updated_data({"fanspeed": 4, "temperature_outdoor_air": 5})
+            assert calls == {"fanspeed": 2, "temperature_outdoor_air": 1}
+            assert coordinator.update_stats == {"written": 3, "suppressed": 1}
+            remove()
+            coordinator.coordinator.async_set_updated_data({"fanspeed": 4, "temperature_outdoor_air": 6})
+            assert calls == {"fanspeed": 2, "temperature_outdoor_air": 1}
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+    run(scenario())
+
+
+def test_refresh_reads_the_mainboard_and_notifies_changed_variables(hass_storage):
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            simulator.registers[0x29] = FANSPEED_RAW[3]
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port)
+            calls = {}
+            _listener(coordinator, "fanspeed", calls)
+            await coordinator.coordinator.async_refresh()
+            assert coordinator.coordinator.data["fanspeed"] == 3
+            assert calls["fanspeed"] == 1
+            await coordinator.coordinator.async_refresh() # nothing due, nothing changed
+            assert calls["fanspeed"] == 1
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+    run(scenario())
+
+
+def test_push_publishes_bus_changes_between_polls(hass_storage):
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            push = {"enabled": True, "debounce": 0.05, "min_interval": 0.3}
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port, push=push)
+            calls = {}
+            _listener(coordinator, "fanspeed", calls)
+            _listener(coordinator, "temperature_outdoor_air", calls)
+            await coordinator.coordinator.async_refresh()
+            requests = simulator.stats["requests"]
+            async with _remote(port) as remote:
+                remote.write(telegram(FB1, MB1, 0x29, FANSPEED_RAW[6])) # fan speed set on the remote
+                await _until(lambda: coordinator.coordinator.data["fanspeed"] == 6)
+            assert calls == {"fanspeed": 2, "temperature_outdoor_air": 1}
+            assert simulator.stats["requests"] == requests # nothing polled for it
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+    run(scenario())
+
+
+def test_restored_state_is_available_at_once_and_stale_until_read(hass_storage):
+    hass_storage[SNAPSHOT] = {
+        "version": SNAPSHOT_STORAGE_VERSION,
+        "key": SNAPSHOT,
+        "data": {
+            "saved": 1000.0,
+            "values": {"fanspeed": 2, "temperature_outdoor_air": 7},
+            "timestamps": {"fanspeed": 1000.0, "temperature_outdoor_air": 1000.0},
+        },
+    }
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            simulator.registers[0x29] = FANSPEED_RAW[5]
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port)
+            await coordinator.setup_coordinator()
+            assert coordinator.coordinator.data["fanspeed"] == 2
+            assert coordinator.coordinator.data["temperature_outdoor_air"] == 7
+            assert coordinator.state_attributes("fanspeed")["stale"] is True
+            await _until(lambda: coordinator.coordinator.data["fanspeed"] == 5)
+            assert coordinator.state_attributes("fanspeed") == {}
+            assert coordinator.state_attributes("temperature_outdoor_air") == {}
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+        assert hass_storage[SNAPSHOT]["data"]["values"]["fanspeed"] == 5
+    run(scenario())
+
+
+def test_derived_metrics_are_recalculated_instead_of_restored(hass_storage):
+    hass_storage[SNAPSHOT] = {
+        "version": SNAPSHOT_STORAGE_VERSION,
+        "key": SNAPSHOT,
+        "data": {
+            "saved": 1000.0,
+            "values": {"fanspeed": 2, "din_airflow_normal_exchange": 123, "temperature_gain": 9},
+            "timestamps": {"fanspeed": 1000.0, "din_airflow_normal_exchange": 1000.0},
+        },
+    }
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port, house={"area": 200})
+            await coordinator.setup_coordinator()
+            assert coordinator.coordinator.data["din_airflow_normal_exchange"] == 209 # area changed since
+            assert coordinator.coordinator.data["temperature_gain"] is None # temperatures not known yet
+            await _until(lambda: coordinator.coordinator.data["temperature_gain"] is not None)
+            assert coordinator.state_attributes("din_airflow_normal_exchange") == {}
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+        saved = hass_storage[SNAPSHOT]["data"]
+        assert "din_airflow_normal_exchange" not in saved["values"] and "temperature_gain" not in saved["values"]
+        assert "din_airflow_normal_exchange" not in saved["timestamps"]
+    run(scenario())
+
+
+def test_registers_missed_by_the_deadline_are_retried_soon(hass_storage, monkeypatch):
+    monkeypatch.setattr(coordinator_module, "REFRESH_DEADLINE", 0.1)
+    monkeypatch.setattr(coordinator_module, "MISSING_RETRY_DELAY", 0.6)
+    variables = [name for name, vardef in REGISTERS_AND_COILS.items() if vardef["read"]]
+    async def scenario():
+        async with _home_assistant() as (hass, simulator, port):
+            # the fast tier is due again within the slack of the scheduler when the retry runs
+            coordinator = HeliosCoordinator(hass, "127.0.0.1", port, poll_classes={"fast": 1})
+            reads, read_values = [], coordinator._helios.readValues
+            async def spy(varids, *args):
+                reads.append(set(varids))
+                return await read_values(varids, *args)
+            monkeypatch.setattr(coordinator._helios, "readValues", spy)
+            await coordinator.coordinator.async_refresh()
+            assert coordinator.coordinator.last_update_success
+            assert any(coordinator.coordinator.data.get(name) is None for name in variables)
+            missing = {REGISTERS_AND_COILS[name]["varid"] for name in variables
+                       if coordinator.coordinator.data.get(name) is None}
+            monkeypatch.setattr(coordinator_module, "REFRESH_DEADLINE", 30)
+            await _until(lambda: all(coordinator.coordinator.data.get(name) is not None for name in variables))
+            assert reads[1] == missing # the retry reads nothing else
+            assert coordinator.metrics.get("partial_refreshes").total() == 1
+            await coordinator.async_close()
+            await coordinator.coordinator.async_shutdown()
+    run(scenario())
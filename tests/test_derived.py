@@ -0,0 +1,92 @@
+from const import COMPONENT_FAULTS
+from derived import DerivedEngine, DERIVED_METRICS
+
+HOUSE = {
+    "area": 150, "volume": 375, "isolation_factor": 0.4,
+    "airflow_per_mode": [0, 60, 90, 120, 150, 180, 210, 240, 270],
+    "power_per_mode": [0, 10, 20, 30, 40, 50, 60, 70, 80],
+}
+READINGS = {
+    "temperature_outdoor_air": 0, "temperature_supply_air": 16,
+    "temperature_extract_air": 20, "temperature_exhaust_air": 4,
+    "fanspeed": 2, "input_fan_percent": 100, "output_fan_percent": 80,
+    "fault_number": 0, "rh_sensor1_raw": 0x33 + 102, "rh_sensor2_raw": 0,
+    "co2_sensor1_present": True, "co2_reading_upper_byte": 2, "co2_reading_lower_byte": 0x58,
+    "co2_setting_upper_byte": 3, "co2_setting_lower_byte": 0x20,
+}
+
+
+def test_metrics_are_in_dependency_order():
+    seen = set()
+    for metric in DERIVED_METRICS:
+        derived_inputs = metric.inputs & {m.name for m in DERIVED_METRICS}
+        assert derived_inputs <= seen, metric
+        seen.add(metric.name)
+
+
+def test_metrics_without_house_data_are_left_out():
+    names = DerivedEngine().names
+    assert "efficiency" in names and "effective_airflow" not in names
+    assert "din_airflow_normal_exchange" not in names
+    assert "effective_airflow" in DerivedEngine(HOUSE).names
+
+
+def test_full_calculation():
+    values = dict(READINGS)
+    results = DerivedEngine(HOUSE).update(values)
+    assert results["fault_text"] == COMPONENT_FAULTS.get(0, "-")
+    assert results["temperature_gain"] == 16 and results["temperature_reduction"] == 16
+    assert results["temperature_balance"] == 0
+    assert results["efficiency"] == 80
+    assert results["rh_sensor_1"] == 50 and results["rh_sensor_2"] == -1
+    assert results["co2_concentration"] == 600 and results["co2_setting"] == 800
+    assert results["din_airflow_normal_exchange"] == int(-0.001 * 150 ** 2 + 1.15 * 150 + 20)
+    assert results["effective_airflow"] == 72 # 90 m³/h at 80 % (slower fan)
+    assert results["electrical_power"] == 16
+    assert results["air_exchange_rate"] == round(72 / 375, 2)
+    assert results["heat_recovery_power"] == int(72 * 0.34 * 16)
+    assert all(values[name] == value for name, value in results.items())
+
+
+def test_edge_cases():
+    engine = DerivedEngine(HOUSE)
+    values = dict(READINGS, temperature_extract_air=0, temperature_supply_air=0,
+                  co2_sensor1_present=False, fanspeed=9)
+    results = engine.update(values)
+    assert results["efficiency"] == 100 # no div/0 with equal temperatures
+    assert results["co2_concentration"] == -1 # no CO2 sensor
+    assert results["effective_airflow"] is None # fan speed outside of the curves
+    assert results["air_exchange_rate"] is None and results["heat_recovery_power"] is None
+    values = {"temperature_outdoor_air": 0}
+    assert engine.update(values)["efficiency"] is None # temperatures incomplete
+
+
+def test_only_metrics_with_changed_inputs_are_recalculated():
+    engine = DerivedEngine(HOUSE)
+    values = dict(READINGS)
+    engine.update(values)
+    calculations = engine.calculations
+    values["co2_reading_lower_byte"] = 0x59
+    assert engine.update(values, changed=["co2_reading_lower_byte"]) == {"co2_concentration": 601}
+    assert engine.calculations == calculations + 1
+    assert engine.skipped == len(engine.names) - 1
+
+
+def test_results_feed_into_later_metrics():
+    engine = DerivedEngine(HOUSE)
+    values = dict(READINGS)
+    engine.update(values)
+    values["fanspeed"] = 3
+    results = engine.update(values, changed=["fanspeed"])
+    assert results["effective_airflow"] == 96
+    assert results["air_exchange_rate"] == round(96 / 375, 2)
+    assert results["heat_recovery_power"] == int(96 * 0.34 * 16)
+    assert "efficiency" not in results
+
+
+def test_unchanged_results_are_not_reported():
+    engine = DerivedEngine(HOUSE)
+    values = dict(READINGS)
+    engine.update(values)
+    values["input_fan_percent"] = 90 # the output fan (80 %) stays the slower one
+    assert engine.update(values, changed=["input_fan_percent"]) == {}
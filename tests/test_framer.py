@@ -0,0 +1,58 @@
+from framer import TelegramFramer
+
+
+# telegram with a valid checksum: 0x01, sender, receiver, register, value, checksum
+def telegram(sender, receiver, register, value):
+    return bytes([0x01, sender, receiver, register, value, (1 + sender + receiver + register + value) & 0xFF])
+
+
+T1 = telegram(0x11, 0x2E, 0x29, 0x01)
+T2 = telegram(0x21, 0x11, 0x00, 0x29)
+
+
+def test_complete_telegrams():
+    framer = TelegramFramer()
+    assert framer.feed(T1 + T2) == [T1, T2]
+    assert (framer.telegrams, framer.skipped, framer.crc_errors, framer.bytes_received) == (2, 0, 0, 12)
+
+
+def test_telegram_split_across_chunks():
+    framer = TelegramFramer()
+    assert framer.feed(T1[:4]) == []
+    assert framer.feed(T1[4:] + T2[:1]) == [T1]
+    assert framer.feed(T2[1:]) == [T2]
+    assert framer.skipped == 0
+
+
+def test_byte_by_byte():
+    framer = TelegramFramer()
+    found = [t for byte in T1 + T2 for t in framer.feed(bytes([byte]))]
+    assert found == [T1, T2]
+
+
+def test_garbage_is_skipped_and_reported():
+    jitter = []
+    framer = TelegramFramer(on_jitter=jitter.append)
+    assert framer.feed(b"\xff\x00" + T1 + b"\x7f" + T2) == [T1, T2]
+    assert framer.skipped == 3 and jitter == [b"\xff\x00", b"\x7f"]
+
+
+def test_wrong_checksum_resyncs_on_the_next_start():
+    broken = T1[:5] + bytes([T1[5] ^ 0xFF])
+    framer = TelegramFramer()
+    assert framer.feed(broken + T2) == [T2]
+    assert framer.crc_errors >= 1 and framer.skipped == len(broken)
+
+
+def test_start_byte_inside_data():
+    # 0x01 as value: the framer must not lose the following telegram
+    inner = telegram(0x11, 0x21, 0x01, 0x01)
+    framer = TelegramFramer()
+    assert framer.feed(inner + T1) == [inner, T1]
+
+
+def test_reset_discards_a_partial_telegram():
+    framer = TelegramFramer()
+    framer.feed(T1[:3])
+    framer.reset()
+    assert framer.feed(T2) == [T2]
@@ -0,0 +1,79 @@
+import pytest
+
+from history import HistoryStore, RingBuffer, Tier
+
+NOW = 1_700_000_000 - 1_700_000_000 % 3600 # full hour
+
+
+def test_ring_buffer_keeps_the_newest_rows_in_order():
+    buffer = RingBuffer(3, "df")
+    for n in range(5):
+        buffer.append(NOW + n, n)
+    assert buffer.size == 3
+    assert buffer.window() == [(NOW + 2, 2.0), (NOW + 3, 3.0), (NOW + 4, 4.0)]
+    assert buffer.window(NOW + 3) == [(NOW + 3, 3.0), (NOW + 4, 4.0)]
+    assert buffer.window(NOW + 2, NOW + 4) == [(NOW + 2, 2.0), (NOW + 3, 3.0)]
+
+
+def test_ring_buffer_oldest_and_fixed_size():
+    buffer = RingBuffer(3, "df")
+    nbytes = buffer.nbytes
+    buffer.append(NOW, 1)
+    assert buffer.oldest == float("-inf") # nothing overwritten yet
+    for n in range(1, 4):
+        buffer.append(NOW + n, n)
+    assert buffer.oldest == NOW + 1
+    assert buffer.nbytes == nbytes
+
+
+def test_tier_buckets_with_min_max_mean():
+    tier = Tier(300, 10)
+    for n, value in enumerate((1, 5, 3, 10)):
+        tier.add(NOW + n * 100, value) # 0, 100, 200 in the first bucket, 300 in the second
+    assert tier.window() == [(NOW, 1.0, 5.0, 3.0), (NOW + 300, 10.0, 10.0, 10.0)]
+    assert tier.window(NOW + 300) == [(NOW + 300, 10.0, 10.0, 10.0)] # open bucket included
+
+
+def test_record_skips_booleans_and_texts():
+    store = HistoryStore(raw_size=10, tiers={})
+    store.record({"temperature": 20, "efficiency": 81.5, "boost": True, "fault_text": "-"}, NOW)
+    assert store.variables == ["efficiency", "temperature"]
+    assert store.query("boost", NOW) is None
+
+
+def test_query_raw_and_tier():
+    store = HistoryStore(raw_size=100, tiers={"5min": (300, 10)})
+    for n in range(20):
+        store.record({"x": n}, NOW + n * 30)
+    raw = store.query("x", NOW + 300, resolution="raw")
+    assert raw["resolution"] == "raw" and raw["value"] == [float(n) for n in range(10, 20)]
+    tier = store.query("x", resolution="5min")
+    assert tier["time"] == [NOW, NOW + 300]
+    assert tier["min"] == [0.0, 10.0] and tier["max"] == [9.0, 19.0] and tier["mean"] == [4.5, 14.5]
+    with pytest.raises(ValueError):
+        store.query("x", resolution="1d")
+
+
+def test_auto_uses_raw_while_it_holds_every_sample():
+    # first hours after a start: nothing reaches back 24 h, but raw holds all samples
+    store = HistoryStore(raw_size=1440, tiers={"5min": (300, 288), "1h": (3600, 168)})
+    for n in range(120):
+        store.record({"x": n}, NOW - 3600 + n * 30)
+    result = store.query("x", NOW - 24 * 3600)
+    assert result["resolution"] == "raw" and len(result["time"]) == 120
+
+
+def test_auto_uses_the_finest_resolution_reaching_back():
+    store = HistoryStore(raw_size=10, tiers={"5min": (300, 1000), "1h": (3600, 10)})
+    for n in range(2000):
+        store.record({"x": n}, NOW + n * 30)
+    end = NOW + 1999 * 30
+    assert store.query("x", end - 60)["resolution"] == "raw"
+    assert store.query("x", NOW)["resolution"] == "5min"
+
+
+def test_auto_falls_back_to_the_resolution_with_the_oldest_data():
+    store = HistoryStore(raw_size=10, tiers={"5min": (300, 5), "1h": (3600, 10)})
+    for n in range(2000):
+        store.record({"x": n}, NOW + n * 30)
+    assert store.query("x", NOW - 3600)["resolution"] == "1h"
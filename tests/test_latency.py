@@ -0,0 +1,111 @@
+from const import (
+    LATENCY_MIN_SAMPLES,
+    REPLY_TIMEOUT_MIN,
+    SILENCE_MAX,
+    SYNC_TIMEOUT_MIN,
+    BURST_GAP,
+    BREAKER_THRESHOLD,
+    BREAKER_COOLDOWN,
+    BREAKER_MAX_COOLDOWN
+)
+from latency import LatencyTracker, CircuitBreaker
+
+DEFAULTS = (1.5, 0.007, 1.0) # reply timeout, silence, sync timeout of vent_async.py
+
+
+def _tracker(samples):
+    tracker = LatencyTracker(*DEFAULTS)
+    for seconds in samples:
+        tracker.record(seconds)
+    return tracker
+
+
+def test_defaults_until_enough_replies_were_measured():
+    tracker = _tracker([0.02] * (LATENCY_MIN_SAMPLES - 1))
+    assert not tracker.learned
+    assert tracker.replyTimeout() == DEFAULTS[0]
+    assert tracker.silence() == DEFAULTS[1]
+    assert tracker.syncTimeout() == DEFAULTS[2]
+
+
+def test_reply_timeout_follows_the_measured_latency():
+    tracker = _tracker([0.05] * LATENCY_MIN_SAMPLES)
+    assert tracker.learned
+    assert abs(tracker.replyTimeout() - 0.15) < 1e-9 # 3 x p99
+
+
+def test_reply_timeout_stays_within_its_limits():
+    assert _tracker([0.001] * LATENCY_MIN_SAMPLES).replyTimeout() == REPLY_TIMEOUT_MIN
+    assert _tracker([2.0] * LATENCY_MIN_SAMPLES).replyTimeout() == DEFAULTS[0]
+
+
+def test_percentiles_and_ewma():
+    tracker = _tracker([0.01 * n for n in range(1, 101)])
+    assert tracker.percentile(0.5) == 0.5
+    assert tracker.percentile(0.99) == 0.99
+    assert tracker.count == 100
+    assert 0.01 < tracker.mean < 1.0 and tracker.deviation > 0
+    assert LatencyTracker(*DEFAULTS).percentile(0.5) is None
+
+
+def test_silence_covers_the_request_reply_gap():
+    assert _tracker([0.001] * LATENCY_MIN_SAMPLES).silence() == DEFAULTS[1]
+    assert DEFAULTS[1] < _tracker([0.03] * LATENCY_MIN_SAMPLES).silence() <= SILENCE_MAX
+    assert _tracker([1.0] * LATENCY_MIN_SAMPLES).silence() == SILENCE_MAX
+
+
+def test_sync_timeout_follows_the_longest_burst():
+    tracker = LatencyTracker(*DEFAULTS)
+    assert tracker.syncTimeout(None) == DEFAULTS[2] # cadence unknown
+    assert tracker.syncTimeout(0.0) == max(SYNC_TIMEOUT_MIN, BURST_GAP)
+    assert tracker.syncTimeout(0.3) == 0.3 + BURST_GAP
+    assert tracker.syncTimeout(5.0) == DEFAULTS[2]
+
+
+def test_stats_in_milliseconds():
+    stats = _tracker([0.02] * LATENCY_MIN_SAMPLES).stats
+    assert stats["replies"] == LATENCY_MIN_SAMPLES
+    assert stats["latency_p50_ms"] == 20.0 and stats["reply_timeout_ms"] == 100.0
+
+
+def test_breaker_quarantines_after_repeated_failures():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD - 1):
+        assert breaker.recordFailure(0x2B, now=0) is False
+    assert breaker.allow(0x2B, now=0)
+    assert breaker.recordFailure(0x2B, now=0) is True
+    assert not breaker.allow(0x2B, now=BREAKER_COOLDOWN - 1)
+    assert breaker.tripped(0x2B)
+    assert breaker.quarantined(now=100) == {0x2B: BREAKER_COOLDOWN - 100}
+    assert breaker.allow(0x2C, now=0) # other registers are not affected
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD - 1):
+        breaker.recordFailure(0x2B, now=0)
+    assert breaker.recordSuccess(0x2B) is False # was not in quarantine
+    assert breaker.recordFailure(0x2B, now=0) is False
+
+
+def test_trial_read_after_the_cooldown():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD):
+        breaker.recordFailure(0x2B, now=0)
+    assert breaker.allow(0x2B, now=BREAKER_COOLDOWN)
+    assert breaker.recordSuccess(0x2B) is True # back
+    assert not breaker.tripped(0x2B) and breaker.quarantined() == {}
+
+
+def test_failed_trial_read_doubles_the_cooldown_up_to_the_limit():
+    breaker = CircuitBreaker()
+    for _ in range(BREAKER_THRESHOLD):
+        breaker.recordFailure(0x2B, now=0)
+    now, cooldown = BREAKER_COOLDOWN, BREAKER_COOLDOWN
+    while cooldown < BREAKER_MAX_COOLDOWN:
+        assert breaker.recordFailure(0x2B, now=now) is False # no new quarantine, a longer one
+        cooldown = min(BREAKER_MAX_COOLDOWN, cooldown * 2)
+        assert breaker.quarantined(now=now) == {0x2B: cooldown}
+        now += cooldown
+    breaker.recordFailure(0x2B, now=now)
+    assert breaker.quarantined(now=now) == {0x2B: BREAKER_MAX_COOLDOWN}
@@ -0,0 +1,111 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from const import BUS_ADDRESSES, LATENCY_MIN_SAMPLES
+from vent_async import HeliosAsyncBase, REPLY_TIMEOUT
+from simulator import HeliosSimulator, telegram
+from multiplexer import Multiplexer, CLIENT_TIMEOUT
+
+pytestmark = pytest.mark.usefixtures("socket_enabled") # the simulator listens on localhost
+
+REGISTERS = {0x29, 0x32, 0x33, 0x34, 0x35, 0xA3}
+HA, MB1 = BUS_ADDRESSES["_HA"], BUS_ADDRESSES["MB1"]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# simulated mainboard behind a multiplexer, with drivers connected to the multiplexer
+@contextlib.asynccontextmanager
+async def _multiplexed(clients=2, **options):
+    simulator = HeliosSimulator(**options)
+    gateway = await simulator.start()
+    multiplexer = Multiplexer("127.0.0.1", gateway)
+    port = await multiplexer.start(port=0)
+    drivers = [HeliosAsyncBase(ip="127.0.0.1", port=port) for _ in range(clients)]
+    try:
+        yield simulator, multiplexer, drivers
+    finally:
+        for helios in drivers:
+            await helios.close()
+        await multiplexer.stop()
+        await simulator.stop()
+
+
+def test_clients_share_the_gateway_one_request_at_a_time():
+    async def scenario():
+        async with _multiplexed() as (simulator, multiplexer, drivers):
+            results = await asyncio.gather(*(helios.readValues(REGISTERS, max_age=0) for helios in drivers))
+            assert results[0] == results[1]
+            assert all(value is not None for value in results[0].values())
+            # same bus address: a reply to one client may answer the other one's request, too
+            assert len(REGISTERS) <= multiplexer.stats["requests"] <= 2 * len(REGISTERS)
+            assert simulator.stats["requests"] == multiplexer.stats["replies"] == multiplexer.stats["requests"]
+            assert multiplexer.stats["reply_timeouts"] == 0
+            assert multiplexer._latency.count == multiplexer.stats["replies"]
+    run(scenario())
+
+
+def test_telegrams_of_one_client_reach_the_others():
+    async def scenario():
+        async with _multiplexed() as (simulator, multiplexer, (writer, listener)):
+            changes = []
+            listener.setChangeHandler(changes.append)
+            assert await listener.connect()
+            assert await writer.writeValue("fanspeed", 4)
+            await asyncio.sleep(0.1)
+            assert simulator.registers[0x29] == 0x0F
+            assert {"fanspeed": 4} in changes
+    run(scenario())
+
+
+def test_requests_queued_while_the_gateway_is_gone_are_sent_after_the_reconnect():
+    async def scenario():
+        async with _multiplexed(clients=1) as (simulator, multiplexer, (helios,)):
+            assert await helios.connect()
+            await asyncio.sleep(0.1)
+            multiplexer._writer.transport.abort() # gateway drops the connection
+            await asyncio.sleep(0)
+            values = await helios.readValues({0x29}, max_age=0)
+            assert values["fanspeed"] is not None
+            assert multiplexer.stats["reconnects"] == 1
+    run(scenario())
+
+
+def test_reply_timeout_follows_the_measured_latency():
+    async def scenario():
+        async with _multiplexed(clients=1, absent={0x2B}) as (simulator, multiplexer, (helios,)):
+            assert await helios.connect()
+            await asyncio.sleep(0.1)
+            for _ in range(LATENCY_MIN_SAMPLES):
+                multiplexer._latency.record(0.01)
+            loop = asyncio.get_running_loop()
+            (client,) = multiplexer._clients
+            start = loop.time()
+            await multiplexer._send(loop, client, telegram(HA, MB1, 0x00, 0x2B), loop.time()) # no reply
+            assert loop.time() - start < REPLY_TIMEOUT / 2
+            assert multiplexer.stats["reply_timeouts"] == 1
+    run(scenario())
+
+
+def test_stale_requests_and_telegrams_of_gone_clients_are_dropped():
+    async def scenario():
+        async with _multiplexed(clients=1) as (simulator, multiplexer, (helios,)):
+            assert await helios.connect()
+            await asyncio.sleep(0.1)
+            loop = asyncio.get_running_loop()
+            (client,) = multiplexer._clients
+            requests = simulator.stats["requests"]
+            request = telegram(HA, MB1, 0x00, 0x29)
+            await multiplexer._send(loop, client, request, loop.time() - CLIENT_TIMEOUT - 0.1) # client gave up
+            await helios.close()
+            await asyncio.sleep(0.1)
+            await multiplexer._send(loop, client, request, loop.time()) # client gone
+            await multiplexer._send(loop, client, telegram(HA, MB1, 0x29, 0x0F), loop.time())
+            assert multiplexer.stats["dropped"] == 3
+            assert multiplexer.stats["telegrams_out"] == 0
+            assert simulator.stats["requests"] == requests and simulator.stats["writes"] == 0
+    run(scenario())
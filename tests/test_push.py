@@ -0,0 +1,122 @@
+import asyncio
+
+from push import PushDebouncer
+
+DEBOUNCE = 0.05
+MIN_INTERVAL = 0.3
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# debouncer publishing into 'data', with the loop time of every batch
+def _debouncer(data):
+    batches = []
+
+    def publish(values):
+        batches.append((asyncio.get_running_loop().time(), dict(values)))
+        data.update(values)
+
+    return PushDebouncer(publish, data.get, DEBOUNCE, MIN_INTERVAL), batches
+
+
+def test_changes_are_published_together_after_the_debounce():
+    async def scenario():
+        data = {"fanspeed": 1, "temperature_outdoor_air": 5}
+        debouncer, batches = _debouncer(data)
+        start = asyncio.get_running_loop().time()
+        debouncer.feed({"fanspeed": 3, "temperature_outdoor_air": 6})
+        await asyncio.sleep(DEBOUNCE / 2)
+        assert not batches
+        await asyncio.sleep(DEBOUNCE)
+        assert [values for _, values in batches] == [{"fanspeed": 3, "temperature_outdoor_air": 6}]
+        assert batches[0][0] - start >= DEBOUNCE - 0.01
+        assert debouncer.stats == {"received": 2, "published": 2, "dropped": 0, "batches": 1, "pending": 0}
+    run(scenario())
+
+
+def test_known_values_are_not_published():
+    async def scenario():
+        debouncer, batches = _debouncer({"fanspeed": 1})
+        debouncer.feed({"fanspeed": 1})
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert not batches and debouncer.stats["pending"] == 0
+    run(scenario())
+
+
+def test_flip_back_before_the_debounce_is_dropped():
+    async def scenario():
+        debouncer, batches = _debouncer({"fanspeed": 1})
+        debouncer.feed({"fanspeed": 2})
+        debouncer.feed({"fanspeed": 1})
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert not batches and debouncer.dropped == 1
+    run(scenario())
+
+
+def test_superseded_change_is_dropped_and_restarts_the_debounce():
+    async def scenario():
+        debouncer, batches = _debouncer({"fanspeed": 1})
+        debouncer.feed({"fanspeed": 2})
+        await asyncio.sleep(DEBOUNCE / 2)
+        debouncer.feed({"fanspeed": 3})
+        await asyncio.sleep(DEBOUNCE * 0.75)
+        assert not batches # the new value is not stable yet
+        await asyncio.sleep(DEBOUNCE)
+        assert [values for _, values in batches] == [{"fanspeed": 3}] and debouncer.dropped == 1
+    run(scenario())
+
+
+def test_repeating_value_does_not_restart_the_debounce():
+    async def scenario():
+        debouncer, batches = _debouncer({"fanspeed": 1})
+        debouncer.feed({"fanspeed": 2})
+        await asyncio.sleep(DEBOUNCE * 0.75)
+        debouncer.feed({"fanspeed": 2}) # broadcast repeated
+        await asyncio.sleep(DEBOUNCE * 0.5)
+        assert [values for _, values in batches] == [{"fanspeed": 2}]
+    run(scenario())
+
+
+def test_min_interval_per_variable():
+    async def scenario():
+        data = {"fanspeed": 1, "temperature_outdoor_air": 5}
+        debouncer, batches = _debouncer(data)
+        debouncer.feed({"fanspeed": 2})
+        await asyncio.sleep(DEBOUNCE * 2)
+        debouncer.feed({"fanspeed": 3, "temperature_outdoor_air": 6})
+        await asyncio.sleep(DEBOUNCE * 2)
+        # the other variable is not held back
+        assert [values for _, values in batches] == [{"fanspeed": 2}, {"temperature_outdoor_air": 6}]
+        await asyncio.sleep(MIN_INTERVAL)
+        assert batches[-1][1] == {"fanspeed": 3}
+        assert batches[-1][0] - batches[0][0] >= MIN_INTERVAL - 0.01
+    run(scenario())
+
+
+def test_close_discards_pending_changes():
+    async def scenario():
+        debouncer, batches = _debouncer({"fanspeed": 1})
+        debouncer.feed({"fanspeed": 2})
+        debouncer.close()
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert not batches and debouncer.stats["pending"] == 0
+    run(scenario())
+
+
+def test_publish_errors_do_not_stop_the_debouncer():
+    async def scenario():
+        calls = []
+
+        def publish(values):
+            calls.append(values)
+            raise RuntimeError("entity gone")
+
+        debouncer = PushDebouncer(publish, {}.get, DEBOUNCE, 0)
+        debouncer.feed({"fanspeed": 2})
+        await asyncio.sleep(DEBOUNCE * 2)
+        debouncer.feed({"fanspeed": 3})
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert calls == [{"fanspeed": 2}, {"fanspeed": 3}]
+    run(scenario())
@@ -0,0 +1,69 @@
+from codec import REGISTER_CODECS
+from const import REGISTER_POLL_CLASSES
+from scanner import RegisterScan
+
+UNKNOWN = next(varid for varid in range(1, 256) if varid not in REGISTER_CODECS)
+
+
+def _scan(*sweeps):
+    scan = RegisterScan()
+    for n, values in enumerate(sweeps):
+        scan.add(values, timestamp=1000 + n * 10)
+    return scan
+
+
+def test_classification():
+    scan = _scan(
+        {1: 5, 2: 5, 3: 5, 4: None},
+        {1: 5, 2: 6, 3: 6, 4: None},
+        {1: 5, 2: 7, 3: 6, 4: None},
+        {1: 5, 2: 8, 3: 6, 4: None},
+        {1: 5, 2: 9, 3: 6, 4: None},
+    )
+    assert scan.classify(1)["class"] == "static"
+    assert scan.classify(2) == {
+        "class": "fast", "answered": 5, "changes": 4, "distinct": 5, "min": 5, "max": 9, "last": 9,
+    }
+    assert scan.classify(3)["class"] == "slow" and scan.classify(3)["changes"] == 1
+    assert scan.classify(4) == {"class": "absent", "answered": 0}
+    assert scan.classify(99) == {"class": "absent", "answered": 0} # never scanned
+
+
+def test_missing_replies_are_skipped_when_comparing():
+    scan = _scan({1: 5}, {1: None}, {1: 5})
+    assert scan.classify(1)["class"] == "static" and scan.classify(1)["answered"] == 2
+
+
+def test_registers_added_in_a_later_sweep():
+    scan = _scan({1: 5}, {1: 5, 2: 3}, {1: 5, 2: 4})
+    assert scan.sweeps == 3
+    assert scan.classify(2)["answered"] == 2 and scan.classify(2)["class"] == "fast"
+    scan.add({1: 5}, timestamp=1030) # register 2 not part of this sweep
+    assert scan.classify(2)["answered"] == 2
+
+
+def test_profile():
+    known = next(varid for varid in REGISTER_POLL_CLASSES if varid in REGISTER_CODECS)
+    plain = next(varid for varid in REGISTER_CODECS if varid not in REGISTER_POLL_CLASSES)
+    scan = _scan(
+        {known: 1, plain: 2, UNKNOWN: 3, 4: None},
+        {known: 2, plain: 2, UNKNOWN: 3, 4: None},
+    )
+    profile = scan.profile()
+    assert profile["sweeps"] == 2 and profile["duration_s"] == 10
+    assert profile["answered"] == 3 and f"0x{4:02X}" not in profile["registers"]
+    assert profile["unknown"] == [f"0x{UNKNOWN:02X}"]
+    entry = profile["registers"][f"0x{known:02X}"]
+    assert entry["known"] == [codec.name for codec in REGISTER_CODECS[known]]
+    assert entry["poll_class"] == REGISTER_POLL_CLASSES[known]
+    assert entry["class"] == "fast" and entry["suggested_poll_class"] == "fast"
+    assert profile["registers"][f"0x{plain:02X}"]["poll_class"] == "normal" # scheduler default
+    unknown = profile["registers"][f"0x{UNKNOWN:02X}"]
+    assert unknown["known"] is None and unknown["poll_class"] is None
+    assert unknown["suggested_poll_class"] == "slow" # static
+
+
+def test_empty_profile():
+    assert RegisterScan().profile() == {
+        "sweeps": 0, "duration_s": 0, "answered": 0, "unknown": [], "registers": {},
+    }
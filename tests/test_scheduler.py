@@ -0,0 +1,89 @@
+from const import REGISTERS_AND_COILS, POLL_CLASSES, REGISTER_POLL_CLASSES
+from scheduler import READ_PLAN, PollScheduler
+
+FAST = {varid for varid, name in REGISTER_POLL_CLASSES.items() if name == "fast"}
+SLOW = {varid for varid, name in REGISTER_POLL_CLASSES.items() if name == "slow"}
+READ = {vardef["varid"] for vardef in REGISTERS_AND_COILS.values() if vardef["read"]}
+
+
+def test_default_intervals_come_from_the_poll_classes():
+    scheduler = PollScheduler()
+    intervals = scheduler.intervals
+    assert set(intervals) == READ
+    assert all(intervals[varid] == POLL_CLASSES["fast"] for varid in FAST)
+    assert all(intervals[varid] == POLL_CLASSES["slow"] for varid in SLOW & READ)
+    assert intervals[0x29] == POLL_CLASSES["normal"] # fanspeed
+    assert scheduler.tick == POLL_CLASSES["fast"]
+
+
+def test_everything_is_due_before_the_first_read():
+    assert PollScheduler().due(now=0) == READ
+
+
+def test_registers_are_due_after_their_interval():
+    scheduler = PollScheduler()
+    scheduler.mark(READ, now=1000)
+    assert scheduler.due(now=1001) == set()
+    assert scheduler.due(now=1010) == FAST
+    assert scheduler.due(now=1060) == READ - (SLOW & READ)
+    assert scheduler.due(now=4600) == READ
+
+
+def test_registers_due_before_the_next_tick_are_read_now():
+    scheduler = PollScheduler()
+    scheduler.mark(READ, now=1000)
+    assert scheduler.due(now=1004) == set()
+    assert scheduler.due(now=1005) == FAST # 5 s early: half a tick of slack
+
+
+def test_only_marked_registers_are_rescheduled():
+    scheduler = PollScheduler()
+    scheduler.mark(READ - {0x29}, now=1000)
+    assert scheduler.due(now=1001) == {0x29}
+
+
+def test_invalidate_makes_a_register_due_again():
+    scheduler = PollScheduler()
+    scheduler.mark(READ, now=1000)
+    scheduler.invalidate(0x29)
+    assert scheduler.due(now=1001) == {0x29}
+
+
+def test_overrides_take_a_class_name_or_seconds():
+    scheduler = PollScheduler({"fanspeed": "fast", "max_fanspeed": 120}, {"fast": 5})
+    intervals = scheduler.intervals
+    assert intervals[0x29] == 5
+    assert intervals[0xA5] == 120
+    assert intervals[0x32] == 5
+    assert scheduler.tick == 5
+
+
+def test_shared_register_follows_its_most_demanding_variable():
+    # 0xA3 carries several coils; one fast coil makes the whole register fast
+    varnames = [name for name, vardef in REGISTERS_AND_COILS.items() if vardef["varid"] == 0xA3]
+    assert len(varnames) > 1
+    scheduler = PollScheduler({varnames[0]: "fast", varnames[1]: "slow"})
+    assert scheduler.intervals[0xA3] == POLL_CLASSES["fast"]
+
+
+def test_intervals_are_at_least_one_second():
+    assert PollScheduler({"fanspeed": 0}).intervals[0x29] == 1
+
+
+def test_read_plan_fetches_every_register_once():
+    assert set(READ_PLAN.registers) == READ
+    assert READ_PLAN.transactions == len(READ) == len(READ_PLAN)
+    assert len(READ_PLAN.registers) == len(set(READ_PLAN.registers))
+
+
+def test_read_plan_decodes_all_variables_of_a_register():
+    coils = {name for name, vardef in REGISTERS_AND_COILS.items() if vardef["varid"] == 0xA3 and vardef["read"]}
+    assert set(READ_PLAN.variables(0xA3)) == coils
+    assert READ_PLAN.variables(0xFF) == ()
+
+
+def test_read_plan_subset_keeps_the_read_order():
+    subset = READ_PLAN.subset({0x35, 0x29, 0x32})
+    assert subset.registers == tuple(varid for varid in READ_PLAN.registers if varid in (0x29, 0x32, 0x35))
+    assert dict(subset)[0x29] == READ_PLAN.variables(0x29)
+    assert READ_PLAN.transactions == len(READ) # the full plan is untouched
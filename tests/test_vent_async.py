@@ -0,0 +1,254 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from const import BUS_ADDRESSES, BREAKER_THRESHOLD, PIPELINE_MAX_MISSES
+from vent_async import HeliosAsyncBase, SILENCE_TIME, SYNC_TIMEOUT
+from latency import LatencyTracker
+from scheduler import PollScheduler
+from write_queue import WriteQueue
+from simulator import HeliosSimulator, telegram
+
+FB1, MB1 = BUS_ADDRESSES["FB1"], BUS_ADDRESSES["MB1"]
+FANSPEED_RAW = {1: 0x01, 2: 0x03, 3: 0x07, 4: 0x0F, 5: 0x1F, 6: 0x3F, 7: 0x7F, 8: 0xFF}
+
+pytestmark = pytest.mark.usefixtures("socket_enabled") # the simulator listens on localhost
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# simulated mainboard and a driver connected to it
+@contextlib.asynccontextmanager
+async def _bus(limits=None, **options):
+    simulator = HeliosSimulator(**options)
+    port = await simulator.start()
+    helios = HeliosAsyncBase(ip="127.0.0.1", port=port, limits=limits)
+    try:
+        yield simulator, helios
+    finally:
+        await helios.close()
+        await simulator.stop()
+
+
+# another client on the bus (e.g. the remote control), talking to the mainboard
+@contextlib.asynccontextmanager
+async def _remote(simulator):
+    port = simulator._server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        yield writer
+    finally:
+        writer.close()
+
+
+def test_read_values_from_the_mainboard():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            simulator.registers[0x29] = FANSPEED_RAW[3]
+            simulator.registers[0xA3] = 0b1001 # powerstate, winter_mode
+            values = await helios.readValues({0x29, 0xA3})
+            assert values["fanspeed"] == 3
+            assert values["powerstate"] == 1 and values["winter_mode"] == 1 and values["co2_indicator"] == 0
+            assert "temperature_outdoor_air" not in values
+            assert simulator.stats["requests"] == 2
+    run(scenario())
+
+
+def test_snooped_registers_are_not_requested_again():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            first = await helios.readValues({0x29, 0x32})
+            second = await helios.readValues({0x29, 0x32})
+            assert first == second
+            assert simulator.stats["requests"] == 2
+            assert helios.readStats()["snooped"] == 2
+    run(scenario())
+
+
+def test_write_value_reaches_the_mainboard():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            assert await helios.writeValue("fanspeed", 5)
+            await asyncio.sleep(0.05)
+            assert simulator.registers[0x29] == FANSPEED_RAW[5]
+            assert (await helios.readValues({0x29}))["fanspeed"] == 5
+    run(scenario())
+
+
+def test_coil_writes_keep_the_other_bits_and_share_one_telegram():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            simulator.registers[0xA3] = 0b0001 # powerstate on
+            results = await helios.writeValues({"winter_mode": 1, "co2_indicator": 1})
+            assert results == {"winter_mode": True, "co2_indicator": True}
+            await asyncio.sleep(0.05)
+            assert simulator.registers[0xA3] == 0b1011
+            assert simulator.stats["writes"] == 1
+    run(scenario())
+
+
+def test_invalid_writes_never_reach_the_bus():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            assert not await helios.writeValue("temperature_outdoor_air", 20) # read-only
+            assert not await helios.writeValue("no_such_variable", 1)
+            assert not await helios.writeValue("fanspeed", "fast")
+            assert simulator.stats["writes"] == 0
+    run(scenario())
+
+
+def test_writes_outside_the_sensor_limits_are_refused():
+    async def scenario():
+        async with _bus(limits={"fanspeed": (1, 4), "bypass_setpoint": (None, None)}) as (simulator, helios):
+            assert not await helios.writeValue("fanspeed", 5)
+            assert simulator.stats["writes"] == 0
+            assert await helios.writeValue("fanspeed", 4)
+            assert await helios.writeValue("bypass_setpoint", 18) # no limits configured
+    run(scenario())
+
+
+def test_scheduler_polls_only_due_registers():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            scheduler = PollScheduler()
+            fast = scheduler.due(now=0) & {0x32, 0x33, 0x34, 0x35}
+            values = await helios.readValues(fast)
+            scheduler.mark({0x32, 0x33, 0x34, 0x35}, now=0)
+            assert values["temperature_outdoor_air"] is not None
+            assert not scheduler.due(now=1) & fast
+            assert scheduler.due(now=scheduler.tick) >= fast
+    run(scenario())
+
+
+def test_write_queue_batches_writes_into_one_bus_session():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            simulator.registers[0xA3] = 0
+            queue = WriteQueue(helios.writeValues)
+            results = await asyncio.gather(
+                queue.submit("powerstate", 1), queue.submit("winter_mode", 1),
+                queue.submit("fanspeed", 2), queue.submit("fanspeed", 4)
+            )
+            assert results == [True, True, True, True]
+            await asyncio.sleep(0.05)
+            assert simulator.registers[0xA3] == 0b1001
+            assert simulator.registers[0x29] == FANSPEED_RAW[4]
+            assert simulator.stats["writes"] == 2 # one telegram per register
+            assert queue.stats == {"submitted": 4, "superseded": 1, "batches": 1}
+    run(scenario())
+
+
+def test_missing_registers_are_read_in_one_pipelined_session():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            varids = {0x29, 0x32, 0x33, 0x34, 0x35, 0xA3}
+            values = await helios.readValues(varids)
+            stats = helios.readStats()
+            assert stats["pipelined"] == len(varids)
+            assert stats["requests"] == simulator.stats["requests"] == len(varids)
+            assert all(value is not None for value in values.values())
+    run(scenario())
+
+
+def test_failing_register_is_quarantined():
+    async def scenario():
+        async with _bus(absent={0x2B}) as (simulator, helios):
+            # short reply timeout and no back-off, so the ten attempts of every read are quick
+            helios._latency = LatencyTracker(0.05, SILENCE_TIME, SYNC_TIMEOUT)
+            helios._arbiter.backoff = lambda attempt: 0.0
+            for _ in range(BREAKER_THRESHOLD):
+                values = await helios.readValues({0x29, 0x2B}, max_age=0)
+                assert values["fanspeed"] is not None and values["co2_reading_upper_byte"] is None
+            assert "0x2B" in helios.latencyStats()["quarantined"]
+            requests = simulator.stats["requests"]
+            values = await helios.readValues({0x29, 0x2B}, max_age=0)
+            assert values["co2_reading_upper_byte"] is None
+            assert simulator.stats["requests"] == requests + 1 # 0x2B is skipped
+            assert helios.readStats()["quarantined"] == 1
+            assert helios.latencyStats()["replies"] >= BREAKER_THRESHOLD + 1
+    run(scenario())
+
+
+def test_changes_on_the_bus_are_handed_to_the_change_handler():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            changes = []
+            helios.setChangeHandler(changes.append)
+            assert await helios.connect()
+            async with _remote(simulator) as remote:
+                remote.write(telegram(FB1, MB1, 0x29, FANSPEED_RAW[6])) # fan speed set on the remote
+                await asyncio.sleep(0.05)
+                remote.write(telegram(FB1, MB1, 0x29, FANSPEED_RAW[6])) # no change
+                remote.write(telegram(FB1, MB1, 0x00, 0x32)) # remote polls a temperature
+                await asyncio.sleep(0.05)
+            assert changes[0] == {"fanspeed": 6}
+            assert len(changes) == 2 and "temperature_outdoor_air" in changes[1]
+            assert simulator.stats["requests"] == 1 # nothing requested by the driver
+    run(scenario())
+
+
+def test_remote_revert_of_our_write_is_a_change():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            changes = []
+            helios.setChangeHandler(changes.append)
+            assert await helios.connect()
+            async with _remote(simulator) as remote:
+                remote.write(telegram(FB1, MB1, 0x29, FANSPEED_RAW[6]))
+                await asyncio.sleep(0.05)
+                assert await helios.writeValue("fanspeed", 2)
+                remote.write(telegram(FB1, MB1, 0x29, FANSPEED_RAW[6])) # set back on the remote
+                await asyncio.sleep(0.05)
+            assert changes == [{"fanspeed": 6}, {"fanspeed": 6}]
+    run(scenario())
+
+
+def test_write_preempts_a_running_refresh():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            assert await helios.connect()
+            refresh = asyncio.ensure_future(helios.readValues(None, max_age=0))
+            await asyncio.sleep(0.1)
+            assert await helios.writeValue("fanspeed", 2)
+            assert not refresh.done() # the write did not wait for the full read
+            values = await refresh
+            assert values["fanspeed"] == 2
+            assert helios.metrics.get("preemptions").total() >= 1
+    run(scenario())
+
+
+def test_refresh_deadline_returns_a_partial_result():
+    async def scenario():
+        async with _bus() as (simulator, helios):
+            values = await helios.readValues(None, max_age=0, deadline=0.1)
+            stats = helios.readStats()
+            assert 0 < stats["pipelined"] < stats["registers"]
+            assert stats["missing"] == stats["registers"] - stats["pipelined"]
+            assert stats["duration"] < 0.5
+            assert None in values.values()
+            assert sum(value is not None for value in values.values()) > 0
+    run(scenario())
+
+
+def test_scan_reports_registers_without_reply_as_none():
+    async def scenario():
+        async with _bus(absent={0x2B, 0x2C, 0xF0}) as (simulator, helios):
+            simulator.registers[0xF1] = 0x42
+            varids = [0x29, 0x2B, 0x2C, 0x32, 0xF0, 0xF1]
+            result = await helios.scanRegisters(varids, interval=0)
+            assert list(result) == varids
+            assert result[0x2B] is None and result[0x2C] is None and result[0xF0] is None
+            assert result[0x29] == simulator.registers[0x29] and result[0xF1] == 0x42
+    run(scenario())
+
+
+def test_scan_stops_when_nothing_answers():
+    async def scenario():
+        async with _bus(absent=range(256)) as (simulator, helios):
+            result = await helios.scanRegisters(interval=0)
+            assert set(result.values()) == {None}
+            assert simulator.stats["requests"] <= PIPELINE_MAX_MISSES + 1
+    run(scenario())
@@ -0,0 +1,85 @@
+import asyncio
+
+from write_queue import WriteQueue
+
+DELAY = 0.02
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# queue writing into a list of batches; 'fail' varnames are reported as failed
+def _queue(fail=(), delay=DELAY):
+    batches, flushed = [], []
+
+    async def write_batch(values):
+        batches.append(dict(values))
+        await asyncio.sleep(delay)
+        return {varname: varname not in fail for varname in values}
+
+    def on_flush(values, results):
+        flushed.append((dict(values), dict(results)))
+
+    return WriteQueue(write_batch, on_flush, DELAY), batches, flushed
+
+
+def test_writes_within_the_delay_go_into_one_batch():
+    async def scenario():
+        queue, batches, flushed = _queue()
+        results = await asyncio.gather(
+            queue.submit("fanspeed", 3), queue.submit("winter_mode", 1), queue.submit("bypass_setpoint", 15)
+        )
+        assert results == [True, True, True]
+        assert batches == [{"fanspeed": 3, "winter_mode": 1, "bypass_setpoint": 15}]
+        assert len(flushed) == 1
+        assert queue.stats == {"submitted": 3, "superseded": 0, "batches": 1}
+    run(scenario())
+
+
+def test_newer_write_supersedes_the_pending_one():
+    async def scenario():
+        queue, batches, _ = _queue()
+        results = await asyncio.gather(queue.submit("fanspeed", 3), queue.submit("fanspeed", 5))
+        assert results == [True, True] # both callers get the result of the batch
+        assert batches == [{"fanspeed": 5}]
+        assert queue.superseded == 1
+    run(scenario())
+
+
+def test_writes_during_a_flush_go_into_the_next_batch():
+    async def scenario():
+        queue, batches, _ = _queue()
+        first = asyncio.ensure_future(queue.submit("fanspeed", 3))
+        await asyncio.sleep(DELAY * 1.5) # first batch is being written
+        second = asyncio.ensure_future(queue.submit("fanspeed", 4))
+        assert await first and await second
+        assert batches == [{"fanspeed": 3}, {"fanspeed": 4}]
+        assert queue.stats == {"submitted": 2, "superseded": 0, "batches": 2}
+    run(scenario())
+
+
+def test_failed_writes_are_reported_per_variable():
+    async def scenario():
+        queue, _, flushed = _queue(fail=("winter_mode",))
+        results = await asyncio.gather(queue.submit("fanspeed", 3), queue.submit("winter_mode", 1))
+        assert results == [True, False]
+        assert flushed == [({"fanspeed": 3, "winter_mode": 1}, {"fanspeed": True, "winter_mode": False})]
+    run(scenario())
+
+
+def test_exception_in_the_batch_fails_all_writes_and_keeps_the_queue_working():
+    async def scenario():
+        calls = []
+
+        async def write_batch(values):
+            calls.append(dict(values))
+            if len(calls) == 1:
+                raise ConnectionError("gateway gone")
+            return {varname: True for varname in values}
+
+        queue = WriteQueue(write_batch, None, DELAY)
+        assert await queue.submit("fanspeed", 3) is False
+        assert await queue.submit("fanspeed", 4) is True
+        assert calls == [{"fanspeed": 3}, {"fanspeed": 4}]
+    run(scenario())